@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: acquisition
+   :synopsis: BITalino acquisition shared by the tornado and twisted servers
+
+*Created on Mon Oct 19 2026*
+
+* :mod:`acquisition.bitalino`: the BITalino API
+* :mod:`acquisition.transport`: links to the devices (bluetooth and serial port)
+* :mod:`acquisition.decoder`: frame decoding backends (pure Python and numpy)
+* :mod:`acquisition.metrics`: counters and histograms in the Prometheus text format
+"""
+
+from .bitalino import BITalino, ExceptionCode, find
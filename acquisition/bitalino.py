@@ -9,13 +9,16 @@
 """
 
 import platform
-import math
 import numpy
-import re
-import serial
 import struct
+import threading
 import time
-import select
+
+from . import decoder, transport
+from .decoder import frameSize, crc4
+from .errors import ExceptionCode
+
+__all__ = ['BITalino', 'ExceptionCode', 'find']
 
 def find():
     """
@@ -26,33 +29,31 @@ def find():
     if platform.system() == 'Windows' or platform.system() == 'Linux':
         try:
             import bluetooth
-        except Exception, e:
+        except Exception as e:
             raise Exception(ExceptionCode.IMPORT_FAILED + str(e))
         nearby_devices = bluetooth.discover_devices(lookup_names=True)
         return nearby_devices
     else:
         raise Exception(ExceptionCode.INVALID_PLATFORM)
 
-class ExceptionCode():
-    INVALID_ADDRESS = "The specified address is invalid." 
-    INVALID_PLATFORM= "This platform does not support bluetooth connection." 
-    CONTACTING_DEVICE = "The computer lost communication with the device."      
-    DEVICE_NOT_IDLE = "The device is not idle."        
-    DEVICE_NOT_IN_ACQUISITION = "The device is not in acquisition mode." 
-    INVALID_PARAMETER = "Invalid parameter."
-    INVALID_VERSION = "Only available for Bitalino 2.0."
-    IMPORT_FAILED = "Please connect using the Virtual COM Port or confirm that PyBluez is installed; bluetooth wrapper failed to import with error: "
-
 class BITalino(object):
     """
     :param macAddress: MAC address or serial port for the bluetooth device
     :type macAddress: str
     :param timeout: maximum amount of time (seconds) elapsed while waiting for the device to respond
     :type timeout: int, float or None
+    :param version: version string of the device, if already known (e.g. from a previous connection, see :meth:`capabilities`)
+    :type version: str or None
+    :param link: transport to the device, by default chosen from *macAddress* by :func:`transport.connect`
+    :type link: transport.Transport or None
     :raises Exception: invalid MAC address or serial port
     :raises Exception: invalid timeout value
          
-    Connects to the bluetooth device with the MAC address or serial port provided.
+    Connects to the bluetooth device with the MAC address or serial port provided. Unless *version* is given, the
+    version of the device is retrieved with :meth:`version` to tell BITalino 1.0 and 2.0 apart; giving it skips that
+    handshake, which shortens reconnections.
+    
+    Frames are decoded by :attr:`decoder` (see :mod:`decoder`), which may be replaced for all devices or for one.
     
     Possible values for parameter *macAddress*:
     
@@ -68,42 +69,64 @@ class BITalino(object):
     X                Wait X seconds for a response and raises a connection Exception
     ===============  ================================================================
     """
-    def __init__(self, macAddress, timeout = None):
-        regCompiled = re.compile('^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$');
-        checkMatch = re.match(regCompiled, macAddress);
+    # Shortest time (seconds) between two commands. The API this module derives from slept 100 ms before every
+    # command, with no reason given; 10 ms is ten frames at the highest sampling rate (1000 Hz), so that the device
+    # has sent several frames, and read the serial port in between, before the next command arrives. It was not
+    # measured on every firmware version: raise it for a device that misses consecutive commands.
+    commandInterval = 0.01
+    # Lower bound of any interval between commands: one frame at 1000 Hz, so that each state of a sequence of
+    # triggers shows in at least one sample and the device is never sent commands back to back
+    minCommandInterval = 0.001
+    decoder = decoder.default
+    
+    def __init__(self, macAddress, timeout = None, version = None, link = None):
         self.blocking = True if timeout == None else False
+        self.timeout = None
         if not self.blocking:
             try:
                 self.timeout = float(timeout)
             except Exception:
                 raise Exception(ExceptionCode.INVALID_PARAMETER)
-        if (checkMatch):
-            if platform.system() == 'Windows' or platform.system() == 'Linux':
-                try:
-                    import bluetooth
-                except Exception, e:
-                    raise Exception(ExceptionCode.IMPORT_FAILED + str(e))
-                self.socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-                self.socket.connect((macAddress, 1))
-                self.serial = False     
-            else:
-                raise Exception(ExceptionCode.INVALID_PLATFORM)
-        elif (macAddress[0:3] == 'COM' and platform.system() == 'Windows') or (macAddress[0:5] == '/dev/' and platform.system() != 'Windows'):
-            self.socket = serial.Serial(macAddress, 115200)
-            self.serial = True
-        else:
-            raise Exception(ExceptionCode.INVALID_ADDRESS)
+        self.link = transport.connect(macAddress, self.timeout) if link is None else link
+        self.serial = self.link.serial
         self.started = False
         self.macAddress = macAddress
+        self.lastCommand = 0.
+        self.commandLock = threading.Lock()
+        self.bytesReceived = 0
+        self.crcErrors = 0
+        self.resyncs = 0
+        self.decodeTime = 0.
+        self.pending = bytearray()
+        self.identify(self.version() if version is None else version)
+    
+    def identify(self, version):
+        """
+        :param version: version string of the device, as returned by :meth:`version`
+        :type version: str
+        
+        Sets the version of the device, and whether it is a BITalino 2.0.
+        """
         split_string = '_v'
         split_string_old = 'V'
-        version = self.version()
+        self.versionString = version
         if split_string in version:
             version_nbr = float(version.split(split_string)[1][:3])
         else:
             version_nbr = float(version.split(split_string_old)[1][:3])
         self.isBitalino2 = True if version_nbr >= 4.2 else False
     
+    def capabilities(self):
+        """
+        :returns: dictionary with the version string of the device, whether it is a BITalino 2.0, and the features
+                  it supports beyond those of BITalino 1.0
+        
+        Everything that is learnt from the version handshake, to be kept across connections (see
+        :class:`devices.DeviceCache`) and given back on instantiation to skip the handshake.
+        """
+        features = ['idle', 'pwm', 'state', 'triggerWhileIdle'] if self.isBitalino2 else []
+        return {'version': self.versionString, 'isBitalino2': self.isBitalino2, 'features': features}
+    
     def start(self, SamplingRate = 1000, analogChannels = [0, 1, 2, 3, 4, 5]):
         """
         :param SamplingRate: sampling frequency (Hz)
@@ -173,6 +196,7 @@ class BITalino(object):
             self.send(commandStart)
             self.started = True
             self.analogChannels = analogChannels
+            self.pending = bytearray()
         else:
             raise Exception(ExceptionCode.DEVICE_NOT_IDLE)
     
@@ -181,6 +205,9 @@ class BITalino(object):
         :raises Exception: device not in acquisition (IDLE)
         
         Stops the acquisition. Stoping the acquisition implies the use of the method :meth:`send`.
+        
+        The reply to :meth:`version` that follows marks the end of the frames still in transit, and checks the
+        version given on instantiation, if any, against the device at no extra cost.
         """
         if (self.started):
             self.send(0)
@@ -191,23 +218,58 @@ class BITalino(object):
             else:
                 raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)
         self.started = False
-        self.version()
+        self.identify(self.version())
+        self.pending = bytearray()
     
     def close(self):
         """
         Closes the bluetooth or serial port socket.
         """
-        self.socket.close()
+        self.link.close()
     
     def send(self, data):
         """
+        :param data: command
+        :type data: int
+        
         Sends a command to the BITalino device.
+        
+        Consecutive commands are spaced by at least :attr:`commandInterval` seconds, counted from the previous
+        command, so that the device has time to process each one; no time is lost when commands are sent further
+        apart, or after a reply of the device (e.g. to :meth:`version`), which acknowledges the previous command.
         """
-        time.sleep(0.1)
-        if self.serial:
-            self.socket.write(chr(data))
-        else:
-            self.socket.send(chr(data))
+        self.sendBatch([data])
+    
+    def sendBatch(self, commands, interval = None):
+        """
+        :param commands: commands to be sent, in order
+        :type commands: list of int
+        :param interval: time (seconds) from each command to the next, defaults to :attr:`commandInterval`
+        :type interval: int, float or None
+        
+        Sends a sequence of commands to the BITalino device. The commands are paced against a fixed schedule
+        rather than by sleeping after each one, so that e.g. a sequence of triggers keeps its timing regardless of
+        the time each write takes. Intervals shorter than :attr:`minCommandInterval` are raised to it.
+        """
+        interval = max(self.commandInterval if interval is None else interval, self.minCommandInterval)
+        with self.commandLock:
+            scheduleTime = max(time.time(), self.lastCommand + max(self.commandInterval, self.minCommandInterval))
+            for command in commands:
+                delay = scheduleTime - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                self.write(bytes(bytearray([command])))
+                self.lastCommand = time.time()
+                scheduleTime += interval
+    
+    def write(self, data):
+        """
+        :param data: binary data
+        :type data: bytes
+        
+        Writes `data` to the bluetooth or serial port socket.
+        """
+        self.link.write(data)
     
     def battery(self, value=0):
         """
@@ -287,17 +349,11 @@ class BITalino(object):
                 self.send(11)
                 number_bytes = 16
                 Data = self.receive(number_bytes)
+                self.lastCommand = 0.
                 decodedData = list(struct.unpack(number_bytes*"B ", Data))
                 crc = decodedData[-1] & 0x0F
                 decodedData[-1] = decodedData[-1] & 0xF0
-                x = 0
-                for i in range(number_bytes):
-                    for bit in range(7, -1, -1):
-                        x = x << 1
-                        if (x & 0x10):
-                            x = x ^ 0x03
-                        x = x ^ ((decodedData[i] >> bit) & 0x01)
-                if (crc == x & 0x0F):
+                if (crc == crc4(decodedData)):
                     digitalPorts = []
                     digitalPorts.append(decodedData[-1] >> 7 & 0x01)
                     digitalPorts.append(decodedData[-1] >> 6 & 0x01)
@@ -345,6 +401,27 @@ class BITalino(object):
         Examples         ``[1, 0, 1, 0]``                               ``[1, 0]``
         ===============  ============================================== ==============================================          
         """
+        self.send(self.triggerCommand(digitalArray))
+    
+    def triggerSequence(self, sequence, interval = None):
+        """
+        :param sequence: states of the digital outputs, each one as the *digitalArray* of :meth:`trigger`
+        :type sequence: list
+        :param interval: time (seconds) from each state to the next, defaults to :attr:`commandInterval`
+        :type interval: int, float or None
+        :raises Exception: list of digital channel output is not valid
+        :raises Exception: device not in acquisition (IDLE) (for BITalino 1.0)
+        
+        Sets the digital outputs to each state of *sequence* in turn (e.g. to emit pulses or a pattern of triggers
+        while acquiring). All states are validated before the first is sent, and they are then paced with
+        :meth:`sendBatch`, so sequences can run at rates well above what repeated calls to :meth:`trigger` reach.
+        """
+        self.sendBatch([self.triggerCommand(digitalArray) for digitalArray in sequence], interval)
+    
+    def triggerCommand(self, digitalArray = None):
+        """
+        :returns: command that sets the digital outputs as described in :meth:`trigger`
+        """
         arraySize = 2 if self.isBitalino2 else 4
         if not self.isBitalino2 and not self.started:
             raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)
@@ -372,7 +449,7 @@ class BITalino(object):
                 
             for i,j in enumerate(digitalArray):
                 data = data | j<<(2+i)
-            self.send(data)
+            return data
     
     def read(self, nSamples=100):
         """
@@ -410,65 +487,105 @@ class BITalino(object):
         """
         if (self.started):
             nChannels = len(self.analogChannels)
-            
-            if nChannels <=4 :
-                number_bytes = int(math.ceil((12.+10.*nChannels)/8.))
-            else:
-                number_bytes = int(math.ceil((52.+6.*(nChannels-4))/8.))
-            
-            dataAcquired = numpy.zeros((nSamples, 5 + nChannels))
-            for sample in range(nSamples):
-                Data = self.receive(number_bytes)
-                decodedData = list(struct.unpack(number_bytes*"B ", Data))
-                crc = decodedData[-1] & 0x0F
-                decodedData[-1] = decodedData[-1] & 0xF0
-                x = 0
-                for i in range(number_bytes):
-                    for bit in range(7, -1, -1):
-                        x = x << 1
-                        if (x & 0x10):
-                            x = x ^ 0x03
-                        x = x ^ ((decodedData[i] >> bit) & 0x01)
-                if (crc == x & 0x0F):
-                    dataAcquired[sample, 0] = decodedData[-1] >> 4
-                    dataAcquired[sample, 1] = decodedData[-2] >> 7 & 0x01
-                    dataAcquired[sample, 2] = decodedData[-2] >> 6 & 0x01
-                    dataAcquired[sample, 3] = decodedData[-2] >> 5 & 0x01
-                    dataAcquired[sample, 4] = decodedData[-2] >> 4 & 0x01
-                    if nChannels > 0:
-                        dataAcquired[sample, 5] = ((decodedData[-2] & 0x0F) << 6) | (decodedData[-3] >> 2)
-                    if nChannels > 1:
-                        dataAcquired[sample, 6] = ((decodedData[-3] & 0x03) << 8) | decodedData[-4]
-                    if nChannels > 2:
-                        dataAcquired[sample, 7] = (decodedData[-5] << 2) | (decodedData[-6] >> 6)
-                    if nChannels > 3:
-                        dataAcquired[sample, 8] = ((decodedData[-6] & 0x3F) << 4) | (decodedData[-7] >> 4)
-                    if nChannels > 4:
-                        dataAcquired[sample, 9] = ((decodedData[-7] & 0x0F) << 2) | (decodedData[-8] >> 6)
-                    if nChannels > 5:
-                        dataAcquired[sample, 10] = decodedData[-8] & 0x3F 
-                else:
-                    raise Exception(ExceptionCode.CONTACTING_DEVICE)
-            return dataAcquired   
+            Data = self.receive(nSamples*self.frameSize())
+            # Time spent decoding the block, excluding the time waiting for the device
+            initTime = time.time()
+            dataAcquired, valid = self.decoder.decode(Data, nChannels)
+            self.decodeTime = time.time() - initTime
+            if not valid.all():
+                self.crcErrors += 1
+                raise Exception(ExceptionCode.CONTACTING_DEVICE)
+            return dataAcquired.astype('float')
+        else:
+            raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)
+    
+    def readFrames(self, minSamples=1):
+        """
+        :param minSamples: minimum number of samples to acquire
+        :type minSamples: int
+        :returns: list with one list per sample acquired, with the same columns as :meth:`read`
+        :raises Exception: device not in acquisition (in IDLE)
+        :raises Exception: lost communication with the device when timeout is reached
+        
+        Acquires every sample already received from BITalino, waiting only until at least `minSamples` are
+        available. Reading samples this way implies the use of the method :meth:`receiveAvailable`.
+        
+        Unlike :meth:`read`, the bytes pending on the connection are retrieved at once and decoded as soon as each
+        frame is complete, so that samples can be forwarded with the lowest possible latency. A frame that fails the
+        CRC check is taken as a loss of alignment, and decoding resumes one byte later.
+        """
+        if (self.started):
+            nChannels = len(self.analogChannels)
+            number_bytes = self.frameSize()
+            frames = []
+            initTime = time.time()
+            waitTime = 0.
+            while len(frames) < minSamples:
+                receiveTime = time.time()
+                self.pending += self.receiveAvailable()
+                waitTime += time.time() - receiveTime
+                offset = 0
+                while len(self.pending) - offset >= number_bytes:
+                    values, valid = self.decoder.decode(memoryview(self.pending)[offset:], nChannels)
+                    # Frames up to the first CRC mismatch are kept, and the frame alignment is then searched for
+                    # one byte later
+                    nValid = len(valid) if valid.all() else int(numpy.argmin(valid))
+                    frames.extend(values[:nValid].tolist())
+                    offset += nValid*number_bytes
+                    if nValid < len(valid):
+                        self.crcErrors += 1
+                        self.resyncs += 1
+                        offset += 1
+                del self.pending[:offset]
+            self.decodeTime = time.time() - initTime - waitTime
+            return frames
         else:
             raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)
     
+    def frameSize(self):
+        """
+        :returns: number of bytes of each frame sent by BITalino for the analog channels set in :meth:`start`
+        """
+        return frameSize(len(self.analogChannels))
+    
+    def decodeFrame(self, Data, nChannels):
+        """
+        :param Data: binary data of one frame
+        :type Data: bytes
+        :param nChannels: number of analog channels in the frame
+        :type nChannels: int
+        :returns: list with the sequence number, the 4 digital channels and the `nChannels` analog channels
+        :raises Exception: lost communication with the device when data is corrupted
+        
+        Decodes a single frame sent by BITalino, as described in :meth:`read`.
+        """
+        frame, valid = self.decoder.decodeFrame(Data, nChannels)
+        if valid:
+            return frame
+        else:
+            self.crcErrors += 1
+            raise Exception(ExceptionCode.CONTACTING_DEVICE)
+    
     def version(self):
         """
         :returns: str with the version of BITalino 
         :raises Exception: device in acquisition (not IDLE)
         
-        Retrieves the BITalino version. Retrieving the version implies the use of the methods :meth:`send` and :meth:`receive`.
+        Retrieves the BITalino version. Retrieving the version implies the use of the methods :meth:`send` and :meth:`receiveAvailable`.
+        
+        The reply is read in bulk, along with any frames of a previous acquisition still in transit before it.
         """       
         if (self.started == False):
             # CommandVersion: 0  0  0  0  0  1  1  1
             self.send(7)
-            version_str = ''
+            version_str = bytearray()
             while True: 
-                version_str += self.receive(1)
-                if version_str[-1] == '\n' and 'BITalino' in version_str:
+                version_str += self.receiveAvailable()
+                start = version_str.find(b"BITalino")
+                if start >= 0 and b'\n' in version_str[start:]:
                     break
-            return version_str[version_str.index("BITalino"):-1]
+            self.lastCommand = 0.
+            return version_str[start:version_str.index(b'\n', start)].decode('ascii')
         else:
             raise Exception(ExceptionCode.DEVICE_NOT_IDLE) 
     
@@ -476,30 +593,25 @@ class BITalino(object):
         """
         :param nbytes: number of bytes to retrieve
         :type nbytes: int
-        :return: string packed binary data
+        :return: binary data
         :raises Exception: lost communication with the device when timeout is reached
         
-        Retrieves `nbytes` from the BITalino device and returns it as a string pack with length of `nbytes`. The timeout is defined on instantiation.
-        """
-        data = ''
-        if self.serial:
-            while len(data) < nbytes:
-                if not self.blocking:
-                    initTime = time.time()
-                    while self.socket.inWaiting() < 1:
-                        finTime = time.time()
-                        if (finTime - initTime) > self.timeout:
-                            raise Exception(ExceptionCode.CONTACTING_DEVICE) 
-                data += self.socket.read(1)
-        else:
-            while len(data) < nbytes:
-                if not self.blocking:
-                    ready = select.select([self.socket], [], [], self.timeout)
-                    if ready[0]:
-                        pass
-                    else:
-                        raise Exception(ExceptionCode.CONTACTING_DEVICE)
-                data += self.socket.recv(1)      
+        Retrieves `nbytes` from the BITalino device and returns it as bytes with length of `nbytes`. The timeout is defined on instantiation.
+        """
+        data = self.link.receive(nbytes)
+        self.bytesReceived += len(data)
+        return data
+    
+    def receiveAvailable(self):
+        """
+        :return: binary data
+        :raises Exception: lost communication with the device when timeout is reached
+        
+        Retrieves all the bytes already received from the BITalino device, waiting for at least one. The timeout is
+        defined on instantiation.
+        """
+        data = self.link.receiveAvailable()
+        self.bytesReceived += len(data)
         return data
             
 if __name__ == '__main__':
@@ -516,7 +628,7 @@ if __name__ == '__main__':
     device = BITalino(macAddress)
 
     # Set battery threshold
-    print device.battery(batteryThreshold)
+    print(device.battery(batteryThreshold))
     
     # Read BITalino version
     device.version()
@@ -528,7 +640,7 @@ if __name__ == '__main__':
     end = time.time()
     while (end - start) < running_time:
         # Read samples
-        print device.read(nSamples)
+        print(device.read(nSamples))
         end = time.time()
 
     # Turn BITalino led on
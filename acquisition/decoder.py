@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: decoder
+   :synopsis: Decoding of the frames sent by BITalino during acquisition
+
+*Created on Mon Oct 19 2026*
+
+Two interchangeable backends turn a run of frames into samples: :class:`ReferenceDecoder`, which follows the frame
+layout byte by byte in pure Python, and :class:`VectorDecoder`, which decodes and checks the CRC of all frames at
+once with numpy. Both return the same values and validity for the same bytes; the one used by
+:class:`bitalino.BITalino` is set by its ``decoder`` attribute, and by default by the ``BITALINO_DECODER``
+environment variable (``numpy`` unless set to ``reference``).
+"""
+
+import math
+import os
+import struct
+import numpy
+
+def frameSize(nChannels):
+    """
+    :param nChannels: number of analog channels acquired
+    :type nChannels: int
+    :returns: number of bytes of each frame
+    """
+    if nChannels <= 4:
+        return int(math.ceil((12.+10.*nChannels)/8.))
+    else:
+        return int(math.ceil((52.+6.*(nChannels-4))/8.))
+
+def crc4(decodedData):
+    """
+    :param decodedData: bytes of a frame, with the 4 bits of the CRC (the lowest of the last byte) set to 0
+    :type decodedData: list of int
+    :returns: 4-bit CRC of the frame
+    """
+    x = 0
+    for i in range(len(decodedData)):
+        for bit in range(7, -1, -1):
+            x = x << 1
+            if (x & 0x10):
+                x = x ^ 0x03
+            x = x ^ ((decodedData[i] >> bit) & 0x01)
+    return x & 0x0F
+
+def crcTable():
+    """
+    :returns: array in which ``[x, byte]`` is the CRC state after feeding `byte` to the state `x`, so that the CRC
+              takes one step per byte
+    """
+    # The bitwise steps of crc4, over all the states and bytes at once
+    x = numpy.repeat(numpy.arange(16, dtype='uint8')[:, None], 256, axis=1)
+    byte = numpy.arange(256, dtype='uint8')
+    for bit in range(7, -1, -1):
+        x = x << 1
+        x = numpy.where(x & 0x10, x ^ 0x03, x)
+        x = x ^ ((byte >> bit) & 0x01)
+    return x & 0x0F
+
+CRC_TABLE = crcTable()
+
+class ReferenceDecoder(object):
+    """
+    Pure-Python decoder, one frame at a time.
+    """
+    name = 'reference'
+
+    def decodeFrame(self, Data, nChannels):
+        """
+        :param Data: binary data of one frame
+        :type Data: bytes
+        :param nChannels: number of analog channels in the frame
+        :type nChannels: int
+        :returns: tuple with a list of the sequence number, the 4 digital channels and the `nChannels` analog
+                  channels, and whether the CRC matches
+        """
+        number_bytes = len(Data)
+        decodedData = list(struct.unpack(number_bytes*"B ", Data))
+        crc = decodedData[-1] & 0x0F
+        decodedData[-1] = decodedData[-1] & 0xF0
+        frame = [decodedData[-1] >> 4,
+                 decodedData[-2] >> 7 & 0x01,
+                 decodedData[-2] >> 6 & 0x01,
+                 decodedData[-2] >> 5 & 0x01,
+                 decodedData[-2] >> 4 & 0x01]
+        if nChannels > 0:
+            frame.append(((decodedData[-2] & 0x0F) << 6) | (decodedData[-3] >> 2))
+        if nChannels > 1:
+            frame.append(((decodedData[-3] & 0x03) << 8) | decodedData[-4])
+        if nChannels > 2:
+            frame.append((decodedData[-5] << 2) | (decodedData[-6] >> 6))
+        if nChannels > 3:
+            frame.append(((decodedData[-6] & 0x3F) << 4) | (decodedData[-7] >> 4))
+        if nChannels > 4:
+            frame.append(((decodedData[-7] & 0x0F) << 2) | (decodedData[-8] >> 6))
+        if nChannels > 5:
+            frame.append(decodedData[-8] & 0x3F)
+        return frame, crc == crc4(decodedData)
+
+    def decode(self, data, nChannels):
+        """
+        :param data: binary data of consecutive frames; bytes after the last whole frame are ignored
+        :type data: bytes
+        :param nChannels: number of analog channels in each frame
+        :type nChannels: int
+        :returns: tuple with an array of int with one row per frame, with the columns described in
+                  :meth:`bitalino.BITalino.read`, and an array of bool telling whether the CRC of each frame matches
+        """
+        number_bytes = frameSize(nChannels)
+        nFrames = len(data)//number_bytes
+        values = numpy.zeros((nFrames, 5 + nChannels), dtype='int64')
+        valid = numpy.zeros(nFrames, dtype=bool)
+        for i in range(nFrames):
+            values[i], valid[i] = self.decodeFrame(data[i*number_bytes:(i+1)*number_bytes], nChannels)
+        return values, valid
+
+class VectorDecoder(ReferenceDecoder):
+    """
+    numpy decoder, over all the frames of a block at once.
+    """
+    name = 'numpy'
+
+    def decode(self, data, nChannels):
+        number_bytes = frameSize(nChannels)
+        nFrames = len(data)//number_bytes
+        d = numpy.frombuffer(data, dtype='uint8', count=nFrames*number_bytes).reshape(nFrames, number_bytes)
+        crc = d[:, -1] & 0x0F
+        x = numpy.zeros(nFrames, dtype='uint8')
+        for i in range(number_bytes - 1):
+            x = CRC_TABLE[x, d[:, i]]
+        x = CRC_TABLE[x, d[:, -1] & 0xF0]
+        # Widened so that shifting left does not overflow
+        d = d.astype('int64')
+        values = numpy.empty((nFrames, 5 + nChannels), dtype='int64')
+        values[:, 0] = d[:, -1] >> 4
+        for i in range(4):
+            values[:, 1+i] = d[:, -2] >> (7-i) & 0x01
+        if nChannels > 0:
+            values[:, 5] = ((d[:, -2] & 0x0F) << 6) | (d[:, -3] >> 2)
+        if nChannels > 1:
+            values[:, 6] = ((d[:, -3] & 0x03) << 8) | d[:, -4]
+        if nChannels > 2:
+            values[:, 7] = (d[:, -5] << 2) | (d[:, -6] >> 6)
+        if nChannels > 3:
+            values[:, 8] = ((d[:, -6] & 0x3F) << 4) | (d[:, -7] >> 4)
+        if nChannels > 4:
+            values[:, 9] = ((d[:, -7] & 0x0F) << 2) | (d[:, -8] >> 6)
+        if nChannels > 5:
+            values[:, 10] = d[:, -8] & 0x3F
+        return values, crc == x
+
+decoders = {ReferenceDecoder.name: ReferenceDecoder(), VectorDecoder.name: VectorDecoder()}
+
+default = decoders.get(os.environ.get('BITALINO_DECODER', VectorDecoder.name), decoders[VectorDecoder.name])
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: errors
+   :synopsis: Messages of the exceptions raised by the BITalino API
+"""
+
+class ExceptionCode():
+    INVALID_ADDRESS = "The specified address is invalid."
+    INVALID_PLATFORM= "This platform does not support bluetooth connection."
+    CONTACTING_DEVICE = "The computer lost communication with the device."
+    DEVICE_NOT_IDLE = "The device is not idle."
+    DEVICE_NOT_IN_ACQUISITION = "The device is not in acquisition mode."
+    INVALID_PARAMETER = "Invalid parameter."
+    INVALID_VERSION = "Only available for Bitalino 2.0."
+    IMPORT_FAILED = "Please connect using the Virtual COM Port or confirm that PyBluez is installed; bluetooth wrapper failed to import with error: "
+    SERIAL_IMPORT_FAILED = "Please confirm that pySerial is installed; serial port wrapper failed to import with error: "
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: metrics
+   :synopsis: Low-overhead counters and histograms exposed in the Prometheus text format
+
+*Created on Mon Oct 19 2026*
+"""
+
+import bisect
+
+# Default buckets (seconds) for the timing histograms, from 10 us to 1 s
+TIME_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.)
+
+def formatLabels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels) + '}'
+
+class Counter(object):
+    """
+    :param function: callable returning the current value, to be used instead of :meth:`inc`
+    :type function: callable or None
+
+    Monotonically increasing value. Increments are plain attribute updates, so that counting in the acquisition
+    loop costs no more than an addition.
+    """
+    kind = 'counter'
+
+    def __init__(self, function = None):
+        self.value = 0
+        self.function = function
+
+    def inc(self, amount = 1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        value = self.function() if self.function else self.value
+        return [(name, labels, value)]
+
+class Gauge(Counter):
+    """
+    Value that can go up and down.
+    """
+    kind = 'gauge'
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount = 1):
+        self.value -= amount
+
+class Histogram(object):
+    """
+    :param buckets: upper bounds of the buckets, in ascending order
+    :type buckets: tuple of float
+
+    Distribution of observed values over fixed buckets. Observing a value is a single bisection and two additions.
+    """
+    kind = 'histogram'
+
+    def __init__(self, buckets = TIME_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0]*(len(self.buckets)+1)
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        res = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            res.append((name + '_bucket', labels + (('le', le),), cumulative))
+        res.append((name + '_sum', labels, self.sum))
+        res.append((name + '_count', labels, self.count))
+        return res
+
+class Family(object):
+    """
+    :param name: metric name
+    :type name: str
+    :param documentation: help text
+    :type documentation: str
+    :param metric: class of the metric (:class:`Counter`, :class:`Gauge` or :class:`Histogram`)
+    :param labelnames: names of the labels that distinguish each child of the family
+    :type labelnames: tuple of str
+
+    Group of metrics sharing a name, one per combination of label values. A family without labels proxies the
+    methods of its single child, so it can be used directly as a metric.
+    """
+    def __init__(self, name, documentation, metric, labelnames = (), **kwargs):
+        self.name = name
+        self.documentation = documentation
+        self.metric = metric
+        self.labelnames = tuple(labelnames)
+        self.kwargs = kwargs
+        self.children = {}
+        if not self.labelnames:
+            self.children[()] = metric(**kwargs)
+
+    def labels(self, *values):
+        """
+        :param values: one value for each of the label names, in order
+        :returns: the metric for that combination of labels, created on first use
+        """
+        key = tuple(str(v) for v in values)
+        if key not in self.children:
+            self.children[key] = self.metric(**self.kwargs)
+        return self.children[key]
+
+    def remove(self, *values):
+        self.children.pop(tuple(str(v) for v in values), None)
+
+    def __getattr__(self, attr):
+        if attr == 'children' or () not in self.children:
+            raise AttributeError(attr)
+        return getattr(self.children[()], attr)
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.documentation), '# TYPE %s %s' % (self.name, self.metric.kind)]
+        for key, child in list(self.children.items()):
+            for name, labels, value in child.samples(self.name, tuple(zip(self.labelnames, key))):
+                lines.append('%s%s %s' % (name, formatLabels(labels), repr(float(value))))
+        return '\n'.join(lines)
+
+class Registry(object):
+    """
+    Collection of metric families rendered together on the ``/metrics`` route.
+    """
+    def __init__(self):
+        self.families = []
+
+    def register(self, name, documentation, metric, labelnames = (), **kwargs):
+        family = Family(name, documentation, metric, labelnames, **kwargs)
+        self.families.append(family)
+        return family
+
+    def counter(self, name, documentation, labelnames = (), **kwargs):
+        return self.register(name, documentation, Counter, labelnames, **kwargs)
+
+    def gauge(self, name, documentation, labelnames = (), **kwargs):
+        return self.register(name, documentation, Gauge, labelnames, **kwargs)
+
+    def histogram(self, name, documentation, labelnames = (), **kwargs):
+        return self.register(name, documentation, Histogram, labelnames, **kwargs)
+
+    def render(self):
+        """
+        :returns: `str` with all metrics in the Prometheus text exposition format
+        """
+        return '\n'.join(family.render() for family in self.families) + '\n'
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
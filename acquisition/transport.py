@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: transport
+   :synopsis: Links over which the BITalino API talks to a device
+
+*Created on Mon Oct 19 2026*
+
+A transport moves bytes to and from a device, and knows nothing of frames or commands. PyBluez and pySerial are
+only imported by the transport that needs them, when it connects. Any object with the same
+methods as :class:`Transport` can be given to :class:`bitalino.BITalino`, e.g. to replay a recording or to
+generate frames in software; otherwise one is chosen from the address by :func:`connect`.
+"""
+
+import platform
+import re
+import select
+import time
+
+from .errors import ExceptionCode
+
+MAC_ADDRESS = re.compile('^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$')
+
+class Transport(object):
+    """
+    :param timeout: maximum amount of time (seconds) elapsed while waiting for the device to respond, or None to
+                    wait forever
+    :type timeout: int, float or None
+    """
+    # Whether the device is reached through a serial port (e.g. a Virtual COM Port)
+    serial = False
+
+    def __init__(self, timeout = None):
+        self.timeout = timeout
+
+    def write(self, data):
+        """
+        :param data: binary data
+        :type data: bytes
+        """
+        raise NotImplementedError
+
+    def receive(self, nbytes):
+        """
+        :param nbytes: number of bytes to retrieve
+        :type nbytes: int
+        :return: binary data with length of `nbytes`
+        :raises Exception: lost communication with the device when timeout is reached
+        """
+        data = bytearray()
+        while len(data) < nbytes:
+            data += self.receiveAvailable(nbytes - len(data))
+        return data
+
+    def receiveAvailable(self, limit = 1024):
+        """
+        :param limit: maximum number of bytes to retrieve
+        :type limit: int
+        :return: binary data
+        :raises Exception: lost communication with the device when timeout is reached
+
+        Retrieves the bytes already received from the device, waiting for at least one.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class BluetoothTransport(Transport):
+    """
+    :param macAddress: MAC address of the device
+    :type macAddress: str
+
+    RFCOMM link through PyBluez, on Windows and GNU/Linux.
+    """
+    def __init__(self, macAddress, timeout = None):
+        Transport.__init__(self, timeout)
+        if platform.system() == 'Windows' or platform.system() == 'Linux':
+            try:
+                import bluetooth
+            except Exception as e:
+                raise Exception(ExceptionCode.IMPORT_FAILED + str(e))
+            self.socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+            self.socket.settimeout(timeout)
+            self.socket.connect((macAddress, 1))
+            self.socket.settimeout(None)
+        else:
+            raise Exception(ExceptionCode.INVALID_PLATFORM)
+
+    def write(self, data):
+        self.socket.send(data)
+
+    def receiveAvailable(self, limit = 1024):
+        if self.timeout is not None:
+            ready = select.select([self.socket], [], [], self.timeout)
+            if not ready[0]:
+                raise Exception(ExceptionCode.CONTACTING_DEVICE)
+        return self.socket.recv(limit)
+
+    def close(self):
+        self.socket.close()
+
+class SerialTransport(Transport):
+    """
+    :param port: serial port of the device, e.g. ``COM3`` on Windows or ``/dev/tty.bitalino-DevB`` on Mac OS X
+    :type port: str
+    """
+    serial = True
+
+    def __init__(self, port, timeout = None):
+        Transport.__init__(self, timeout)
+        try:
+            import serial
+        except Exception as e:
+            raise Exception(ExceptionCode.SERIAL_IMPORT_FAILED + str(e))
+        self.socket = serial.Serial(port, 115200)
+
+    def write(self, data):
+        self.socket.write(data)
+
+    def receiveAvailable(self, limit = 1024):
+        if self.timeout is not None:
+            initTime = time.time()
+            while self.socket.inWaiting() < 1:
+                if (time.time() - initTime) > self.timeout:
+                    raise Exception(ExceptionCode.CONTACTING_DEVICE)
+        return self.socket.read(min(max(self.socket.inWaiting(), 1), limit))
+
+    def close(self):
+        self.socket.close()
+
+def connect(address, timeout = None):
+    """
+    :param address: MAC address or serial port of the device
+    :type address: str
+    :param timeout: maximum amount of time (seconds) elapsed while waiting for the device to respond
+    :type timeout: int, float or None
+    :returns: transport to the device
+    :raises Exception: invalid MAC address or serial port
+    """
+    if MAC_ADDRESS.match(address):
+        return BluetoothTransport(address, timeout)
+    elif (address[0:3] == 'COM' and platform.system() == 'Windows') or (address[0:5] == '/dev/' and platform.system() != 'Windows'):
+        return SerialTransport(address, timeout)
+    else:
+        raise Exception(ExceptionCode.INVALID_ADDRESS)
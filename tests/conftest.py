@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The acquisition package sits at the root of the repository, which is not installed, and the modules of the
+# tornado server next to ServerBIT.py, which is run from its own folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tornado-ws'))
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the delays between the attempts to reconnect to a device.
+"""
+
+import pytest
+
+from backoff import Backoff
+
+def test_delays_grow_up_to_the_maximum():
+    backoff = Backoff(initial=0.1, maximum=1., factor=2.)
+    delays = [backoff.delay() for i in range(7)]
+    assert delays == [0., 0.1, 0.2, 0.4, 0.8, 1., 1.]
+
+def test_reset_starts_over_with_an_immediate_attempt():
+    backoff = Backoff()
+    for i in range(10):
+        backoff.delay()
+    assert backoff.delay() == 5.
+    backoff.reset()
+    assert [backoff.delay() for i in range(3)] == [0., 0.1, 0.2]
+
+@pytest.mark.parametrize('factor, delays', [(1., [0., 0.5, 0.5, 0.5]), (3., [0., 0.5, 1.5, 2.])])
+def test_factor(factor, delays):
+    backoff = Backoff(initial=0.5, maximum=2., factor=factor)
+    assert [backoff.delay() for i in range(4)] == delays
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Pins what a slow client is sent under each backpressure policy.
+"""
+
+import json
+
+import pytest
+
+from backpressure import Backpressure, merge
+
+def block(sampleIndex, values):
+    return json.dumps({'sampleIndex': sampleIndex, 'droppedSamples': 0, 'drift': 0., 'nSeq': values}), len(values)
+
+def test_merge_keeps_events_apart():
+    event = json.dumps({'event': 'on', 'trigger': [1, 0], 'data': [3, 4], 'sampleIndex': 2}), 0
+    messages = merge([block(0, [0, 1]), block(2, [2, 3]), event, block(4, [4])])
+    assert [json.loads(res) for res in messages] == [
+        {'sampleIndex': 0, 'droppedSamples': 0, 'drift': 0., 'nSeq': [0, 1, 2, 3]},
+        json.loads(event[0]),
+        json.loads(block(4, [4])[0])]
+
+def test_merge_policy_releases_held_messages_in_order():
+    backpressure = Backpressure(watermark=1000, policy='merge')
+    backpressure.written(1000)
+    gap = json.dumps({'gap': 'lost', 'sampleIndex': 3}), 0
+    for res, nSamples in [block(0, [0, 1]), gap, block(3, [3])]:
+        assert backpressure.offer(res, nSamples) == []
+    released = backpressure.flushed(1000)
+    assert [json.loads(res).get('gap') for res in released] == [None, 'lost', None]
+    assert [json.loads(res)['sampleIndex'] for res in released] == [0, 3, 3]
+
+GAP = json.dumps({'gap': 'lost', 'sampleIndex': 3}), 0
+
+@pytest.mark.parametrize('policy', ['skip', 'downsample'])
+def test_messages_without_samples_pass_over_the_limit(policy):
+    backpressure = Backpressure(watermark=100, policy=policy)
+    backpressure.written(400)
+    assert backpressure.offer(*block(0, [0, 1])) == []
+    assert backpressure.offer(*GAP) == [GAP[0]]
+
+def test_merge_policy_never_drops_messages_without_samples():
+    observed = []
+    backpressure = Backpressure(watermark=100, policy='merge', observer=lambda action, n: observed.append((action, n)))
+    backpressure.written(400)
+    backpressure.offer(*GAP)
+    for i in range(10):
+        assert backpressure.offer(*block(i, [i])) == []
+    released = backpressure.flushed(400)
+    assert released[0] == GAP[0]
+    dropped = sum(n for action, n in observed if action == 'dropped')
+    assert dropped > 0 and dropped + len(json.loads(released[-1])['nSeq']) == 10
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Pins what the BITalino API reads from and writes to a device, over a transport that replays recorded bytes.
+"""
+
+import time
+
+import pytest
+
+from acquisition.bitalino import BITalino, ExceptionCode
+from acquisition.decoder import crc4, decoders
+from acquisition.transport import Transport
+
+from test_decoder import FRAMES
+
+class ReplayTransport(Transport):
+    """
+    Replies with canned bytes, at most `chunk` bytes at a time, and keeps what is written.
+    """
+    def __init__(self, replies = b'', chunk = 1024):
+        Transport.__init__(self, timeout=0.)
+        self.replies = bytearray(replies)
+        self.chunk = chunk
+        self.written = bytearray()
+
+    def write(self, data):
+        self.written += data
+
+    def receiveAvailable(self, limit = 1024):
+        if not self.replies:
+            raise Exception(ExceptionCode.CONTACTING_DEVICE)
+        data = bytes(self.replies[:min(limit, self.chunk)])
+        del self.replies[:len(data)]
+        return data
+
+@pytest.fixture(params=sorted(decoders))
+def device(request):
+    device = BITalino('replay', link=ReplayTransport(), version='BITalino_v5.2')
+    device.decoder = decoders[request.param]
+    device.commandInterval = 0.
+    return device
+
+def test_version():
+    link = ReplayTransport(b'\x12\x34BITalino_v5.2\n', chunk=3)
+    device = BITalino('replay', link=link)
+    assert link.written == b'\x07'
+    assert device.versionString == 'BITalino_v5.2'
+    assert device.isBitalino2
+    assert device.capabilities()['features'] == ['idle', 'pwm', 'state', 'triggerWhileIdle']
+    assert not BITalino('replay', link=ReplayTransport(), version='BITalino_v3.1').isBitalino2
+
+def test_commands(device):
+    device.start(1000, [0, 1, 2, 3, 4, 5])
+    device.trigger([1, 0])
+    device.triggerSequence([[0, 1], [1, 1]], 0)
+    assert bytes(device.link.written) == bytes(bytearray([0xC3, 0xFD, 0xB7, 0xBB, 0xBF]))
+
+def test_commands_are_never_sent_back_to_back(device):
+    writes = []
+    device.write = lambda data: writes.append((time.time(), data))
+    device.triggerSequence([[0, 1], [1, 1], [0, 0]], 0)
+    assert [data for writeTime, data in writes] == [b'\xBB', b'\xBF', b'\xB3']
+    assert all(b - a >= 0.0009 for (a, x), (b, y) in zip(writes, writes[1:]))
+
+def test_read(device):
+    device.link.replies += b''.join(bytes.fromhex(frame) for frame, expected in FRAMES[:3]*4)
+    device.start(1000, [0, 1, 2, 3, 4, 5])
+    data = device.read(12)
+    assert data.shape == (12, 11)
+    assert data.tolist() == [expected for frame, expected in FRAMES[:3]]*4
+    assert device.bytesReceived == 96
+
+def test_read_crc_mismatch(device):
+    device.link.replies += bytes.fromhex(FRAMES[2][0][:-2] + '00')
+    device.start(1000, [0, 1, 2, 3, 4, 5])
+    with pytest.raises(Exception) as error:
+        device.read(1)
+    assert str(error.value) == ExceptionCode.CONTACTING_DEVICE
+    assert device.crcErrors == 1
+
+def test_read_frames_resync(device):
+    frames = [bytes.fromhex(frame) for frame, expected in FRAMES[1:3]]
+    device.link.replies += frames[0] + b'\x00' + frames[1] + frames[0]
+    device.link.chunk = 5
+    device.start(1000, [0, 1, 2, 3, 4, 5])
+    data = device.readFrames(3)
+    assert data == [FRAMES[1][1], FRAMES[2][1], FRAMES[1][1]]
+    assert device.resyncs == 1
+    assert device.crcErrors == 1
+    assert len(device.pending) == 0
+
+def test_state(device):
+    reply = bytearray([0x00, 0x02]*7 + [0x1E, 0xA0])
+    reply[-1] |= crc4(reply)
+    device.link.replies += bytes(reply)
+    state = device.state()
+    assert state == {'analogChannels': [512]*6, 'battery': 512, 'batteryThreshold': 30, 'digitalChannels': [1, 0, 1, 0]}
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the block size chosen for a latency target, from the costs measured of each stage, and its clamping.
+"""
+
+import pytest
+
+from blocksize import BlockSizer, LinearCost
+
+def measured(sizer, intercept, slope, sizes = range(50, 400, 10)):
+    """
+    Reports a stage costing `intercept` seconds per block and `slope` seconds per sample, over blocks of `sizes`.
+    """
+    for nSamples in sizes:
+        sizer.observe('encode', nSamples, intercept + slope*nSamples)
+    return sizer
+
+@pytest.mark.parametrize('SamplingRate, latency, maxSamples, nSamples', [(1000, 0.25, None, 250), (1000, 5., None, 1000),
+                                                                        (1000, 5., 4000, 4000), (1, 0.25, None, 1),
+                                                                        (10, 0.01, None, 1)])
+def test_size_before_any_cost_is_clamped(SamplingRate, latency, maxSamples, nSamples):
+    sizer = BlockSizer(SamplingRate, latency, maxSamples)
+    assert sizer.nSamples == nSamples and sizer.size() == nSamples
+
+def test_largest_block_meeting_the_latency_target():
+    sizer = measured(BlockSizer(1000, 0.25), 0.05, 1e-4)
+    nSamples = sizer.size()
+    assert nSamples == 181
+    # It waits for its last sample and goes through the stage within the target, and one more sample would not
+    assert nSamples*1e-3 + 0.05 + nSamples*1e-4 <= 0.25 < (nSamples + 1)*1.1e-3 + 0.05
+
+def test_block_keeps_up_with_the_device_over_the_target():
+    # Each block costs 50 ms, which blocks of less than 50 samples at 1000 Hz could not keep up with
+    sizer = measured(BlockSizer(1000, 0.01), 0.05, 0.)
+    assert sizer.size() == 50
+
+def test_largest_block_if_the_device_cannot_be_kept_up_with():
+    sizer = measured(BlockSizer(1000, 0.25, 800), 0., 2e-3)
+    assert sizer.size() == 800
+
+def test_cost_of_blocks_of_one_size_is_taken_as_per_sample():
+    cost = LinearCost()
+    for i in range(10):
+        cost.observe(100, 0.02)
+    assert cost.coefficients() == (0., pytest.approx(2e-4))
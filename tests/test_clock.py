@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the running sample counter unwrapped from the 4-bit ``nSeq``, and its fit against the host clock.
+"""
+
+import pytest
+
+from clock import SampleClock
+
+def sequence(first, n):
+    return [(first + i) % 16 for i in range(n)]
+
+def test_counter_carries_on_across_the_wrap():
+    clock = SampleClock(1000)
+    info = clock.update([13, 14, 15, 0, 1], 0.)
+    assert list(info['indices']) == [0, 1, 2, 3, 4] and info['droppedSamples'] == 0
+    # The next block starts after the wrap too
+    info = clock.update([2, 3], 0.002)
+    assert info['sampleIndex'] == 5 and info['droppedSamples'] == 0
+
+@pytest.mark.parametrize('blocks, indices', [([[14, 15, 1, 2]], [0, 1, 3, 4]),
+                                             ([[14, 15], [2, 3]], [0, 1, 4, 5])])
+def test_skipped_nseq_is_counted_as_dropped(blocks, indices):
+    clock = SampleClock(1000)
+    received = []
+    for nSeq in blocks:
+        received += list(clock.update(nSeq, 0.)['indices'])
+    assert received == indices
+    assert clock.dropped == indices[-1] + 1 - len(indices) and clock.count == indices[-1] + 1
+
+def test_slope_is_fitted_against_a_drifting_clock():
+    # The device samples 100 ppm slower than its nominal rate
+    period = 1e-3*(1 + 100e-6)
+    clock = SampleClock(1000)
+    for block in range(100):
+        first = 100*block
+        clock.update(sequence(first, 100), 5. + (first + 99)*period)
+    assert clock.period() == pytest.approx(period, rel=1e-9)
+    assert clock.drift() == pytest.approx(100., abs=0.01)
+    assert clock.timestamp(2500) == pytest.approx(5. + 2500*period)
+    assert clock.index(5. + 7000*period) == 7000
+
+def test_nominal_period_until_a_second_is_seen():
+    clock = SampleClock(1000)
+    clock.update(sequence(0, 100), 0.2)
+    clock.update(sequence(100, 100), 0.3)
+    assert clock.period() == 1e-3 and clock.drift() == 0.
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the decoding of BITalino frames, for every number of analog channels and both decoder backends.
+"""
+
+import random
+
+import numpy
+import pytest
+
+from acquisition.decoder import crc4, decoders, frameSize
+
+# Frames as sent by the device, and the sequence number, digital and analog channels they carry
+FRAMES = [
+    ('0000000000000000', [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
+    ('fffffffffffffff0', [15, 1, 1, 1, 1, 1023, 1023, 1023, 1023, 63, 63]),
+    ('81da04fa0300a856', [5, 1, 0, 1, 0, 512, 3, 1000, 77, 42, 1]),
+    ('f05a9e', [9, 0, 1, 0, 1, 700]),
+    ('c8909131', [3, 1, 0, 0, 1, 100, 200]),
+    ('4008162c30c2', [12, 0, 0, 1, 1, 11, 22, 33]),
+    ('40c0000204c072', [7, 1, 1, 0, 0, 1, 2, 3, 4]),
+    ('c0c8e5af22176e18', [1, 0, 1, 1, 0, 901, 802, 703, 604, 35]),
+]
+
+BACKENDS = sorted(decoders)
+
+def test_frame_size():
+    assert [frameSize(n) for n in range(1, 7)] == [3, 4, 6, 7, 8, 8]
+
+@pytest.mark.parametrize('name', BACKENDS)
+@pytest.mark.parametrize('frame, expected', FRAMES)
+def test_decode_frame(name, frame, expected):
+    data = bytes.fromhex(frame)
+    values, valid = decoders[name].decode(data, len(expected) - 5)
+    assert values.tolist() == [expected]
+    assert valid.tolist() == [True]
+
+@pytest.mark.parametrize('name', BACKENDS)
+@pytest.mark.parametrize('frame, expected', FRAMES)
+def test_crc_mismatch(name, frame, expected):
+    data = bytearray.fromhex(frame)
+    data[0] ^= 0x10
+    values, valid = decoders[name].decode(bytes(data), len(expected) - 5)
+    assert valid.tolist() == [False]
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_decode_block(name):
+    data = b''.join(bytes.fromhex(frame) for frame, expected in FRAMES[:3]*50)
+    values, valid = decoders[name].decode(data + b'\x01\x02', 6)
+    assert values.shape == (150, 11)
+    assert valid.all()
+    assert values[::3].tolist() == [FRAMES[0][1]]*50
+    assert values[2::3].tolist() == [FRAMES[2][1]]*50
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_decode_views(name):
+    data = bytearray.fromhex(FRAMES[1][0] + FRAMES[2][0])
+    values, valid = decoders[name].decode(memoryview(data)[8:], 6)
+    assert values.tolist() == [FRAMES[2][1]]
+
+@pytest.mark.parametrize('nChannels', range(1, 7))
+def test_backends_agree(nChannels):
+    generator = random.Random(nChannels)
+    data = bytes(bytearray(generator.getrandbits(8) for i in range(frameSize(nChannels)*2000)))
+    reference, referenceValid = decoders['reference'].decode(data, nChannels)
+    vector, vectorValid = decoders['numpy'].decode(data, nChannels)
+    assert numpy.array_equal(reference, vector)
+    assert numpy.array_equal(referenceValid, vectorValid)
+    # Random bytes match the 4-bit CRC about once in 16
+    assert 0.03 < referenceValid.mean() < 0.1
+
+def test_crc4():
+    assert crc4([0]*8) == 0
+    assert crc4(list(bytes.fromhex('81da04fa0300a850'))) == 0x6
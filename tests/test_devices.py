@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the connection to a device by :mod:`devices`, with a synthetic device standing in for hardware.
+"""
+
+import devices
+
+def test_synthetic_device_is_only_imported_when_connected_to():
+    assert 'SyntheticBITalino' not in vars(devices)
+    device = devices.connect('synthetic', 0.5)
+    assert device.timeout == 0.5 and device.commands == [7]
+
+def test_synthetic_device_of_known_version_skips_the_handshake(tmp_path):
+    cache = devices.DeviceCache(str(tmp_path / 'devices.json'))
+    device = devices.connect('synthetic-old', 0.5, 'BITalino_v3.1', cache)
+    assert device.commands == [] and not device.isBitalino2
+    assert cache.get('synthetic-old')['version'] == 'BITalino_v3.1'
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Pins how events are stamped against the sample counter, and triggers aligned with the digital outputs.
+"""
+
+import numpy
+import pytest
+
+from clock import SampleClock, monotonic
+from events import EventChannel, EventLog, checkTrigger
+
+class Device(object):
+    def __init__(self):
+        self.sent = []
+
+    def triggerCommand(self, digitalArray):
+        return 0xB3 | (digitalArray[0] << 2) | (digitalArray[1] << 3)
+
+    def send(self, data):
+        self.sent.append(data)
+
+def block(clock, first, outputs, hostTime):
+    """
+    :returns: running indices and samples of 10 samples from `first`, with the outputs O1 and O2 of each
+    """
+    info = clock.update(numpy.arange(first, first + 10) % 16, hostTime)
+    samples = numpy.zeros((10, 6), dtype='int64')
+    samples[:, 3:5] = outputs
+    return info['indices'], samples
+
+def test_events_are_stamped_in_order_of_their_samples():
+    clock, channel = SampleClock(100), EventChannel()
+    indices, samples = block(clock, 0, [0, 0], 10.09)
+    channel.post('late', hostTime=10.07).result()
+    channel.post('early', {'n': 1}, hostTime=10.02).result()
+    events = channel.stamp(clock, indices, samples)
+    assert [(e['event'], e['id'], e['sampleIndex']) for e in events] == [('early', 0, 2), ('late', 1, 7)]
+    assert events[0]['data'] == {'n': 1} and events[0]['timestamp'] == pytest.approx(10.02)
+    assert channel.stamp(clock, indices, samples) == []
+
+def test_trigger_is_stamped_at_the_change_of_the_outputs():
+    clock, channel = SampleClock(100), EventChannel()
+    channel.device = device = Device()
+    now = monotonic()
+    indices, samples = block(clock, 0, [0, 0], now)
+    channel.post('on', trigger=[1, 0]).result()
+    assert device.sent == [0xB7]
+    assert channel.stamp(clock, indices, samples) == []
+    indices, samples = block(clock, 10, [0, 0], now + 0.1)
+    samples[4:, 3] = 1
+    events = channel.stamp(clock, indices, samples)
+    assert [(e['event'], e['sampleIndex'], e['aligned'], e['trigger']) for e in events] == [('on', 14, True, [1, 0])]
+
+def test_four_output_trigger_ignores_the_inputs():
+    clock, channel = SampleClock(100), EventChannel()
+    channel.device = Device()
+    now = monotonic()
+    indices, samples = block(clock, 0, [0, 0], now)
+    channel.post('on', trigger=[0, 1, 1, 0]).result()
+    channel.stamp(clock, indices, samples)
+    indices, samples = block(clock, 10, [0, 0], now + 0.1)
+    # Inputs I1 and I2 switching on their own, and O2 set from sample 16 on
+    samples[:, 1:3] = [[i % 2, 1] for i in range(10)]
+    samples[6:, 4] = 1
+    events = channel.stamp(clock, indices, samples)
+    assert [(e['sampleIndex'], e['aligned']) for e in events] == [(16, True)]
+
+def test_trigger_without_change_is_given_up_after_the_window():
+    clock, channel = SampleClock(100), EventChannel(window=0.05)
+    channel.device = Device()
+    now = monotonic()
+    indices, samples = block(clock, 0, [0, 0], now)
+    channel.post('on', trigger=[1, 0]).result()
+    channel.stamp(clock, indices, samples)
+    events = []
+    for first in range(10, 60, 10):
+        events += channel.stamp(clock, *block(clock, first, [0, 0], now + first/100.))
+    assert [(e['event'], e['aligned']) for e in events] == [('on', False)]
+
+def test_trigger_fails_without_acquisition():
+    with pytest.raises(Exception):
+        EventChannel().post('on', trigger=[1, 0]).result()
+
+@pytest.mark.parametrize('trigger', ['x', [None], 1, [1, 2], [1, 0, 1], ['1', '0']])
+def test_malformed_trigger_is_refused_when_posted(trigger):
+    with pytest.raises(ValueError):
+        checkTrigger(trigger)
+    with pytest.raises(ValueError):
+        EventChannel().post('on', trigger=trigger)
+
+def test_log_finds_events_by_sample(tmp_path):
+    log = EventLog(str(tmp_path))
+    for i, (label, sampleIndex) in enumerate([('a', 5), ('b', 20), ('a', 12)]):
+        log.write({'event': label, 'id': i, 'sampleIndex': sampleIndex})
+    log.close()
+    log = EventLog(str(tmp_path))
+    assert [e['id'] for e in log.find()] == [0, 2, 1]
+    assert [e['id'] for e in log.find('a', 6)] == [2]
+    assert [e['id'] for e in log.find(start=5, end=20)] == [0, 2]
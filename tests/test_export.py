@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Pins that a session exported by blocks read in parallel is the same as when read in order.
+"""
+
+import concurrent.futures
+import os
+
+import numpy
+import pytest
+
+import export
+from recording import Recorder, Recording
+
+@pytest.fixture
+def session(tmp_path):
+    path = os.path.join(str(tmp_path), 'synthetic-20261019-101500')
+    recorder = Recorder(path, ['nSeq', 'A1'], 1000, chunkSamples=500)
+    rng = numpy.random.default_rng(0)
+    first = 60000
+    for i in range(40):
+        n = int(rng.integers(1, 300))
+        # Samples missed now and then, which end the chunk
+        first += 77 if i % 7 == 3 else 0
+        recorder.write(numpy.arange(first, first + n), rng.integers(0, 1024, (n, 2)))
+        first += n
+    recorder.close()
+    return path
+
+@pytest.mark.parametrize('format', ['npy', 'hdf5', 'parquet'])
+def test_blocks_read_in_parallel_are_written_in_order(session, tmp_path, format):
+    if format == 'hdf5':
+        pytest.importorskip('h5py')
+    elif format == 'parquet':
+        pytest.importorskip('pyarrow')
+    recording = Recording(session)
+    indices, values = recording.read(1, 0, recording.end())
+    output = os.path.join(str(tmp_path), 'export')
+    os.mkdir(output)
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        target, nRows = export.export(session, format, output, rows=1000, pool=pool, ahead=1)
+    assert nRows == len(indices)
+    if format == 'npy':
+        columns = [numpy.load(os.path.join(target, name + '.npy')) for name in ('sampleIndex', 'A1')]
+    elif format == 'hdf5':
+        import h5py
+        with h5py.File(target, 'r') as f:
+            columns = [f['sampleIndex'][:], f['A1'][:]]
+    else:
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(target)
+        columns = [table['sampleIndex'].to_numpy(), table['A1'].to_numpy()]
+    assert columns[0].tolist() == indices.tolist() and columns[1].tolist() == values.tolist()
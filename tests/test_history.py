@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the history given to the clients that ask for it, across the wrap of its ring and beyond what it keeps.
+"""
+
+import json
+
+import numpy
+import pytest
+
+from history import History
+
+def block(first, n):
+    indices = numpy.arange(first, first + n)
+    return indices, numpy.column_stack([indices % 16, indices*2])
+
+@pytest.fixture
+def history():
+    """
+    History of 10 samples, at 10 Hz, whose ring has wrapped: samples 5 to 14 are kept.
+    """
+    history = History(['nSeq', 'A1'], 10, seconds=1)
+    history.write(*block(0, 7))
+    history.write(*block(7, 8))
+    return history
+
+def indices(res):
+    message = json.loads(res)
+    return list(range(message['sampleIndex'], message['sampleIndex'] + len(message['A1'])))
+
+def test_since_across_the_wrap(history):
+    message = json.loads(history.message(since=8))
+    assert message['history'] and message['gaps'] == []
+    assert message['sampleIndex'] == 8 and message['A1'] == [2*i for i in range(8, 15)]
+
+def test_last_seconds_across_the_wrap(history):
+    assert indices(history.message(last=0.5)) == list(range(10, 15))
+    assert indices(history.message(last=5)) == list(range(5, 15))
+
+def test_since_already_evicted_starts_at_the_oldest_kept(history):
+    assert indices(history.message(since=2)) == list(range(5, 15))
+
+def test_since_not_acquired_yet_is_empty(history):
+    message = json.loads(history.message(since=20))
+    assert message['sampleIndex'] == 15 and message['A1'] == []
+
+def test_gaps_within_the_history(history):
+    history.write(*block(18, 2))
+    message = json.loads(history.message(since=12))
+    assert message['gaps'] == [[15, 3]] and message['A1'] == [24, 26, 28, 36, 38]
+
+def test_message_is_shared_until_the_next_block(history):
+    assert history.message(since=8) is history.message(since=8)
+    history.write(*block(15, 1))
+    assert json.loads(history.message(since=8))['A1'][-1] == 30
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Pins what a consumer receives from the LSL outlet of a device, through the in-process stand-in for pylsl.
+"""
+
+import numpy
+import pytest
+
+import lslocal
+import lsloutlet
+from clock import monotonic
+
+LABELS = ["nSeq", "I1", "I2", "O1", "O2", "A1", "A2"]
+
+@pytest.fixture
+def outlet(monkeypatch):
+    monkeypatch.setattr(lsloutlet, 'lsl', lslocal)
+    return lsloutlet.DeviceOutlet('test-outlet', LABELS, 100)
+
+def test_stream_describes_the_channels(outlet):
+    info, = lslocal.resolve_byprop('source_id', 'serverbit-test-outlet', timeout=0)
+    assert (info.name(), info.type(), info.channel_count(), info.nominal_srate()) == ('BITalino test-outlet', 'BITalino', 7, 100.)
+    channel, found = info.desc().child('channels').child('channel'), []
+    while not channel.empty():
+        found.append((channel.child_value('label'), channel.child_value('type')))
+        channel = channel.next_sibling()
+    assert found == [('nSeq', 'sequence'), ('I1', 'digital'), ('I2', 'digital'), ('O1', 'digital'), ('O2', 'digital'),
+                     ('A1', 'analog'), ('A2', 'analog')]
+
+def test_blocks_arrive_with_their_samples_and_timestamps(outlet):
+    info, = lslocal.resolve_byprop('source_id', 'serverbit-test-outlet', timeout=0)
+    inlet = lslocal.StreamInlet(info)
+    inlet.open_stream()
+    samples = numpy.arange(5*len(LABELS)).reshape(5, len(LABELS)) % 1024
+    now = monotonic()
+    outlet.push(samples[:3], now)
+    outlet.push(samples[3:], now + 0.02)
+    outlet.push(samples[:0], now + 0.03)
+    received, stamps = inlet.pull_chunk(timeout=1.)
+    assert received == samples.tolist()
+    # The last sample of each block at the time given, the others spaced back at the nominal rate
+    assert stamps == pytest.approx([now - 0.02, now - 0.01, now, now + 0.01, now + 0.02], abs=1e-6)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Pins that the stage timings are only changed under the lock summary() reads them with.
+"""
+
+import threading
+
+from profiler import Profiler
+
+def test_timings_wait_for_the_lock():
+    profiler = Profiler()
+    profiler.enabled = True
+    timed = profiler.wrap(lambda: None, 'timed')
+
+    def run():
+        profiler.record('recorded', 0.001)
+        timed()
+    with profiler.lock:
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive() and not profiler.timings
+    thread.join(10)
+    assert [line.split()[0] for line in profiler.summary().splitlines()] == ['stage', 'recorded', 'timed']
+
+def test_dump_from_the_thread_holding_the_lock(tmp_path):
+    profiler = Profiler()
+    profiler.enabled = True
+    profiler.record('recorded', 0.001)
+    # As SIGUSR2 does when it interrupts the main thread within record or a wrapped call
+    with profiler.lock:
+        files = profiler.dump(str(tmp_path / 'profile'))
+    assert 'recorded' in open(files[0]).read()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the framing of the raw TCP and UDP outputs, over sockets on the loopback interface.
+"""
+
+import asyncio
+import socket
+import struct
+
+from tornado import tcpclient, testing
+
+from rawstream import DatagramPublisher, StreamServer
+
+PAYLOADS = [b'{"sampleIndex":0,"A1":[1,2]}', b'{"sampleIndex":2,"A1":[3]}']
+
+async def until(condition):
+    for i in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('timed out')
+
+def unusedPort():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_tcp_messages_are_length_prefixed():
+    async def receive():
+        sock, port = testing.bind_unused_port()
+        server = StreamServer()
+        server.add_sockets([sock])
+        stream = await tcpclient.TCPClient().connect('127.0.0.1', port)
+        try:
+            await until(lambda: server.streams)
+            for payload in PAYLOADS:
+                server.publish(payload)
+            received = []
+            for payload in PAYLOADS:
+                size, = struct.unpack('>I', await stream.read_bytes(4))
+                received.append(await stream.read_bytes(size))
+            await until(lambda: server.sent == 2)
+            return received
+        finally:
+            stream.close()
+            server.stop()
+    assert asyncio.run(receive()) == PAYLOADS
+
+def test_tcp_client_behind_by_the_limit_is_skipped():
+    async def publish():
+        sock, port = testing.bind_unused_port()
+        server = StreamServer(limit=len(PAYLOADS[0]) + 4)
+        server.add_sockets([sock])
+        stream = await tcpclient.TCPClient().connect('127.0.0.1', port)
+        try:
+            await until(lambda: server.streams)
+            # Both written at once, before the first is sent
+            server.publish(PAYLOADS[0])
+            server.publish(PAYLOADS[1])
+            return server.dropped
+        finally:
+            stream.close()
+            server.stop()
+    assert asyncio.run(publish()) == 1
+
+def test_udp_datagrams_carry_a_sequence_number():
+    async def receive(consumer):
+        publisher = DatagramPublisher(port, address='127.0.0.1')
+        try:
+            publisher.publish(b'{"before":true}')
+            consumer.sendto(b'subscribe', ('127.0.0.1', port))
+            await until(lambda: publisher.subscribers)
+            for payload in PAYLOADS:
+                publisher.publish(payload)
+            return [consumer.recv(65536) for payload in PAYLOADS]
+        finally:
+            publisher.socket.close()
+    port = unusedPort()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as consumer:
+        consumer.settimeout(5)
+        datagrams = asyncio.run(receive(consumer))
+    # Numbered whether anyone is subscribed or not
+    assert [struct.unpack('>Q', datagram[:8])[0] for datagram in datagrams] == [1, 2]
+    assert [datagram[8:] for datagram in datagrams] == PAYLOADS
+
+def test_udp_subscription_expires():
+    async def publish(consumer):
+        publisher = DatagramPublisher(port, expiry=0., address='127.0.0.1')
+        try:
+            consumer.sendto(b'subscribe', ('127.0.0.1', port))
+            await until(lambda: publisher.subscribers)
+            publisher.publish(PAYLOADS[0])
+            return publisher.subscribers, publisher.sent
+        finally:
+            publisher.socket.close()
+    port = unusedPort()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as consumer:
+        assert asyncio.run(publish(consumer)) == ({}, 0)
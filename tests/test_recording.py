@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Pins range queries over recorded sessions, summarized from the samples or from the pyramid.
+"""
+
+import json
+import os
+import numpy
+import pytest
+
+import pyramid
+from recording import Recorder, Recording, sessions
+
+def record(path, first, n, SamplingRate = 1000):
+    recorder = Recorder(str(path), ['A1'], SamplingRate, chunkSamples=4096)
+    indices = numpy.arange(first, first + n)
+    recorder.write(indices, (indices % 1024).reshape(-1, 1))
+    recorder.close()
+    return Recording(str(path))
+
+def test_session_after_reconfiguration_is_queried_from_its_first_sample(tmp_path):
+    recording = record(tmp_path, 60000, 7000)
+    assert recording.meta['first_index'] == 60000
+    result = recording.query('A1', points=7)
+    assert result['sampleIndex'] == 60000 and result['level'] == 1000
+    assert None not in result['mean']
+    # Summarized from the samples themselves
+    result = recording.query('A1', 0, 0.01, points=10)
+    assert result['level'] == 1 and result['mean'] == [float(i % 1024) for i in range(60000, 60010)]
+
+def test_range_before_or_after_the_session_is_empty(tmp_path):
+    recording = record(tmp_path, 60000, 7000)
+    result = recording.query('A1', 10, 12, points=4)
+    assert result['mean'] == [None]*4
+    buckets, records = recording.summaries(100, 0, 10)
+    assert len(buckets) == 0 and len(records) == 0
+
+def test_session_without_first_index_starts_at_its_first_chunk(tmp_path):
+    record(tmp_path, 5000, 4096)
+    with open(os.path.join(str(tmp_path), 'meta.json')) as data_file:
+        meta = json.load(data_file)
+    del meta['first_index']
+    with open(os.path.join(str(tmp_path), 'meta.json'), 'w') as outfile:
+        json.dump(meta, outfile)
+    assert Recording(str(tmp_path)).origin() == 5000
+
+def test_partial_chunks_are_written_once_the_interval_has_passed(tmp_path):
+    recorder = Recorder(str(tmp_path), ['A1', 'A2'], 100, flushInterval=0)
+    for first in range(0, 15, 3):
+        recorder.write(numpy.arange(first, first + 3), [[i, 2*i] for i in range(first, first + 3)])
+    recording = Recording(str(tmp_path))
+    assert recording.chunks()['count'].tolist() == [3]*5
+    assert recording.read(1, 0, 15)[1].tolist() == [2*i for i in range(15)]
+    # The bucket of samples 10 to 14 is held back until the recording ends
+    buckets, records = pyramid.read(str(tmp_path), 10, 2, 0, 0, 2)
+    assert buckets.tolist() == [0] and records['count'].tolist() == [10]
+    recorder.close()
+    buckets, records = pyramid.read(str(tmp_path), 10, 2, 0, 0, 2)
+    assert records['count'].tolist() == [10, 5]
+    assert records['mean'][:, 0].tolist() == [4.5, 12.]
+
+def test_samples_are_held_until_the_interval_has_passed(tmp_path):
+    recorder = Recorder(str(tmp_path), ['A1'], 100, flushInterval=60)
+    recorder.write(numpy.arange(10), numpy.zeros((10, 1)))
+    assert len(Recording(str(tmp_path)).chunks()) == 0
+    recorder.close()
+    assert Recording(str(tmp_path)).chunks()['count'].tolist() == [10]
+
+@pytest.mark.parametrize('points', [0, -1, 10001])
+def test_query_refuses_points_out_of_range(tmp_path, points):
+    recording = record(tmp_path, 0, 1000)
+    with pytest.raises(ValueError):
+        recording.query('A1', points=points)
+    assert len(recording.query('A1', points=10000)['mean']) == 1000
+
+@pytest.mark.parametrize('before, after', [(-1, 1), (1, -1), (200, 101), (1e7, 0)])
+def test_window_around_an_event_is_bounded(tmp_path, before, after):
+    recording = record(tmp_path, 0, 1000)
+    recording.events.write({'event': 'on', 'id': 0, 'sampleIndex': 500})
+    with pytest.raises(ValueError):
+        recording.around('A1', 0, before, after)
+    assert len(recording.around('A1', 0, 200, 100)['values']) == 300001
+
+def test_sessions_keep_their_order_when_relabeled(tmp_path):
+    recorders = [Recorder(os.path.join(str(tmp_path), name), ['A1'], 100) for name in ('b-1', 'a-2', 'c-3')]
+    # meta.json of the oldest session is written again, after those of the others
+    recorders[0].relabel(['X1'])
+    for recorder in recorders:
+        recorder.close()
+    assert sessions(str(tmp_path)) == ['b-1', 'a-2', 'c-3']
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the acquisition loop of the tornado server, run from a synthetic device without the rest of the server, and the
+settings changed while it runs.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import queue
+import threading
+
+import pytest
+from tornado import httpclient, httpserver, testing, web
+
+import fanout
+import ServerBIT
+from backpressure import Backpressure
+from events import EventChannel
+from profiler import Profiler
+from recording import Recording, sessions
+from synthetic import SyntheticBITalino
+
+LABELS = ["nSeq", "I1", "I2", "O1", "O2", "A1", "A2", "A3", "A4", "A5", "A6"]
+
+class Stop(BaseException):
+    """
+    Ends the acquisition thread, as it is not an Exception, which would have the handler connect again.
+    """
+
+class CallbackLoop(object):
+    """
+    Stands for the IOLoop, keeping the callbacks scheduled; stops the acquisition thread after `limit` of them.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.callbacks = []
+        self.done = threading.Event()
+
+    def add_callback(self, callback, *args):
+        self.callbacks.append((callback, args))
+        if len(self.callbacks) >= self.limit:
+            self.done.set()
+            raise Stop()
+
+class ReconfiguringLoop(CallbackLoop):
+    """
+    Changes the settings of the acquisition once `after` callbacks have been scheduled.
+    """
+    def __init__(self, limit, after, update):
+        CallbackLoop.__init__(self, limit)
+        self.after = after
+        self.update = update
+
+    def add_callback(self, callback, *args):
+        if len(self.callbacks) + 1 == self.after:
+            ServerBIT.changes.put((self.update, 0))
+        CallbackLoop.add_callback(self, callback, *args)
+
+def acquire(*args):
+    try:
+        ServerBIT.BITalino_handler(*args)
+    except Stop:
+        pass
+
+def test_handler_without_serve(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setattr(ServerBIT, 'markers', None)
+    monkeypatch.setattr(ServerBIT, 'loop', CallbackLoop(5))
+    thread = threading.Thread(target=acquire,
+                              args=('synthetic', [1, 2], 1000, LABELS, 0.01, 1, SyntheticBITalino(realtime=False)))
+    thread.daemon = True
+    thread.start()
+    assert ServerBIT.loop.done.wait(10)
+    thread.join(10)
+    blocks = [args for callback, args in ServerBIT.loop.callbacks if callback is ServerBIT.send]
+    assert len(blocks) == 5
+    assert all(nSamples > 0 for res, readyTime, sizer, nSamples, samples in blocks)
+
+@pytest.fixture
+def running(monkeypatch):
+    """
+    Settings of ``config.json`` running, with the handlers restored afterwards.
+    """
+    with open(os.path.join(os.path.dirname(ServerBIT.__file__), 'config.json')) as data_file:
+        config = json.load(data_file)
+    for name in ('nodelay', 'watermark', 'policy'):
+        monkeypatch.setattr(ServerBIT.SocketHandler, name, getattr(ServerBIT.SocketHandler, name))
+    monkeypatch.setattr(ServerBIT.BITalino, 'decoder', ServerBIT.BITalino.decoder)
+    monkeypatch.setattr(ServerBIT.RecordingsHandler, 'directory', ServerBIT.RecordingsHandler.directory)
+    monkeypatch.setattr(ServerBIT.RecordingsHandler.cache, 'capacity', ServerBIT.RecordingsHandler.cache.capacity)
+    monkeypatch.setattr(ServerBIT, 'settings', dict(config))
+    monkeypatch.setattr(ServerBIT, 'changes', queue.Queue())
+    announced = []
+    monkeypatch.setattr(ServerBIT, 'announce', lambda update, sampleIndex = None: announced.append(update))
+    return config, announced
+
+def test_reconfigure_queues_acquisition_settings(running):
+    config, announced = running
+    restart = ServerBIT.reconfigure(dict(config, sampling_rate=100, watermark=2048, port=9002))
+    assert restart == ['port']
+    assert ServerBIT.changes.get_nowait() == ({'sampling_rate': 100}, 0)
+    assert announced == [{'watermark': 2048}] and ServerBIT.SocketHandler.watermark == 2048
+    assert ServerBIT.reconfigure(dict(config, sampling_rate=100, watermark=2048, port=9002)) == []
+    assert ServerBIT.changes.empty()
+
+@pytest.mark.parametrize('update', [{'sampling_rate': 50}, {'channels': [1, 1]}, {'labels': ['nSeq']},
+                                    {'watermark': 2048, 'backpressure': 'bogus'}, {'latency': 'a'},
+                                    {'latency': 0}, {'low_latency': 1}, {'batch': 0}, {'batch': 1.5},
+                                    {'watermark': True}, {'block_cache': -1}, {'history': '60'}])
+def test_reconfigure_applies_nothing_invalid(running, update):
+    config, announced = running
+    with pytest.raises(ValueError):
+        ServerBIT.reconfigure(update)
+    assert ServerBIT.settings == config and ServerBIT.changes.empty() and announced == []
+    assert ServerBIT.SocketHandler.watermark == config['watermark']
+
+def test_handler_applies_new_sampling_rate_between_blocks(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setattr(ServerBIT, 'markers', None)
+    monkeypatch.setattr(ServerBIT, 'changes', queue.Queue())
+    monkeypatch.setattr(ServerBIT, 'loop', ReconfiguringLoop(8, 3, {'sampling_rate': 100}))
+    thread = threading.Thread(target=acquire, args=('synthetic', [1, 2], 1000, LABELS, 0.01, 1,
+                                                    SyntheticBITalino(realtime=False), 5., False, False, str(tmp_path)))
+    thread.daemon = True
+    thread.start()
+    assert ServerBIT.loop.done.wait(10)
+    thread.join(10)
+    callbacks = ServerBIT.loop.callbacks
+    position = [callback for callback, args in callbacks].index(ServerBIT.announce)
+    update, sampleIndex = callbacks[position][1]
+    assert update == {'sampling_rate': 100}
+    # The running index carries on into the blocks at the new rate, recorded as a session of their own
+    assert json.loads(callbacks[position + 1][1][0])['sampleIndex'] == sampleIndex
+    names = sessions(str(tmp_path))
+    assert len(names) == 2
+    recording = Recording(os.path.join(str(tmp_path), names[1]))
+    assert recording.samplingRate == 100 and recording.origin() == sampleIndex
+
+class Upstream(object):
+    """
+    Stands for the connection of a worker to the acquisition process, keeping what is written.
+    """
+    def __init__(self):
+        self.written = []
+
+    def closed(self):
+        return False
+
+    def write(self, data):
+        self.written.append(json.loads(data))
+
+def fetch(path, method = 'GET', body = None):
+    """
+    :returns: response of the application of a worker to a request for `path`
+    """
+    async def request():
+        sock, port = testing.bind_unused_port()
+        server = httpserver.HTTPServer(web.Application([(r'/events', ServerBIT.EventsHandler),
+                                                        (r'/profile', ServerBIT.ProfileHandler)]))
+        server.add_sockets([sock])
+        try:
+            return await httpclient.AsyncHTTPClient().fetch('http://127.0.0.1:%d%s' % (port, path), method=method,
+                                                            body=body, raise_error=False)
+        finally:
+            server.stop()
+    return asyncio.run(request())
+
+def events(body):
+    """
+    :returns: status of the answer of the events endpoint to `body`
+    """
+    return fetch('/events', 'POST', json.dumps(body)).code
+
+def test_event_not_handed_over_is_unavailable(monkeypatch):
+    monkeypatch.setattr(ServerBIT, 'markers', None)
+    monkeypatch.setattr(fanout, 'upstream', None)
+    assert events({'label': 'stimulus'}) == 503
+    upstream = Upstream()
+    monkeypatch.setattr(fanout, 'upstream', upstream)
+    assert events({'label': 'stimulus', 'data': 1}) == 202
+    assert upstream.written == [{'label': 'stimulus', 'data': 1, 'trigger': None}]
+
+@pytest.mark.parametrize('channel', [EventChannel(), None])
+def test_malformed_trigger_is_a_bad_request(monkeypatch, channel):
+    monkeypatch.setattr(ServerBIT, 'markers', channel)
+    monkeypatch.setattr(fanout, 'upstream', Upstream())
+    assert events({'label': 'on', 'trigger': 'x'}) == 400
+    assert events({'label': 'on', 'trigger': [None, 0]}) == 400
+    assert fanout.upstream.written == []
+
+class Client(object):
+    """
+    Stands for a WebSocket client that has stopped reading, keeping what is written.
+    """
+    def __init__(self, backpressure):
+        self.id = 'stalled'
+        self.pending = 0
+        self.backpressure = backpressure
+        self.written = []
+
+    def write_message(self, message):
+        self.written.append(message)
+        return concurrent.futures.Future()
+
+@pytest.mark.parametrize('policy', ['skip', 'merge', 'downsample'])
+def test_event_reaches_a_client_over_the_limit(monkeypatch, policy):
+    client = Client(Backpressure(watermark=100, policy=policy))
+    client.backpressure.written(400)
+    monkeypatch.setattr(ServerBIT, 'cl', [client])
+    monkeypatch.setattr(ServerBIT, 'history', None)
+    monkeypatch.setattr(ServerBIT, 'raw', [])
+    monkeypatch.setattr(ServerBIT, 'feed', None)
+    event = json.dumps({'event': 'stimulus', 'id': 0, 'sampleIndex': 12})
+    ServerBIT.send(json.dumps({'sampleIndex': 0, 'nSeq': [0, 1]}), 0., None, 2)
+    ServerBIT.send(event, 0.)
+    if policy == 'merge':
+        # Held in its place after the block, and released with it
+        assert client.written == []
+        assert client.backpressure.flushed(400)[1:] == [event]
+    else:
+        assert client.written == [event]
+
+def test_profiler_is_only_switched_by_post(monkeypatch):
+    monkeypatch.setattr(ServerBIT, 'profiler', Profiler())
+    assert fetch('/profile?action=start').code == 200
+    assert not ServerBIT.profiler.enabled
+    assert fetch('/profile', 'POST', 'action=start').code == 200 and ServerBIT.profiler.enabled
+    assert fetch('/profile', 'POST', 'action=bogus').code == 400
+    assert fetch('/profile', 'POST', 'action=stop').code == 200 and not ServerBIT.profiler.enabled
+
+@pytest.mark.parametrize('remote', [False, True])
+def test_client_changes_settings_only_if_allowed(running, monkeypatch, remote):
+    config, announced = running
+    ServerBIT.settings['remote_config'] = remote
+    monkeypatch.setattr(ServerBIT, 'markers', EventChannel())
+    monkeypatch.setattr(ServerBIT, 'deliver', lambda client, res, readyTime: client.written.append(json.loads(res)))
+    client = Client(None)
+    ServerBIT.SocketHandler.on_message(client, json.dumps({'config': {'latency': 'a'}}))
+    ServerBIT.SocketHandler.on_message(client, json.dumps({'config': {'watermark': 2048}}))
+    assert 'error' in client.written[0]
+    assert ('error' in client.written[1]) != remote
+    assert (ServerBIT.SocketHandler.watermark == 2048) == remote
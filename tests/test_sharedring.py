@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Pins the shared memory ring: what a reader gets back of the blocks written, and the sequence lock that tells it a
+block was written while it read.
+"""
+
+import os
+import sys
+from multiprocessing import resource_tracker
+
+import numpy
+import pytest
+
+from sharedring import SharedRing, SharedRingReader
+
+LABELS = ['nSeq', 'A1']
+
+@pytest.fixture
+def ring():
+    """
+    Ring of 8 samples, with a reader attached to it, both closed afterwards.
+    """
+    writer = SharedRing('serverbit-test-%d' % os.getpid(), LABELS, 1000, 8)
+    reader = SharedRingReader(writer.name)
+    if sys.version_info < (3, 13):
+        # Unregistered by the reader, while the block is still unlinked by the writer in this same process
+        resource_tracker.register(writer.block._name, 'shared_memory')
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+def block(first, n):
+    indices = numpy.arange(first, first + n)
+    return indices, numpy.column_stack([indices % 16, indices*2]).astype('uint16')
+
+def test_round_trip_across_the_wrap(ring):
+    writer, reader = ring
+    assert reader.labels == LABELS and reader.samplingRate == 1000 and reader.capacity == 8
+    writer.write(*block(0, 6))
+    since, index, values = reader.read()
+    assert since == 6 and list(index) == list(range(6))
+    writer.write(*block(6, 5))
+    since, index, values = reader.read(since)
+    # Wraps around the end of the ring
+    assert since == 11 and list(index) == list(range(6, 11))
+    assert (values == block(6, 5)[1]).all()
+
+def test_samples_overwritten_are_skipped(ring):
+    writer, reader = ring
+    writer.write(*block(0, 4))
+    writer.write(*block(4, 10))
+    since, index, values = reader.read(2)
+    assert since == 14 and list(index) == list(range(6, 14))
+
+def test_write_during_a_read_is_detected(ring):
+    writer, reader = ring
+    writer.write(*block(0, 4))
+    seq, start, end = reader.begin()
+    segments = reader.view(start, end)
+    assert not reader.retry(seq)
+    # The writer advances over the samples being read, which are now torn
+    writer.write(*block(4, 6))
+    assert reader.retry(seq)
+    assert list(numpy.concatenate([index for index, values in segments])) != list(range(4))
+
+def test_read_retries_a_torn_read(ring, monkeypatch):
+    writer, reader = ring
+    writer.write(*block(0, 4))
+    view = reader.view
+    calls = []
+
+    def advancing(start, end):
+        segments = view(start, end)
+        if not calls:
+            writer.write(*block(4, 6))
+        calls.append((start, end))
+        return segments
+    monkeypatch.setattr(reader, 'view', advancing)
+    since, index, values = reader.read()
+    assert calls == [(0, 4), (2, 10)]
+    assert since == 10 and list(index) == list(range(2, 10))
+    assert (values == block(2, 8)[1]).all()
@@ -1,15 +1,79 @@
 from tornado import websocket, web, ioloop
-import thread
+import asyncio
+import multiprocessing
+import queue
+import threading
 import json
+import math
 import signal
 import sys
 import numpy
 import time
 import sys, traceback, os
-from bitalino import *
+import atexit
+import re
+import fanout
+# The acquisition package is shared with twisted-ws, at the root of the repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from acquisition.bitalino import *
+from acquisition.decoder import decoders
+from acquisition.metrics import registry, CONTENT_TYPE
+from clock import SampleClock, monotonic
+from profiler import profiler
+from blocksize import BlockSizer
+from backoff import Backoff
+from backpressure import Backpressure, POLICIES
+from history import History
+from events import EventChannel, checkTrigger
+from recording import Recorder, Recording, BlockCache, sessionName, sessions
+from devices import DeviceCache, connect
+from sharedring import SharedRing
+from rawstream import StreamServer, DatagramPublisher
+from lsloutlet import DeviceOutlet
 from os.path import expanduser
 
 cl = []
+# Raw TCP and UDP outputs
+raw = []
+# IOLoop on which the handlers run, set once it is running
+loop = None
+# Worker processes fed by the acquisition process, which then has no clients of its own
+feed = None
+# Recent samples sent, for the clients asking for them when they connect
+history = None
+# Events posted, stamped by the acquisition thread; None in the worker processes, which forward them
+markers = None
+# Settings running, and those changed meanwhile, applied by the acquisition thread between two blocks
+settings = None
+changes = queue.Queue()
+# Modification time of the configuration file when it was last applied
+configTime = None
+
+# Settings applied by the acquisition thread, and by the handlers, without restarting
+STREAMED = ['labels', 'channels', 'sampling_rate', 'latency', 'low_latency', 'batch']
+LIVE = ['watermark', 'backpressure', 'decoder', 'block_cache']
+
+bytesReceived = registry.counter('serverbit_bytes_received_total', 'Bytes received from the device', ['device'])
+framesDecoded = registry.counter('serverbit_frames_decoded_total', 'Frames decoded from the device', ['device'])
+crcErrors = registry.counter('serverbit_crc_errors_total', 'Frames discarded on a CRC mismatch', ['device'])
+resyncs = registry.counter('serverbit_resyncs_total', 'Bytes skipped to recover the frame alignment in low-latency mode', ['device'])
+decodeTime = registry.histogram('serverbit_decode_seconds', 'Time spent decoding each block, excluding the wait for the device')
+serializeTime = registry.histogram('serverbit_serialize_seconds', 'Time spent encoding each block as JSON')
+sendTime = registry.histogram('serverbit_send_seconds', 'Time from a block being encoded to it being flushed to the client')
+messagesSent = registry.counter('serverbit_messages_sent_total', 'Messages flushed to clients')
+messagesDropped = registry.counter('serverbit_messages_dropped_total', 'Messages discarded for lack of a client or a closed connection')
+queueDepth = registry.gauge('serverbit_client_queue_depth', 'Messages written to each client and not yet flushed', ['client'])
+bytesInFlight = registry.gauge('serverbit_client_bytes_in_flight', 'Bytes written to each client and not yet flushed', ['client'])
+backpressureSamples = registry.counter('serverbit_backpressure_samples_total', 'Samples dropped or delivered late in merged messages because a client fell behind', ['policy', 'action'])
+blockSize = registry.gauge('serverbit_block_size', 'Number of samples requested on each read', ['device'])
+connected = registry.gauge('serverbit_device_connected', 'Whether the device is connected and acquiring', ['device'])
+reconnects = registry.counter('serverbit_reconnects_total', 'Losses of the link to the device', ['device'])
+rawSent = registry.counter('serverbit_raw_messages_sent_total', 'Messages sent on the raw outputs', ['transport'])
+cacheHits = registry.counter('serverbit_block_cache_hits_total', 'Chunks of the recordings served from memory')
+cacheMisses = registry.counter('serverbit_block_cache_misses_total', 'Chunks of the recordings read from disk')
+cacheBytes = registry.gauge('serverbit_block_cache_bytes', 'Bytes of the chunks of the recordings kept in memory')
+rawDropped = registry.counter('serverbit_raw_messages_dropped_total', 'Messages discarded on the raw outputs for a slow consumer or a send error', ['transport'])
+reconnectTime = registry.histogram('serverbit_reconnect_seconds', 'Time from the loss of the link to the device to acquiring again', ['device'], buckets=[0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30., 60.])
 
 def tostring(data):
     """
@@ -22,63 +86,729 @@ def tostring(data):
     dtype=type(data).__name__
     if dtype=='ndarray':
         if numpy.shape(data)!=(): data=data.tolist() # data=list(data)
-        else: data='"'+data.tostring()+'"'
+        else: data='"'+str(data)+'"'
     elif dtype=='dict' or dtype=='tuple':
         try: data=json.dumps(data)
         except: pass
     elif dtype=='NoneType':
         data=''
-    elif dtype=='str' or dtype=='unicode':
+    elif dtype=='str':
         data=json.dumps(data)
     
     return str(data)
 
+tostring = profiler.wrap(tostring)
 
 class SocketHandler(websocket.WebSocketHandler):
+    clients = 0
+    nodelay = False
+    watermark = 1 << 20
+    policy = 'skip'
+    write_message = profiler.wrap(websocket.WebSocketHandler.write_message, 'write_message')
+
     def check_origin(self, origin):
         return True
 
     def open(self):
+        SocketHandler.clients += 1
+        self.id = SocketHandler.clients
+        self.pending = 0
+        # Each client may choose its own policy, e.g. ws://localhost:9001/?policy=merge
+        policy = self.get_argument('policy', SocketHandler.policy)
+        if policy not in POLICIES:
+            policy = SocketHandler.policy
+        self.backpressure = Backpressure(SocketHandler.watermark, policy,
+                                         observer=lambda action, n: backpressureSamples.labels(policy, action).inc(n))
+        if SocketHandler.nodelay:
+            self.set_nodelay(True)
+        # Samples sent before the client connected, e.g. ws://localhost:9001/?last=10 or ?since=<sampleIndex>
+        since, last = self.get_argument('since', None), self.get_argument('last', None)
+        try:
+            since, last = int(since) if since else None, float(last) if last else None
+        except ValueError:
+            since = last = None
+        if history is not None and (since is not None or last is not None):
+            deliver(self, history.message(since, last), monotonic())
         if self not in cl:
             cl.append(self)
         print("CONNECTED")
 
     def on_message(self, message):
-        self.write_message(u"You said: " + message)
+        # Events, e.g. {"event": "stimulus", "data": {"image": 12}, "trigger": [1, 0]}
+        try:
+            event = json.loads(message)
+        except ValueError:
+            event = None
+        if isinstance(event, dict) and isinstance(event.get('config'), dict):
+            # Settings changed live, e.g. {"config": {"labels": [...]}}, in a worker by the acquisition process
+            if not settings.get('remote_config', False):
+                deliver(self, json.dumps({'config': event['config'], 'error': 'settings are not changed by clients'}), monotonic())
+                return
+            if markers is None:
+                if not fanout.post({'config': event['config']}):
+                    deliver(self, json.dumps({'config': event['config'], 'error': 'acquisition process not reachable'}), monotonic())
+                return
+            try:
+                restart = reconfigure(event['config'])
+            except ValueError as e:
+                deliver(self, json.dumps({'config': event['config'], 'error': str(e)}), monotonic())
+                return
+            deliver(self, json.dumps({'config': event['config'], 'restart': restart}), monotonic())
+            return
+        if not isinstance(event, dict) or 'event' not in event:
+            self.write_message(u"You said: " + message)
+            return
+        try:
+            future = post(event['event'], event.get('data'), event.get('trigger'))
+        except (ValueError, RuntimeError) as e:
+            deliver(self, json.dumps({'event': event['event'], 'error': str(e)}), monotonic())
+            return
+
+        def posted(future):
+            # Only failures are answered, e.g. a trigger while the device is not acquiring
+            if future.exception() is not None:
+                error = json.dumps({'event': event['event'], 'error': str(future.exception())})
+                loop.add_callback(deliver, self, error, monotonic())
+        if future is not None:
+            future.add_done_callback(posted)
 
     def on_close(self):
         if self in cl:
             cl.remove(self)
+        queueDepth.remove(self.id)
+        bytesInFlight.remove(self.id)
         print("DISCONNECTED")
 
+class MetricsHandler(web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', CONTENT_TYPE)
+        self.write(registry.render())
+
+class ProfileHandler(web.RequestHandler):
+    def get(self):
+        """
+        Returns the stage summary of the profiler, or with ``format=folded`` the sampled stacks.
+        """
+        self.set_header('Content-Type', 'text/plain')
+        if self.get_argument('format', None) == 'folded':
+            self.write(profiler.folded())
+        else:
+            self.write(profiler.summary())
+
+    def post(self):
+        """
+        Controls the profiler; ``action`` may be ``start``, ``stop`` or ``reset``. Only a POST does, so that neither
+        a crawler nor a browser prefetching the page switches it.
+        """
+        action = self.get_argument('action', None)
+        if action == 'start': profiler.start()
+        elif action == 'stop': profiler.stop()
+        elif action == 'reset': profiler.reset()
+        else: raise web.HTTPError(400)
+        self.get()
+
+class EventsHandler(web.RequestHandler):
+    async def post(self):
+        """
+        Posts an event, e.g. ``{"label": "stimulus", "data": {"image": 12}, "trigger": [1, 0]}``, which is accepted
+        once queued or, with a trigger, once written to the device.
+        """
+        try:
+            event = json.loads(self.request.body)
+            label = event['label']
+        except (ValueError, TypeError, KeyError):
+            raise web.HTTPError(400)
+        try:
+            future = post(label, event.get('data'), event.get('trigger'))
+        except ValueError as e:
+            raise web.HTTPError(400, reason=str(e))
+        except RuntimeError as e:
+            raise web.HTTPError(503, reason=str(e))
+        if future is not None:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception as e:
+                raise web.HTTPError(409, reason=str(e).splitlines()[0][:200])
+        self.set_status(202)
+
+class RecordingsHandler(web.RequestHandler):
+    # Directory of the sessions recorded, and chunks recently read from them
+    directory = None
+    cache = BlockCache()
+    recordings = {}
+
+    def get(self, name = None, events = None, event = None):
+        """
+        Lists the sessions recorded, or with a session name, returns the samples of the column ``channel`` from
+        ``start`` to ``end`` (seconds from the start of the session) summarized in at most ``points`` points, e.g.
+        ``/recordings/synthetic-20261019-101500?channel=A3&start=720&end=840&points=2000``.
+
+        ``/recordings/<session>/events`` lists the events of a session, optionally those with a ``label`` between
+        ``start`` and ``end``, and ``/recordings/<session>/events/<id>?channel=A3&before=1&after=2`` returns every
+        sample of a column from 1 second before an event to 2 seconds after it.
+        """
+        self.set_header('Content-Type', 'application/json')
+        names = sessions(RecordingsHandler.directory)
+        if name is None:
+            self.write(json.dumps(names))
+            return
+        if name not in names:
+            raise web.HTTPError(404)
+        if name not in RecordingsHandler.recordings:
+            RecordingsHandler.recordings[name] = Recording(os.path.join(RecordingsHandler.directory, name))
+        recording = RecordingsHandler.recordings[name]
+        if events is not None and event is None:
+            try:
+                start, end = [recording.origin() + int(math.floor(float(self.get_argument(key)) * recording.samplingRate))
+                              if self.get_argument(key, None) else None for key in ('start', 'end')]
+            except (ValueError, OverflowError):
+                raise web.HTTPError(400)
+            self.write(json.dumps(recording.events.find(self.get_argument('label', None), start, end), separators=(',', ':')))
+            return
+        channel = self.get_argument('channel')
+        if channel not in recording.labels:
+            raise web.HTTPError(400, 'unknown channel')
+        if event is not None:
+            try:
+                before, after = float(self.get_argument('before', 1)), float(self.get_argument('after', 1))
+                result = recording.around(channel, int(event), before, after, RecordingsHandler.cache)
+            except ValueError as e:
+                raise web.HTTPError(400, reason=str(e))
+            if result is None:
+                raise web.HTTPError(404)
+            result.update(session=name, channel=channel)
+            self.write(json.dumps(result, separators=(',', ':')))
+            return
+        try:
+            start = float(self.get_argument('start', 0))
+            end = float(self.get_argument('end')) if self.get_argument('end', None) else None
+            points = int(self.get_argument('points', 2000))
+            result = recording.query(channel, start, end, points, RecordingsHandler.cache)
+        except ValueError as e:
+            raise web.HTTPError(400, reason=str(e))
+        result.update(session=name, channel=channel)
+        self.write(json.dumps(result, separators=(',', ':')))
+
+def send(res, readyTime, sizer = None, nSamples = 0, samples = None):
+    """
+    :param res: JSON-formatted block
+    :type res: str
+    :param readyTime: host monotonic time at which the block was encoded
+    :type readyTime: float
+    :param sizer: block sizer to which the time taken to flush the block is reported
+    :type sizer: BlockSizer or None
+    :param nSamples: number of samples in the block
+    :type nSamples: int
+    :param samples: running index and values of the samples of the block, kept in the history
+    :type samples: tuple or None
+
+    Writes a block to every client, subject to its backpressure policy, and to the raw outputs; must run on the
+    IOLoop, as tornado handlers are not thread-safe.
+    """
+    if history is not None and samples is not None:
+        history.write(*samples)
+    if raw or feed is not None:
+        payload = res if isinstance(res, bytes) else res.encode('utf-8')
+        for output in raw:
+            output.publish(payload)
+        if feed is not None:
+            feed.publish(payload, readyTime, nSamples, samples)
+            return
+    if len(cl) == 0:
+        messagesDropped.inc()
+        return
+    # The block size follows the quickest client, so it is reported once per block, by the first flush
+    report = [sizer]
+    for client in list(cl):
+        # The flush time of a client that has fallen behind says nothing about the block size
+        congested = client.backpressure.inFlight >= client.backpressure.watermark
+        for message in client.backpressure.offer(res, nSamples):
+            deliver(client, message, readyTime, None if congested or message is not res else report, nSamples)
+
+def deliver(client, message, readyTime, report = None, nSamples = 0):
+    """
+    Writes a message to a client, keeping track of the bytes in flight for its backpressure policy. `report` holds
+    the block sizer to which the flush time is reported, and is emptied by the first flush that does.
+    """
+    try:
+        future = client.write_message(message)
+    except websocket.WebSocketClosedError:
+        messagesDropped.inc()
+        return
+    client.pending += 1
+    client.backpressure.written(len(message))
+    queueDepth.labels(client.id).set(client.pending)
+    bytesInFlight.labels(client.id).set(client.backpressure.inFlight)
+
+    def flushed(future):
+        client.pending -= 1
+        released = client.backpressure.flushed(len(message))
+        if client in cl:
+            queueDepth.labels(client.id).set(client.pending)
+            bytesInFlight.labels(client.id).set(client.backpressure.inFlight)
+        if future.exception() is None:
+            messagesSent.inc()
+            sendTime.observe(monotonic() - readyTime)
+            if report and report[0] is not None:
+                report.pop().observe('send', nSamples, monotonic() - readyTime)
+        else:
+            messagesDropped.inc()
+        if client in cl:
+            for held in released:
+                deliver(client, held, readyTime)
+    future.add_done_callback(flushed)
+
+def post(label, data = None, trigger = None):
+    """
+    Posts an event (see :mod:`events`) from the IOLoop, in a worker process by handing it to the acquisition process.
+
+    :returns: future of :meth:`EventChannel.post`, or `None` when handed to the acquisition process
+    :raises ValueError: `trigger` is not a state of the digital outputs
+    :raises RuntimeError: the event cannot be handed to the acquisition process, e.g. while it restarts
+    """
+    if markers is not None:
+        return markers.post(label, data, trigger)
+    if trigger is not None:
+        checkTrigger(trigger)
+    if not fanout.post({'label': label, 'data': data, 'trigger': trigger}):
+        raise RuntimeError('acquisition process not reachable')
+    return None
+
+def forwarded(event):
+    """
+    Posts an event, or applies settings, handed over by a worker process; a failure is only reported in the output,
+    as the client that posted the event cannot be answered.
+    """
+    if isinstance(event.get('config'), dict):
+        try:
+            reconfigure(event['config'])
+        except ValueError as e:
+            print('CONFIG NOT APPLIED ' + str(e))
+        return
+
+    def posted(future):
+        if future.exception() is not None:
+            print('EVENT REFUSED ' + str(future.exception()))
+    try:
+        post(event.get('label', ''), event.get('data'), event.get('trigger')).add_done_callback(posted)
+    except ValueError as e:
+        print('EVENT REFUSED ' + str(e))
+
+def reconfigure(config):
+    """
+    :param config: settings as in ``config.json``, all or some of them
+    :type config: dict
+    :returns: sorted list of the settings changed that only apply once ServerBIT is restarted
+    :raises ValueError: a setting is not valid, in which case none is applied
+
+    Applies the settings that differ from those running, on the IOLoop of the acquisition process. Those of the
+    handlers (see :data:`LIVE`) apply at once; those of the acquisition (see :data:`STREAMED`) between two blocks,
+    with a stop and start of the acquisition, without connecting again, if the channels or the sampling rate change.
+    Either way the clients stay connected, and are told of the change in order with the blocks.
+    """
+    update = dict((key, value) for key, value in config.items() if settings.get(key) != value)
+    if not update:
+        return []
+    merged = dict(settings, **update)
+    if merged['sampling_rate'] not in [1, 10, 100, 1000]:
+        raise ValueError('"sampling_rate" must be one of 1, 10, 100 or 1000')
+    channels = merged['channels']
+    if not channels or len(set(channels)) != len(channels) or not all(channel in range(1, 7) for channel in channels):
+        raise ValueError('"channels" must be distinct analog channels (1-6)')
+    if len(merged['labels']) < 11 or not all(isinstance(label, str) for label in merged['labels']):
+        raise ValueError('"labels" must name the sequence number, the 4 digital and the 6 analog channels')
+    # Checked here, as a value not valid would otherwise only fail in the acquisition thread, which would then
+    # connect again and again
+    number = lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+    if not number(merged.get('latency', 0.25)) or not 0 < merged.get('latency', 0.25) <= 60:
+        raise ValueError('"latency" must be a number of seconds, above 0 and up to 60')
+    if not isinstance(merged.get('low_latency', False), bool):
+        raise ValueError('"low_latency" must be true or false')
+    for key in ('batch', 'watermark', 'block_cache'):
+        if key in merged and (not number(merged[key]) or merged[key] != int(merged[key]) or merged[key] < 1):
+            raise ValueError('"%s" must be a positive integer' % key)
+    if not number(merged.get('history', 60)) or merged.get('history', 60) < 0:
+        raise ValueError('"history" must be a number of seconds, 0 for none')
+    try:
+        batch = configure(merged)
+    except ValueError:
+        # Some were applied before the one not valid
+        configure(settings)
+        raise
+    settings.update(update)
+    streamed = dict((key, update[key]) for key in STREAMED if key in update)
+    if streamed:
+        changes.put((streamed, batch))
+    live = dict((key, update[key]) for key in LIVE if key in update)
+    if live:
+        announce(live)
+    restart = sorted(set(update) - set(STREAMED) - set(LIVE))
+    if restart:
+        print('RESTART REQUIRED ' + ', '.join(restart))
+    return restart
+
+def apply(update):
+    """
+    Applies settings changed to the handlers and to the history of the process, on its IOLoop.
+    """
+    global history
+    settings.update(update)
+    configure(settings)
+    if history is not None and set(update) & set(['labels', 'channels', 'sampling_rate']):
+        history = History(columnLabels(settings['labels'], settings['channels']), settings['sampling_rate'], settings.get('history', 60))
+    if 'labels' in update:
+        RecordingsHandler.recordings.clear()
+
+def announce(update, sampleIndex = None):
+    """
+    Applies settings changed in the acquisition process, and tells the clients and the worker processes, e.g.
+    ``{"reconfigured": {"sampling_rate": 100}, "sampleIndex": ...}`` with the index of the first sample acquired
+    with the new settings.
+    """
+    apply(update)
+    notice = {'reconfigured': update}
+    if sampleIndex is not None:
+        notice['sampleIndex'] = sampleIndex
+    send(json.dumps(notice), monotonic())
+
+def reload(path):
+    """
+    Applies the settings of the configuration file at `path` if it was modified since last time, or keeps those
+    running if it cannot be read (e.g. while it is being written).
+    """
+    global configTime
+    try:
+        modified = os.path.getmtime(path)
+        if modified == configTime:
+            return
+        configTime = modified
+        with open(path) as data_file:
+            config = json.load(data_file)
+        reconfigure(config)
+    except (IOError, OSError, ValueError) as e:
+        print('CONFIG NOT APPLIED ' + str(e))
+
 def signal_handler(signal, frame):
     print('TERMINATED')
     sys.exit(0)
 
-def BITalino_handler(mac_addr, ch_mask, srate, labels):
+def profile_handler(signum, frame):
+    if signum == signal.SIGUSR1:
+        print('PROFILING ' + ('ON' if profiler.toggle() else 'OFF'))
+    else:
+        for path in profiler.dump(home + time.strftime('/profile-%Y%m%d-%H%M%S')):
+            print(path)
+
+# Errors that connecting again cannot fix
+FATAL = [ExceptionCode.INVALID_ADDRESS, ExceptionCode.INVALID_PLATFORM, ExceptionCode.INVALID_PARAMETER, ExceptionCode.IMPORT_FAILED]
+
+def BITalino_handler(mac_addr, ch_mask, srate, labels, latency, batch = 0, device = None, timeout = 5., shared = False, lsl = False, record = None):
+    """
+    :param mac_addr: MAC address or serial port of the device, or a name starting with ``synthetic``
+    :param ch_mask: analog channels to be acquired (1-6)
+    :param srate: sampling rate (Hz)
+    :param labels: labels of all columns and channels, as in ``config.json``
+    :param latency: target latency (seconds) for the adaptive block size
+    :param batch: if non-zero, streams in low-latency mode, sending every frame received as soon as at least
+                  `batch` are available
+    :param device: device already connected, instead of connecting to `mac_addr`
+    :param timeout: time (seconds) without data after which the link to the device is taken as lost
+    :param shared: whether the samples are also published to a shared memory ring (see :mod:`sharedring`), named
+                   ``serverbit-`` followed by the alphanumeric characters of `mac_addr`
+    :param lsl: whether the samples are also published as a Lab Streaming Layer stream (see :mod:`lsloutlet`)
+    :param record: directory in which the session is recorded (see :mod:`recording`), or None
+
+    Acquires from the device and streams each block to the client.
+
+    When the link to the device is lost, the client is sent a gap marker, and the device is connected to again with
+    an exponential backoff and the acquisition restarted; the sample index carries on over the gap, with the samples
+    missed accounted as dropped.
+    """
     #labels = ["'nSeq'", "'I1'", "'I2'", "'O1'", "'O2'", "'A1'", "'A2'", "'A3'", "'A4'", "'A5'", "'A6'"]
     ch_mask = numpy.array(ch_mask)-1
-    try:
-        print(mac_addr)
-        device=BITalino(mac_addr)
-        print(ch_mask)
-        print(srate)
-        device.start(srate, ch_mask)
-        cols = numpy.arange(len(ch_mask)+5)
-        while (1):
-            data=device.read(250)
-            res = "{"
-            for i in cols:
-                idx = i
-                if (i>4): idx=ch_mask[i-5]+5
-                res += '"'+labels[idx]+'":'+tostring(data[:,i])+','
-            res = res[:-1]+"}"
-            if len(cl)>0: cl[-1].write_message(res)
-    except:
-        traceback.print_exc()
-        os._exit(0)
-        
-app = web.Application([(r'/', SocketHandler)])
+    print(mac_addr)
+    print(ch_mask)
+    print(srate)
+    frames = framesDecoded.labels(mac_addr)
+    clock = SampleClock(srate)
+    sizer = BlockSizer(srate, latency)
+    backoff = Backoff()
+    cols, keys = serializer(ch_mask, labels)
+    ring, outlet, recorder = outputs(mac_addr, [key[1:-2] for key in keys], srate, shared, lsl, record)
+    replacement, device = device, None
+    cache = DeviceCache()
+    version = None
+    lostTime = None
+    while (1):
+        try:
+            if replacement is None:
+                replacement = connect(mac_addr, timeout, version, cache)
+                try: cache.save()
+                except (IOError, OSError): traceback.print_exc()
+            if device is not None:
+                # Counters keep running across connections
+                replacement.bytesReceived += device.bytesReceived
+                replacement.crcErrors += device.crcErrors
+                replacement.resyncs += device.resyncs
+            device, replacement = replacement, None
+            device.receive = profiler.wrap(device.receive)
+            device.receiveAvailable = profiler.wrap(device.receiveAvailable, 'receive')
+            bytesReceived.labels(mac_addr).function = lambda: device.bytesReceived
+            crcErrors.labels(mac_addr).function = lambda: device.crcErrors
+            resyncs.labels(mac_addr).function = lambda: device.resyncs
+            device.start(srate, ch_mask)
+            # Events are only taken when served (see serve), not e.g. by latency.py
+            if markers is not None:
+                markers.device = device
+            version = device.versionString
+            connected.labels(mac_addr).set(1)
+            backoff.reset()
+            if lostTime is not None:
+                elapsed = monotonic() - lostTime
+                reconnectTime.labels(mac_addr).observe(elapsed)
+                print('RECONNECTED')
+                clock.restart()
+                res = json.dumps({'gap': 'resumed', 'reconnectTime': elapsed})
+                loop.add_callback(send, res, monotonic())
+                lostTime = None
+            while True:
+                stream(device, batch, cols, keys, clock, sizer, mac_addr, frames, ring, outlet, recorder)
+                # Settings changed while acquiring (see reconfigure), all applied at once
+                update = {}
+                while not changes.empty():
+                    changed, batch = changes.get()
+                    update.update(changed)
+                labels = update.get('labels', labels)
+                latency = update.get('latency', latency)
+                cycle = 'channels' in update or 'sampling_rate' in update
+                if cycle:
+                    ch_mask = numpy.array(update.get('channels', ch_mask + 1)) - 1
+                    srate = update.get('sampling_rate', srate)
+                    # The running index carries on at the new sampling rate
+                    count, clock = clock.count, SampleClock(srate)
+                    clock.count = count
+                    closeOutputs(ring, outlet, recorder)
+                cols, keys = serializer(ch_mask, labels)
+                if cycle:
+                    ring, outlet, recorder = outputs(mac_addr, [key[1:-2] for key in keys], srate, shared, lsl, record)
+                elif recorder is not None and 'labels' in update:
+                    recorder.relabel([key[1:-2] for key in keys])
+                if cycle or 'latency' in update:
+                    sizer = BlockSizer(srate, latency)
+                print('RECONFIGURED ' + ', '.join(sorted(update)))
+                loop.add_callback(announce, update, clock.count)
+                if cycle:
+                    # Once the settings are in place, so that connecting again after a failure applies them too
+                    device.stop()
+                    device.start(srate, ch_mask)
+        except Exception as e:
+            traceback.print_exc()
+            if any(str(e).startswith(code) for code in FATAL):
+                os._exit(0)
+            connected.labels(mac_addr).set(0)
+            if markers is not None:
+                markers.device = None
+            if device is not None:
+                try: device.close()
+                except Exception: pass
+            if lostTime is None:
+                lostTime = monotonic()
+                reconnects.labels(mac_addr).inc()
+                print('RECONNECTING')
+                res = json.dumps({'gap': 'lost', 'sampleIndex': clock.count, 'timestamp': lostTime})
+                loop.add_callback(send, res, lostTime)
+            time.sleep(backoff.delay())
+
+def serializer(ch_mask, labels):
+    """
+    :returns: tuple with the columns streamed of each sample, and the JSON-formatted key of each column
+    """
+    cols = numpy.arange(len(ch_mask)+5)
+    keys = []
+    for i in cols:
+        idx = i
+        if (i>4): idx=ch_mask[i-5]+5
+        keys.append('"'+labels[idx]+'":')
+    return cols, keys
+
+def outputs(mac_addr, names, srate, shared = False, lsl = False, record = None):
+    """
+    :returns: tuple with the shared memory ring, the LSL outlet and the recorder of the columns `names`, each `None`
+              unless enabled (see :func:`BITalino_handler`)
+    """
+    ring = None
+    if shared:
+        ring = SharedRing('serverbit-' + re.sub('[^0-9A-Za-z]', '', mac_addr), names, srate, 60*srate)
+        atexit.register(ring.close)
+        print('SHARED ' + ring.name)
+    outlet = DeviceOutlet(mac_addr, names, srate) if lsl else None
+    recorder = None
+    if record is not None:
+        path = os.path.join(record, sessionName(mac_addr))
+        # A session started within the same second as the previous one, on a change of channels or sampling rate
+        suffix = 1
+        while os.path.exists(path + ('-%d' % suffix if suffix > 1 else '')):
+            suffix += 1
+        recorder = Recorder(path + ('-%d' % suffix if suffix > 1 else ''), names, srate, mac_addr)
+        atexit.register(recorder.close)
+        print('RECORDING ' + recorder.path)
+    return ring, outlet, recorder
+
+def closeOutputs(ring, outlet, recorder):
+    """
+    Closes the outputs returned by :func:`outputs`, before others are opened for new channels or sampling rate.
+    """
+    if ring is not None:
+        atexit.unregister(ring.close)
+        ring.close()
+    if recorder is not None:
+        atexit.unregister(recorder.close)
+        recorder.close()
+
+def stream(device, batch, cols, keys, clock, sizer, mac_addr, frames, ring = None, outlet = None, recorder = None):
+    """
+    Acquires from a connected device and streams each block to the client, until an exception is raised or settings
+    are changed (see :func:`reconfigure`).
+    """
+    while changes.empty():
+        if batch:
+            # Low-latency mode: forward whatever frames have arrived, as plain lists
+            data=device.readFrames(batch)
+            nSamples = len(data)
+            columns = list(zip(*data))
+        else:
+            nSamples = sizer.size()
+            data=device.read(nSamples)
+            columns = [data[:,i] for i in cols]
+        blockSize.labels(mac_addr).set(nSamples)
+        readTime = monotonic()
+        frames.inc(nSamples)
+        decodeTime.observe(device.decodeTime)
+        profiler.record('decode', device.decodeTime)
+        sizer.observe('decode', nSamples, device.decodeTime)
+        info = clock.update(columns[0], readTime)
+        if ring is not None:
+            ring.write(info['indices'], data)
+        if outlet is not None:
+            outlet.push(data, clock.timestamp(clock.count - 1))
+        if recorder is not None:
+            recorder.write(info['indices'], data)
+        for event in markers.stamp(clock, info['indices'], data) if markers is not None else []:
+            if recorder is not None:
+                recorder.event(event)
+            loop.add_callback(send, json.dumps(event), monotonic())
+        res = "{"
+        for key in ['sampleIndex', 'timestamp', 'droppedSamples', 'drift']:
+            res += '"'+key+'":'+json.dumps(info[key])+','
+        for key, column in zip(keys, columns):
+            res += key+tostring(column)+','
+        res = res[:-1]+"}"
+        readyTime = monotonic()
+        serializeTime.observe(readyTime - readTime)
+        profiler.record('serialize', readyTime - readTime)
+        sizer.observe('serialize', nSamples, readyTime - readTime)
+        loop.add_callback(send, res, readyTime, sizer, nSamples, (info['indices'], data))
+
+app = web.Application([(r'/', SocketHandler), (r'/metrics', MetricsHandler), (r'/profile', ProfileHandler),
+                       (r'/events', EventsHandler),
+                       (r'/recordings', RecordingsHandler), (r'/recordings/([0-9A-Za-z-]+)', RecordingsHandler),
+                       (r'/recordings/([0-9A-Za-z-]+)/(events)', RecordingsHandler),
+                       (r'/recordings/([0-9A-Za-z-]+)/(events)/([0-9]+)', RecordingsHandler)])
+# Routes of the acquisition process when the clients are served by worker processes
+admin = web.Application([(r'/metrics', MetricsHandler), (r'/profile', ProfileHandler), (r'/events', EventsHandler)])
+
+async def serve(config, batch, sock = None):
+    """
+    Listens on the ports set in `config` and starts the acquisition, on the running IOLoop, until interrupted. With
+    `sock`, the listening socket of the worker processes, the blocks are handed to them instead of being sent to
+    clients, and only the metrics and the profiler are served, on ``"metrics_port"``.
+    """
+    global loop, feed, history, markers, settings, configTime
+    loop = ioloop.IOLoop.current()
+    markers = EventChannel()
+    settings = dict(config)
+    # The configuration file is watched, to apply the settings changed without restarting
+    path = os.path.join(expanduser("~"), 'ServerBIT', 'config.json')
+    configTime = os.path.getmtime(path) if os.path.isfile(path) else None
+    ioloop.PeriodicCallback(lambda: reload(path), 1000).start()
+    if sock is None:
+        app.listen(config['port'])
+        if config.get('history', 60) > 0:
+            history = History(columnLabels(config['labels'], config['channels']), config['sampling_rate'], config.get('history', 60))
+    else:
+        admin.listen(config.get('metrics_port', config['port'] + 1))
+        feed = fanout.FanoutServer(receive=forwarded)
+        feed.add_socket(sock)
+        rawSent.labels(feed.transport).function = lambda: feed.sent
+        rawDropped.labels(feed.transport).function = lambda: feed.dropped
+    if config.get('tcp_port'):
+        output = StreamServer(nodelay=SocketHandler.nodelay)
+        output.listen(config['tcp_port'])
+        raw.append(output)
+    if config.get('udp_port'):
+        raw.append(DatagramPublisher(config['udp_port']))
+    for output in raw:
+        rawSent.labels(output.transport).function = lambda output=output: output.sent
+        rawDropped.labels(output.transport).function = lambda output=output: output.dropped
+    print('LISTENING')
+    threading.Thread(target=BITalino_handler, args=(config['device'],config['channels'],config['sampling_rate'], config['labels'], config.get('latency', 0.25), batch, None, config.get('timeout', 5.), config.get('shared_memory', False), config.get('lsl', False), RecordingsHandler.directory if config.get('record', False) else None), daemon=True).start()
+    await asyncio.Event().wait()
+
+def columnLabels(labels, channels):
+    """
+    :returns: labels of the columns of each sample: the sequence number, the digital channels and the analog
+              `channels` (1-6)
+    """
+    return labels[:5] + [labels[4+channel] for channel in channels]
+
+def configure(config):
+    """
+    Applies the settings in `config` to the handlers, in the server and in each worker process.
+
+    :returns: minimum number of frames of each message in low-latency mode, or 0 in block mode
+    """
+    batch = config.get('batch', 1) if config.get('low_latency', False) else 0
+    SocketHandler.nodelay = batch > 0
+    SocketHandler.watermark = config.get('watermark', SocketHandler.watermark)
+    SocketHandler.policy = config.get('backpressure', SocketHandler.policy)
+    if SocketHandler.policy not in POLICIES:
+        raise ValueError('"backpressure" must be one of ' + ', '.join(POLICIES))
+    decoder = config.get('decoder', BITalino.decoder.name)
+    if decoder not in decoders:
+        raise ValueError('"decoder" must be one of ' + ', '.join(sorted(decoders)))
+    BITalino.decoder = decoders[decoder]
+    RecordingsHandler.directory = os.path.join(expanduser("~"), 'ServerBIT', 'recordings')
+    RecordingsHandler.cache.capacity = config.get('block_cache', RecordingsHandler.cache.capacity)
+    cacheHits.labels().function = lambda: RecordingsHandler.cache.hits
+    cacheMisses.labels().function = lambda: RecordingsHandler.cache.misses
+    cacheBytes.labels().function = lambda: RecordingsHandler.cache.size
+    return batch
+
+def worker(config, path):
+    """
+    Runs a worker process, which serves its share of the clients on the port shared with the other workers, with
+    the blocks handed over by the acquisition process on the Unix domain socket at `path`, until it exits.
+    """
+    configure(config)
+    asyncio.run(relay(config, path))
+
+async def relay(config, path):
+    global loop, history, settings
+    loop = ioloop.IOLoop.current()
+    settings = dict(config)
+    app.listen(config['port'], reuse_port=True)
+    if config.get('history', 60) > 0:
+        history = History(columnLabels(config['labels'], config['channels']), config['sampling_rate'], config.get('history', 60))
+    await fanout.subscribe(path, relayed)
+
+def relayed(res, readyTime, nSamples, samples):
+    """
+    Sends a block handed over by the acquisition process to the clients of the worker process, applying the settings
+    changed first if it is a ``"reconfigured"`` notice.
+    """
+    if nSamples == 0 and res.startswith('{"reconfigured"'):
+        apply(json.loads(res)['reconfigured'])
+    send(res, readyTime, None, nSamples, samples)
 
 if __name__ == '__main__':
     home = expanduser("~") + '/ServerBIT'
@@ -89,15 +819,30 @@ if __name__ == '__main__':
     except:
         with open('config.json') as data_file:
             config = json.load(data_file)
-        os.mkdir(home)
+        if not os.path.isdir(home):
+            os.mkdir(home)
         with open(home+'/config.json', 'w') as outfile:
             json.dump(config, outfile)
-        for file in ['ClientBIT.html', 'jquery.flot.js', 'jquery.js']:
+        for file in ['ClientBIT.html']:
             with open(home+'/'+file, 'w') as outfile:
                 outfile.write(open(file).read())
     signal.signal(signal.SIGINT, signal_handler)
-    app.listen(config['port'])
-    print('LISTENING')
-    thread.start_new_thread(BITalino_handler, (config['device'],config['channels'],config['sampling_rate'], config['labels']))
-    ioloop.IOLoop.instance().start()
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, profile_handler)
+        signal.signal(signal.SIGUSR2, profile_handler)
+    if config.get('profile', False):
+        profiler.start()
+    batch = configure(config)
+    workers = config.get('workers', 1)
+    if workers > 1:
+        if not fanout.supported():
+            raise ValueError('"workers" above 1 requires SO_REUSEPORT and Unix domain sockets (e.g. GNU/Linux or Mac OS)')
+        path = fanout.address()
+        # Bound before the workers start, so that they connect at once
+        sock = fanout.bind(path)
+        for i in range(workers):
+            multiprocessing.Process(target=worker, args=(config, path), daemon=True).start()
+        asyncio.run(serve(config, batch, sock))
+    else:
+        asyncio.run(serve(config, batch))
     
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: backoff
+   :synopsis: Delays between attempts to reconnect to a device
+
+*Created on Mon Oct 19 2026*
+"""
+
+class Backoff(object):
+    """
+    :param initial: delay (seconds) before the second attempt
+    :type initial: float
+    :param maximum: longest delay between two attempts
+    :type maximum: float
+    :param factor: growth of the delay after each failed attempt
+    :type factor: float
+
+    Exponential backoff for reconnection attempts. The first attempt after a failure is immediate, since a link
+    that dropped briefly is usually back at once, and the following ones are spaced further and further apart up to
+    *maximum*, so that a device that is off or out of range is not polled in a tight loop.
+    """
+    def __init__(self, initial = 0.1, maximum = 5., factor = 2.):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.reset()
+
+    def reset(self):
+        """
+        Restarts the sequence of delays, once an attempt succeeds.
+        """
+        self.attempts = 0
+
+    def delay(self):
+        """
+        :returns: time (seconds) to wait before the next attempt
+        """
+        self.attempts += 1
+        if self.attempts == 1:
+            return 0.
+        return min(self.initial*self.factor**(self.attempts-2), self.maximum)
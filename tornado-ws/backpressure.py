@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: backpressure
+   :synopsis: Per-client flow control of the stream, based on the bytes written and not yet sent
+
+*Created on Mon Oct 19 2026*
+"""
+
+import collections
+import json
+
+POLICIES = ['skip', 'merge', 'downsample']
+
+class Backpressure(object):
+    """
+    :param watermark: bytes written to the client and not yet sent above which *policy* applies
+    :type watermark: int
+    :param policy: what to do with the blocks while above *watermark*: ``skip``, ``merge`` or ``downsample``
+    :type policy: str
+    :param limit: bytes not yet sent above which blocks are dropped whatever the policy, by default 4 times
+                  *watermark*
+    :type limit: int or None
+    :param observer: called with the action taken (``dropped`` or ``merged``) and the number of samples affected
+    :type observer: callable or None
+
+    Keeps the memory used by a slow or stalled client bounded. Each block is offered with :meth:`offer`, which
+    returns the messages to write at once; the size of each message is reported with :meth:`written` and again with
+    :meth:`flushed` once it is sent, which may release messages held back.
+
+    ===========  ================================================================================================
+    Policy       While above the watermark
+    ===========  ================================================================================================
+    skip         Blocks are dropped, so the client resumes with the newest samples
+    merge        Blocks are held and sent as a single message once below the watermark again; the oldest are
+                 dropped if those held grow beyond the watermark themselves
+    downsample   Blocks are decimated by 2, 4 or 8 as the bytes not yet sent grow, and carry a ``"step"``
+                 property with the factor
+    ===========  ================================================================================================
+
+    Gap markers and other messages without samples are never skipped, merged or decimated.
+    """
+    def __init__(self, watermark = 1 << 20, policy = 'skip', limit = None, observer = None):
+        if policy not in POLICIES:
+            raise ValueError('unknown backpressure policy: ' + policy)
+        self.watermark = watermark
+        self.policy = policy
+        self.limit = limit or 4*watermark
+        self.observer = observer
+        self.inFlight = 0
+        self.held = []
+        self.heldBytes = 0
+
+    def observe(self, action, nSamples):
+        if self.observer is not None and nSamples > 0:
+            self.observer(action, nSamples)
+
+    def offer(self, res, nSamples):
+        """
+        :param res: JSON-formatted block
+        :type res: str
+        :param nSamples: number of samples in the block, 0 for messages without samples
+        :type nSamples: int
+        :returns: list of the messages to be written to the client now
+        """
+        if self.policy == 'merge' and (self.held or self.inFlight >= self.watermark):
+            # Held too, so that they keep their place among the blocks, but never dropped (see hold)
+            self.hold(res, nSamples)
+            return []
+        if self.inFlight < self.watermark or nSamples == 0:
+            return [res]
+        if self.inFlight >= self.limit:
+            self.observe('dropped', nSamples)
+            return []
+        if self.policy == 'skip':
+            self.observe('dropped', nSamples)
+            return []
+        factor = 2**min(int(self.inFlight//self.watermark), 3)
+        message, kept = downsample(res, factor)
+        self.observe('dropped', nSamples - kept)
+        return [message]
+
+    def written(self, size):
+        self.inFlight += size
+
+    def flushed(self, size):
+        """
+        :returns: list of the messages held back that can now be written
+        """
+        self.inFlight -= size
+        if self.held and self.inFlight < self.watermark:
+            held, self.held, self.heldBytes = self.held, [], 0
+            self.observe('merged', sum(nSamples for res, nSamples in held))
+            return merge(held)
+        return []
+
+    def hold(self, res, nSamples):
+        self.held.append((res, nSamples))
+        self.heldBytes += len(res)
+        while self.heldBytes > self.watermark:
+            # The oldest block but the newest message is dropped, the messages without samples kept
+            oldest = next((i for i, (held, n) in enumerate(self.held[:-1]) if n > 0), None)
+            if oldest is None:
+                break
+            held, n = self.held.pop(oldest)
+            self.heldBytes -= len(held)
+            self.observe('dropped', n)
+
+def parse(res):
+    return json.loads(res, object_pairs_hook=collections.OrderedDict)
+
+def downsample(res, factor):
+    """
+    :returns: tuple with the block keeping one sample out of `factor`, and the number of samples kept
+    """
+    block = parse(res)
+    kept = 0
+    for key, value in block.items():
+        if isinstance(value, list):
+            block[key] = value[::factor]
+            kept = len(block[key])
+    block['step'] = factor*block.get('step', 1)
+    return json.dumps(block, separators=(',', ':')), kept
+
+def merge(messages):
+    """
+    :param messages: messages held back, each with its number of samples, 0 for messages without samples
+    :type messages: list of tuples
+    :returns: list of messages in which every run of consecutive blocks is merged into one
+
+    Messages without samples (e.g. gap markers or events, whose properties may be lists too) are kept as they are,
+    in order, and end the run of blocks before them.
+    """
+    merged = []
+    run = None
+    for res, nSamples in messages:
+        block = parse(res) if nSamples > 0 else None
+        if block is None or 'step' in block:
+            if run is not None:
+                merged.append(json.dumps(run, separators=(',', ':')))
+                run = None
+            merged.append(res)
+        elif run is None:
+            run = block
+        else:
+            for key, value in block.items():
+                if isinstance(value, list):
+                    run[key] = run.get(key, []) + value
+            run['droppedSamples'] = run.get('droppedSamples', 0) + block.get('droppedSamples', 0)
+            run['drift'] = block.get('drift', run.get('drift'))
+    if run is not None:
+        merged.append(json.dumps(run, separators=(',', ':')))
+    return merged
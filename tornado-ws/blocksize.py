@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: blocksize
+   :synopsis: Adaptive block size for :meth:`BITalino.read` based on a latency target
+
+*Created on Mon Oct 19 2026*
+"""
+
+class LinearCost(object):
+    """
+    :param smoothing: weight given to each new observation
+    :type smoothing: float
+
+    Running estimate of the cost of a stage as ``intercept + slope*nSamples``, from an exponentially weighted
+    linear regression of the observed durations on the block size.
+    """
+    def __init__(self, smoothing = 0.05):
+        self.smoothing = smoothing
+        self.observations = 0
+        self.meanSize = 0.
+        self.meanCost = 0.
+        self.varSize = 0.
+        self.covariance = 0.
+
+    def observe(self, nSamples, seconds):
+        self.observations += 1
+        a = max(self.smoothing, 1./self.observations)
+        dSize = nSamples - self.meanSize
+        dCost = seconds - self.meanCost
+        self.meanSize += a*dSize
+        self.meanCost += a*dCost
+        self.varSize = (1-a)*(self.varSize + a*dSize*dSize)
+        self.covariance = (1-a)*(self.covariance + a*dSize*dCost)
+
+    def coefficients(self):
+        """
+        :returns: tuple with the fixed cost per block and the cost per sample (seconds)
+
+        While the block size has barely changed the two cannot be told apart, and the whole cost is taken as
+        proportional to the number of samples.
+        """
+        if self.observations == 0:
+            return 0., 0.
+        if self.varSize < 1.:
+            return 0., self.meanCost/max(self.meanSize, 1.)
+        slope = max(self.covariance/self.varSize, 0.)
+        return max(self.meanCost - slope*self.meanSize, 0.), slope
+
+class BlockSizer(object):
+    """
+    :param SamplingRate: sampling frequency (Hz) of the stream
+    :type SamplingRate: int or float
+    :param latency: target time (seconds) from the acquisition of the first sample of a block to its delivery
+    :type latency: float
+    :param maxSamples: largest block ever requested
+    :type maxSamples: int or None
+
+    Chooses the number of samples to request on each :meth:`BITalino.read`.
+
+    A block of *n* samples waits *n/SamplingRate* seconds for its last sample, and then goes through stages (e.g.
+    decoding, encoding and sending) whose costs are measured with :meth:`observe`. The block size is the largest
+    one that still meets *latency*, as larger blocks amortize the fixed cost of each system call, encoding and
+    message; it is never smaller than what is needed to keep up with the device.
+    """
+    def __init__(self, SamplingRate, latency = 0.25, maxSamples = None):
+        self.samplingRate = float(SamplingRate)
+        self.latency = float(latency)
+        self.maxSamples = int(maxSamples or max(SamplingRate, 1))
+        self.costs = {}
+        self.nSamples = self.clamp(self.samplingRate*self.latency)
+
+    def clamp(self, nSamples):
+        return int(min(max(nSamples, 1), self.maxSamples))
+
+    def observe(self, stage, nSamples, seconds):
+        """
+        :param stage: name of the stage of the pipeline
+        :type stage: str
+        :param nSamples: number of samples in the block
+        :type nSamples: int
+        :param seconds: time the stage took for that block
+        :type seconds: float
+        """
+        if stage not in self.costs:
+            self.costs[stage] = LinearCost()
+        self.costs[stage].observe(nSamples, seconds)
+
+    def size(self):
+        """
+        :returns: number of samples to request on the next read
+        """
+        intercept, slope = 0., 0.
+        for cost in list(self.costs.values()):
+            a, b = cost.coefficients()
+            intercept += a
+            slope += b
+        period = 1./self.samplingRate
+        # Largest block meeting the latency target: n*period + intercept + n*slope <= latency
+        best = (self.latency - intercept)/(period + slope)
+        # Smallest block the pipeline can keep up with: intercept + n*slope <= n*period
+        if slope < period:
+            best = max(best, intercept/(period - slope))
+        else:
+            best = self.maxSamples
+        self.nSamples = self.clamp(int(best))
+        return self.nSamples
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: clock
+   :synopsis: Sample counter and host clock alignment for acquired blocks
+
+*Created on Mon Oct 19 2026*
+"""
+
+import time
+import numpy
+
+# Host clock of every timestamp, unaffected by changes to the system time
+monotonic = time.monotonic
+
+class SampleClock(object):
+    """
+    :param SamplingRate: nominal sampling frequency (Hz) set on the device
+    :type SamplingRate: int or float
+    :param smoothing: weight given to each new block in the drift estimate
+    :type smoothing: float
+
+    Keeps a 64-bit running sample counter for a BITalino acquisition by unwrapping the 4-bit sequence number
+    (``nSeq``) of each frame, and aligns it with the host monotonic clock.
+
+    Any jump in ``nSeq`` other than 1 is accounted as dropped frames, so the counter always reflects the sample
+    index on the device, not the number of frames received. The host time at which each block is completed is
+    fitted against the counter with an exponentially weighted linear regression, which yields both the host time
+    of any sample index and the drift of the device clock relative to its nominal *SamplingRate*.
+
+    .. note:: A jump of 16 or more frames cannot be told apart from a shorter one, since ``nSeq`` overflows at 15.
+    """
+    def __init__(self, SamplingRate, smoothing = 0.01):
+        self.samplingRate = float(SamplingRate)
+        self.smoothing = float(smoothing)
+        self.count = 0
+        self.dropped = 0
+        self.lastSeq = None
+        self.restarted = False
+        self.origin = None
+        self.blocks = 0
+        # Weighted means and (co)variance of (sample index, host time) at the end of each block
+        self.meanIndex = 0.
+        self.meanTime = 0.
+        self.varIndex = 0.
+        self.covariance = 0.
+
+    def update(self, nSeq, hostTime = None):
+        """
+        :param nSeq: sequence numbers of the block, as in the first column returned by :meth:`BITalino.read`
+        :type nSeq: array of int
+        :param hostTime: host monotonic time (seconds) at which the last sample of the block was received
+        :type hostTime: float or None
+        :returns: dictionary with the alignment of the block
+
+        Advances the counter over a block of samples. The returned dictionary structure contains the following
+        key-value pairs:
+
+        ===============  ===========================================================  ======
+        Key              Value                                                        Type
+        ===============  ===========================================================  ======
+        sampleIndex      Running index of the first sample of the block               int
+        timestamp        Host time of the first sample of the block (seconds)         float
+        droppedSamples   Frames lost before or within the block                       int
+        drift            Device clock drift relative to *SamplingRate* (ppm)          float
+        indices          Running index of every sample of the block                   array
+        ===============  ===========================================================  ======
+        """
+        hostTime = monotonic() if hostTime is None else hostTime
+        nSeq = numpy.asarray(nSeq).astype('int64')
+        if len(nSeq) == 0:
+            info = self.info(self.count, 0)
+            info['indices'] = numpy.zeros(0, dtype='int64')
+            return info
+
+        steps = numpy.empty(len(nSeq), dtype='int64')
+        steps[1:] = (nSeq[1:] - nSeq[:-1]) % 16
+        steps[0] = 1 if self.lastSeq is None else (nSeq[0] - self.lastSeq) % 16
+        steps[steps == 0] = 16
+        if self.restarted:
+            # Samples missed while the acquisition was interrupted, from the host time elapsed since then
+            self.restarted = False
+            if self.origin is not None:
+                expected = int(round(self.meanIndex + (hostTime - self.origin - self.meanTime)/self.period()))
+                steps[0] += max(expected - (self.count + len(steps) - 1), 0)
+        indices = self.count - 1 + numpy.cumsum(steps)
+        dropped = int(steps.sum()) - len(steps)
+
+        self.lastSeq = int(nSeq[-1])
+        self.count = int(indices[-1]) + 1
+        self.dropped += dropped
+        self.fit(int(indices[-1]), hostTime)
+        info = self.info(int(indices[0]), dropped)
+        info['indices'] = indices
+        return info
+
+    def restart(self):
+        """
+        Continues the counter over a new acquisition of the same device, e.g. after reconnecting to it, whose
+        ``nSeq`` starts over. The samples missed in between are estimated from the host time elapsed and accounted
+        as dropped, so that the sample index and the timestamps remain continuous.
+        """
+        self.lastSeq = None
+        self.restarted = True
+
+    def fit(self, index, hostTime):
+        """
+        :param index: running index of a sample
+        :type index: int
+        :param hostTime: host monotonic time (seconds) at which that sample was received
+        :type hostTime: float
+
+        Adds a point to the regression of host time on sample index.
+        """
+        if self.origin is None:
+            self.origin = hostTime
+        t = hostTime - self.origin
+        self.blocks += 1
+        if self.blocks == 1:
+            self.meanIndex, self.meanTime = float(index), t
+            return
+        a = max(self.smoothing, 1./self.blocks)
+        dIndex = index - self.meanIndex
+        dTime = t - self.meanTime
+        self.meanIndex += a*dIndex
+        self.meanTime += a*dTime
+        self.varIndex = (1-a)*(self.varIndex + a*dIndex*dIndex)
+        self.covariance = (1-a)*(self.covariance + a*dIndex*dTime)
+
+    def period(self):
+        """
+        :returns: estimated host seconds elapsed per sample
+
+        Falls back to the nominal period until enough blocks have been seen to span at least one second.
+        """
+        if self.varIndex < self.samplingRate**2/12.:
+            return 1./self.samplingRate
+        return self.covariance/self.varIndex
+
+    def drift(self):
+        """
+        :returns: drift of the device clock relative to the nominal sampling rate, in parts per million
+        """
+        return (self.period()*self.samplingRate - 1.)*1e6
+
+    def timestamp(self, index):
+        """
+        :param index: running index of a sample
+        :type index: int
+        :returns: estimated host monotonic time (seconds) at which the sample was acquired
+        """
+        if self.origin is None:
+            return None
+        return self.origin + self.meanTime + (index - self.meanIndex)*self.period()
+
+    def index(self, hostTime):
+        """
+        :param hostTime: host monotonic time (seconds)
+        :type hostTime: float
+        :returns: running index of the sample acquired at `hostTime`, the inverse of :meth:`timestamp`, or the next
+                  sample before the first block
+        """
+        if self.origin is None:
+            return self.count
+        return int(round(self.meanIndex + (hostTime - self.origin - self.meanTime)/self.period()))
+
+    def info(self, index, dropped):
+        return {'sampleIndex': index,
+                'timestamp': self.timestamp(index),
+                'droppedSamples': dropped,
+                'drift': self.drift()}
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: devices
+   :synopsis: Concurrent discovery and connection of fleets of BITalino devices
+
+*Created on Mon Oct 19 2026*
+
+Discovers devices nearby and connects to many of them at once, remembering what was learnt about each device in a
+local file so that restarts skip the discovery and the version handshake. Usage::
+
+    python devices.py [--refresh]
+    python devices.py connect address [address ...]
+"""
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+from multiprocessing.pool import ThreadPool
+
+# Run as a script, the acquisition package is not on the path yet
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from acquisition.bitalino import BITalino, ExceptionCode
+from acquisition.transport import MAC_ADDRESS
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), 'ServerBIT', 'devices.json')
+
+class DeviceCache(object):
+    """
+    :param path: JSON file where the cache is kept
+    :type path: str
+    :param ttl: time (seconds) after which a device not seen again is no longer taken as nearby
+    :type ttl: int or float
+
+    What is known about each device, by MAC address or serial port: its name, the last time it was discovered or
+    connected to, and its capabilities as returned by :meth:`BITalino.capabilities` (version string, whether it is
+    a BITalino 2.0, and the features it supports).
+
+    The TTL only applies to whether a device is taken as nearby; capabilities are kept until the device reports
+    others, as they only change with a firmware update.
+    """
+    def __init__(self, path = CACHE_PATH, ttl = 3600):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        try:
+            with open(path) as infile:
+                self.entries = json.load(infile)
+        except (IOError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        with self.lock:
+            content = json.dumps(self.entries, indent=1, sort_keys=True)
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Written aside and renamed, so that a crash never leaves a truncated cache
+        with open(self.path + '.tmp', 'w') as outfile:
+            outfile.write(content)
+        os.rename(self.path + '.tmp', self.path)
+
+    def get(self, address):
+        """
+        :returns: dictionary with what is known about the device, empty if nothing
+        """
+        with self.lock:
+            return dict(self.entries.get(address, {}))
+
+    def update(self, address, **fields):
+        """
+        Records `fields` for the device, and that it was seen now.
+        """
+        with self.lock:
+            entry = self.entries.setdefault(address, {})
+            entry.update(fields)
+            entry['seen'] = time.time()
+
+    def nearby(self):
+        """
+        :returns: list of (tuples) with MAC address and name of each device seen within the TTL
+        """
+        limit = time.time() - self.ttl
+        with self.lock:
+            return sorted((address, entry.get('name')) for address, entry in self.entries.items() if entry.get('seen', 0) >= limit)
+
+def discover(cache = None, duration = 8, refresh = False, workers = 16):
+    """
+    :param cache: cache of the devices, whose fresh entries are returned instead of running a discovery
+    :type cache: DeviceCache or None
+    :param duration: length of the bluetooth inquiry (in units of 1.28 seconds)
+    :type duration: int
+    :param refresh: whether to run a discovery even if the cache has fresh entries
+    :type refresh: bool
+    :param workers: number of names looked up at once
+    :type workers: int
+    :returns: list of (tuples) with MAC address and name of each device found, as :func:`bitalino.find`
+
+    Unlike :func:`bitalino.find`, which looks the name of each device up after the other, the names that are not
+    cached are looked up concurrently.
+    """
+    if cache is not None and not refresh:
+        known = cache.nearby()
+        if known:
+            return known
+    if platform.system() != 'Windows' and platform.system() != 'Linux':
+        raise Exception(ExceptionCode.INVALID_PLATFORM)
+    try:
+        import bluetooth
+    except Exception as e:
+        raise Exception(ExceptionCode.IMPORT_FAILED + str(e))
+    addresses = bluetooth.discover_devices(duration=duration, lookup_names=False)
+    names = {}
+    for address in addresses:
+        names[address] = cache.get(address).get('name') if cache is not None else None
+    unknown = [address for address in addresses if names[address] is None]
+    if unknown:
+        pool = ThreadPool(min(workers, len(unknown)))
+        try:
+            for address, name in zip(unknown, pool.map(bluetooth.lookup_name, unknown)):
+                names[address] = name
+        finally:
+            pool.close()
+    found = [(address, names[address]) for address in addresses]
+    if cache is not None:
+        for address, name in found:
+            cache.update(address, name=name)
+        cache.save()
+    return found
+
+def connect(address, timeout = None, version = None, cache = None):
+    """
+    :param address: MAC address or serial port of the device, or a name starting with ``synthetic``
+    :type address: str
+    :param timeout: maximum amount of time (seconds) elapsed while waiting for the device to respond
+    :type timeout: int, float or None
+    :param version: version string of the device, if already known, to skip the version handshake
+    :type version: str or None
+    :param cache: cache of the devices, which supplies the version of a device known by its MAC address and is
+                  updated with the capabilities of the device
+    :type cache: DeviceCache or None
+    :returns: device connected and idle
+
+    The version handshake is skipped for a device whose version is given or cached, which saves a round trip on
+    startup; the device checks it again, and corrects it if needed, whenever its acquisition is stopped (see
+    :meth:`BITalino.stop`). Devices on a serial port always go through the handshake.
+    """
+    # Unlike a MAC address, a serial port may lead to a different device from one session to the next
+    if version is None and cache is not None and MAC_ADDRESS.match(address):
+        version = cache.get(address).get('version')
+    if address.startswith('synthetic'):
+        # Only needed without hardware, and kept out of the import of this module
+        from synthetic import SyntheticBITalino
+        device = SyntheticBITalino(address, timeout, version=version)
+    else:
+        device = BITalino(address, timeout, version)
+    if cache is not None:
+        cache.update(address, **device.capabilities())
+    return device
+
+def connectAll(addresses, timeout = 5., cache = None, workers = 16):
+    """
+    :param addresses: MAC addresses or serial ports of the devices
+    :type addresses: list of str
+    :param timeout: maximum amount of time (seconds) elapsed while waiting for each device to respond
+    :type timeout: int or float
+    :param cache: cache of the devices, used as in :func:`connect`
+    :type cache: DeviceCache or None
+    :param workers: number of devices connected to at once
+    :type workers: int
+    :returns: tuple with a dictionary of the devices connected and a dictionary of the errors of those that
+              failed, both by address
+
+    Connects to all the devices concurrently, so that bringing up a fleet takes about as long as its slowest
+    device rather than the sum of all. Each device is given *timeout* to answer, and one that does not is reported
+    as failed without holding the others back.
+    """
+    devices, errors = {}, {}
+    if not addresses:
+        return devices, errors
+
+    def attempt(address):
+        try:
+            return address, connect(address, timeout, cache=cache), None
+        except Exception as e:
+            return address, None, str(e)
+
+    pool = ThreadPool(min(workers, len(addresses)))
+    try:
+        for address, device, error in pool.imap_unordered(attempt, addresses):
+            if device is None:
+                errors[address] = error
+            else:
+                devices[address] = device
+    finally:
+        pool.close()
+    if cache is not None:
+        cache.save()
+    return devices, errors
+
+if __name__ == '__main__':
+    cache = DeviceCache()
+    if len(sys.argv) > 1 and sys.argv[1] == 'connect':
+        initTime = time.time()
+        devices, errors = connectAll(sys.argv[2:], cache=cache)
+        print('%d connected, %d failed in %.2f s' % (len(devices), len(errors), time.time() - initTime))
+        for address, device in sorted(devices.items()):
+            print('%s %s' % (address, device.versionString))
+            device.close()
+        for address, error in sorted(errors.items()):
+            print('%s FAILED %s' % (address, error))
+    else:
+        for address, name in discover(cache, refresh='--refresh' in sys.argv):
+            print('%s %s' % (address, name))
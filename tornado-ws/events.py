@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: events
+   :synopsis: Markers posted by clients or local code, stamped against the sample counter
+
+*Created on Mon Oct 19 2026*
+
+Events (e.g. stimulus onsets or user annotations) are posted to ServerBIT with a label and, optionally, any
+JSON-compatible data and a state of the digital outputs to be set:
+
+* over the WebSocket, as a message such as ``{"event": "stimulus", "data": {"image": 12}, "trigger": [1, 0]}``
+* over HTTP, by POSTing ``{"label": "stimulus", "data": ..., "trigger": ...}`` to ``/events``
+
+Each event is stamped with the running index of the sample acquired when it was posted, from the fit of the host
+clock against the sample counter (see :class:`clock.SampleClock`), and is then sent to the clients among the
+blocks, as ``{"event": <label>, "id": ..., "sampleIndex": ..., "timestamp": ..., "data": ...}``, and recorded with
+the session. An event with a trigger is stamped instead at the first sample whose digital outputs show the new
+state, which places it on the very sample at which the device set them, whatever the time taken to write the
+command; ``"aligned"`` tells whether that sample was found.
+"""
+
+import concurrent.futures
+import json
+import os
+import threading
+import numpy
+
+from acquisition.errors import ExceptionCode
+from clock import monotonic
+
+def checkTrigger(trigger):
+    """
+    :param trigger: state of the digital outputs, as posted
+    :returns: the state as a list of int
+    :raises ValueError: `trigger` is not a list of 2 or 4 values, each 0 or 1
+    """
+    if not isinstance(trigger, list) or len(trigger) not in (2, 4) or \
+       not all(isinstance(value, int) and value in (0, 1) for value in trigger):
+        raise ValueError('"trigger" must be a list of 2 or 4 values, each 0 or 1')
+    return [int(value) for value in trigger]
+
+class EventChannel(object):
+    """
+    :param window: time (seconds) around the writing of a trigger within which the change of the digital outputs is
+                   looked for
+    :type window: int or float
+
+    Events are posted from any thread and stamped by the acquisition thread after each block, when the clock has
+    been fitted to the samples acquired meanwhile. Triggers are written to the device from a thread of their own, so
+    that neither the IOLoop nor the acquisition waits for the device to accept them.
+    """
+    def __init__(self, window = 1.):
+        self.window = window
+        self.lock = threading.Lock()
+        # Events posted and not stamped yet, and those of triggers waiting for the change of the digital outputs
+        self.pending = []
+        self.triggers = []
+        # Device acquiring, set by the acquisition thread while connected
+        self.device = None
+        self.writer = concurrent.futures.ThreadPoolExecutor(1)
+        self.count = 0
+        # Digital outputs of the last sample of the previous block, and index of the last change matched to a trigger
+        self.lastOutputs = None
+        self.lastEdge = -1
+
+    def post(self, label, data = None, trigger = None, hostTime = None):
+        """
+        :param label: label of the event
+        :type label: str
+        :param data: anything JSON-compatible sent and recorded along with the event
+        :param trigger: state of the digital outputs to be set, as the *digitalArray* of :meth:`BITalino.trigger`
+        :type trigger: list or None
+        :param hostTime: host monotonic time of the event, by default now
+        :type hostTime: float or None
+        :returns: future, done once the event is queued, and for a trigger once it is written to the device, raising
+                  if the device is not acquiring or does not have as many outputs
+        :raises ValueError: `trigger` is not a state of the digital outputs (see :func:`checkTrigger`)
+        """
+        event = {'event': str(label)}
+        if data is not None:
+            event['data'] = data
+        if trigger is not None:
+            event['trigger'] = checkTrigger(trigger)
+            return self.writer.submit(self.fire, event)
+        event['hostTime'] = monotonic() if hostTime is None else hostTime
+        future = concurrent.futures.Future()
+        future.set_result(self.queue(event))
+        return future
+
+    def fire(self, event):
+        device = self.device
+        if device is None:
+            raise Exception(ExceptionCode.DEVICE_NOT_IN_ACQUISITION)
+        device.send(device.triggerCommand(event['trigger']))
+        # Taken once the command is written, as sending waits for the device to be ready for it
+        event['hostTime'] = monotonic()
+        return self.queue(event)
+
+    def queue(self, event):
+        with self.lock:
+            self.pending.append(event)
+        return event
+
+    def stamp(self, clock, indices, samples):
+        """
+        :param clock: clock of the acquisition, updated with the last block
+        :type clock: SampleClock
+        :param indices: running index of each sample of the last block
+        :type indices: array of int
+        :param samples: samples of the last block as rows, the digital channels in columns 1 to 4
+        :type samples: array or list of tuples
+        :returns: list of the events stamped, in the order of their samples
+        """
+        with self.lock:
+            posted, self.pending = self.pending, []
+        ready = []
+        for event in posted:
+            event['sampleIndex'] = clock.index(event.pop('hostTime'))
+            (self.triggers if 'trigger' in event else ready).append(event)
+        if self.triggers and len(indices):
+            ready.extend(self.align(numpy.asarray(indices), numpy.asarray(samples), clock.count,
+                                    int(self.window*clock.samplingRate)))
+        elif len(indices):
+            self.lastOutputs = numpy.asarray(samples[-1])[1:5]
+        ready.sort(key=lambda event: event['sampleIndex'])
+        for event in ready:
+            event['id'] = self.count
+            event['timestamp'] = clock.timestamp(event['sampleIndex'])
+            self.count += 1
+        return ready
+
+    def align(self, indices, samples, count, margin):
+        """
+        :returns: list of the triggers whose change of the digital outputs was found in the block, or that have waited
+                  longer than the window for it
+        """
+        digital = samples[:, 1:5]
+        previous = numpy.concatenate([[digital[0] if self.lastOutputs is None else self.lastOutputs], digital[:-1]])
+        self.lastOutputs = digital[-1]
+        done, waiting = [], []
+        for event in self.triggers:
+            # Samples show the outputs O1 and O2 after the inputs I1 and I2, on BITalino 2.0 as on 1.0, whose outputs
+            # O3 and O4 are not sampled; O1 and O2 are the first two values of the trigger on either version
+            state = event['trigger'][:2]
+            edges = numpy.flatnonzero((digital[:, 2:] == state).all(axis=1) & (previous[:, 2:] != state).any(axis=1) &
+                                      (indices >= event['sampleIndex'] - margin) & (indices > self.lastEdge))
+            if len(edges):
+                event['sampleIndex'] = self.lastEdge = int(indices[edges[0]])
+                event['aligned'] = True
+                done.append(event)
+            elif count > event['sampleIndex'] + margin:
+                event['aligned'] = False
+                done.append(event)
+            else:
+                waiting.append(event)
+        self.triggers = waiting
+        return done
+
+class EventLog(object):
+    """
+    :param path: directory of the session
+    :type path: str
+
+    Events of a recorded session, in ``events.jsonl``, one JSON-formatted event per line in the order they were
+    stamped. Readers only take complete lines, so that a session being recorded can be read at any time.
+    """
+    def __init__(self, path):
+        self.path = os.path.join(path, 'events.jsonl')
+        self.file = None
+        self.offset = 0
+        self.events = []
+        # Running index of the sample of each event, sorted, and the position of the event in `events`
+        self.index = numpy.zeros(0, dtype='int64')
+        self.order = numpy.zeros(0, dtype='int64')
+
+    def write(self, event):
+        if self.file is None:
+            self.file = open(self.path, 'a')
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def read(self):
+        """
+        :returns: the events recorded, read again if events were added since
+        """
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) <= self.offset:
+            return self.events
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        self.offset += len(complete)
+        added = [json.loads(line) for line in complete.decode('utf-8').splitlines() if line]
+        if added:
+            self.events.extend(added)
+            sampleIndex = numpy.array([event['sampleIndex'] for event in self.events], dtype='int64')
+            self.order = numpy.argsort(sampleIndex, kind='stable')
+            self.index = sampleIndex[self.order]
+        return self.events
+
+    def find(self, label = None, start = None, end = None):
+        """
+        :param label: label of the events wanted, all by default
+        :type label: str or None
+        :param start: index of the first sample at which events are wanted
+        :type start: int or None
+        :param end: index of the sample past the last one at which events are wanted
+        :type end: int or None
+        :returns: list of the events wanted, in the order of their samples
+
+        The range is found by a binary search on the sample of each event.
+        """
+        self.read()
+        lo = 0 if start is None else numpy.searchsorted(self.index, start, 'left')
+        hi = len(self.index) if end is None else numpy.searchsorted(self.index, end, 'left')
+        events = [self.events[i] for i in self.order[lo:hi]]
+        return events if label is None else [event for event in events if event['event'] == label]
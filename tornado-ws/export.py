@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: export
+   :synopsis: Conversion of recorded sessions to columnar files for analysis
+
+*Created on Mon Oct 19 2026*
+
+Converts the sessions recorded by ServerBIT (see :mod:`recording`) to files that analysis tools read directly, with
+a ``sampleIndex`` column (int64), in which missing samples show as jumps, and one column per label (uint16):
+
+* ``npy``: a directory per session, with one NumPy array file per column, which can be memory-mapped
+* ``hdf5``: one file per session, with one chunked, gzip-compressed dataset per column (requires `h5py`)
+* ``parquet``: one file per session, in zstd-compressed row groups (requires `pyarrow`)
+
+The metadata of the session (labels, sampling rate, device, start time and running index of the first sample) goes
+along, as ``meta.json`` in the directory, as attributes of the HDF5 file or as the ``serverbit`` key of the Parquet
+metadata. Sessions are read and written a block of rows at a time, so that memory use does not depend on their
+length. The blocks of a session are read by a pool of processes, which also write them in place for ``npy``, and
+are otherwise written by the main process in index order. A session still being recorded is converted up to its
+last complete chunk. Usage::
+
+    python export.py npy|hdf5|parquet output session [session ...] [--jobs=N]
+
+where each session is the directory of a session or a directory of sessions, e.g. ``~/ServerBIT/recordings``.
+"""
+
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import numpy
+
+# Run as a script, the acquisition package is not on the path yet
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from recording import Recording, sessions
+
+# Rows read and written at once, about 8 MB with 11 columns
+BLOCK_ROWS = 1 << 18
+
+def groups(index, rows = BLOCK_ROWS):
+    """
+    :param index: chunks of the session
+    :type index: array of recording.CHUNK
+    :param rows: number of rows of each group, rounded up to whole chunks
+    :type rows: int
+    :returns: iterator over tuples with the first chunk of each group of consecutive chunks and the one past its last
+    """
+    ends = (index['offset'] + index['count']).astype('int64')
+    i = 0
+    while i < len(index):
+        j = max(int(numpy.searchsorted(ends, int(index['offset'][i]) + rows, 'right')), i + 1)
+        yield i, j
+        i = j
+
+def blocks(recording, index, rows = BLOCK_ROWS):
+    """
+    :param recording: session to be read
+    :type recording: Recording
+    :param index: chunks of the session to be read
+    :type index: array of recording.CHUNK
+    :param rows: number of rows of each block, rounded up to whole chunks
+    :type rows: int
+    :returns: iterator over tuples with the running index and the samples of consecutive rows
+
+    The chunks follow each other in ``samples.bin``, so that each block is read at once.
+    """
+    rowBytes = 2*len(recording.labels)
+    with open(os.path.join(recording.path, 'samples.bin'), 'rb') as f:
+        for i, j in groups(index, rows):
+            group = index[i:j]
+            start, count = int(group['offset'][0]), int(group['count'].sum())
+            f.seek(start*rowBytes)
+            samples = numpy.frombuffer(f.read(count*rowBytes), dtype='<u2').reshape(count, len(recording.labels))
+            indices = numpy.arange(start, start + count) + numpy.repeat(group['first'] - group['offset'].astype('int64'), group['count'])
+            yield indices, samples
+
+def columnsOf(recording):
+    """
+    :returns: list of tuples with the name and type of each column exported from `recording`
+    """
+    return [('sampleIndex', 'int64')] + [(label, 'uint16') for label in recording.labels]
+
+def convert(path, format, target, first, last, start):
+    """
+    :param first: first chunk of the block
+    :type first: int
+    :param last: chunk past the last one of the block
+    :type last: int
+    :param start: row of the output at which the block starts
+    :type start: int
+    :returns: columns of the block, or `None` once written to `target` for a format written in place
+
+    Reads a block of a session, in a process of the pool of :func:`exportAll`.
+    """
+    recording = Recording(path)
+    index = recording.chunks()[first:last]
+    indices, samples = next(blocks(recording, index, int(index['count'].sum())))
+    columns = [indices] + [samples[:, i] for i in range(samples.shape[1])]
+    writer = FORMATS[format]
+    if not writer.inPlace:
+        return columns
+    out = writer.reopen(target, columnsOf(recording))
+    try:
+        out.write(start, columns)
+    finally:
+        out.close()
+
+class NpyWriter(object):
+    """
+    Directory with ``<column>.npy`` for each column, written as the rows arrive since their number is known from the
+    start. Rows are written at their own offset, so that the processes of a pool write their blocks at once.
+    """
+    extension = ''
+    inPlace = True
+
+    def __init__(self, path, columns, rows, meta):
+        os.mkdir(path)
+        self.files = []
+        for name, dtype in columns:
+            f = open(os.path.join(path, name + '.npy'), 'wb')
+            numpy.lib.format.write_array_header_1_0(f, {'descr': numpy.lib.format.dtype_to_descr(numpy.dtype(dtype)),
+                                                        'fortran_order': False, 'shape': (rows,)})
+            # Before any other process opens it
+            f.flush()
+            self.files.append((f, numpy.dtype(dtype), f.tell()))
+        with open(os.path.join(path, 'meta.json'), 'w') as outfile:
+            json.dump(meta, outfile)
+
+    @classmethod
+    def reopen(cls, path, columns):
+        """
+        :returns: writer of the rows of a directory created by another writer, e.g. in another process
+        """
+        writer = cls.__new__(cls)
+        writer.files = []
+        for name, dtype in columns:
+            f = open(os.path.join(path, name + '.npy'), 'r+b')
+            numpy.lib.format.read_magic(f)
+            numpy.lib.format.read_array_header_1_0(f)
+            writer.files.append((f, numpy.dtype(dtype), f.tell()))
+        return writer
+
+    def write(self, start, columns):
+        for (f, dtype, offset), values in zip(self.files, columns):
+            f.seek(offset + start*dtype.itemsize)
+            f.write(numpy.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    def close(self):
+        for f, dtype, offset in self.files:
+            f.close()
+
+class Hdf5Writer(object):
+    """
+    HDF5 file with a dataset for each column, in chunks of 64k rows compressed with gzip after byte shuffling.
+    """
+    extension = '.h5'
+    inPlace = False
+
+    def __init__(self, path, columns, rows, meta):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError('Exporting to HDF5 requires h5py (pip install h5py)')
+        self.file = h5py.File(path, 'w')
+        for key, value in meta.items():
+            self.file.attrs[key] = json.dumps(value) if isinstance(value, (list, dict)) else value
+        self.datasets = [self.file.create_dataset(name, shape=(rows,), maxshape=(None,), dtype=dtype,
+                                                  chunks=(1 << 16,), compression='gzip', shuffle=True)
+                         for name, dtype in columns]
+
+    def write(self, start, columns):
+        for dataset, values in zip(self.datasets, columns):
+            dataset[start:start+len(values)] = values
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter(object):
+    """
+    Parquet file with a row group per block, compressed with zstd.
+    """
+    extension = '.parquet'
+    inPlace = False
+
+    def __init__(self, path, columns, rows, meta):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Exporting to Parquet requires pyarrow (pip install pyarrow)')
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(name, pyarrow.from_numpy_dtype(numpy.dtype(dtype))) for name, dtype in columns],
+                                     metadata={'serverbit': json.dumps(meta)})
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, start, columns):
+        arrays = [self.pyarrow.array(values, type=field.type) for field, values in zip(self.schema, columns)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+FORMATS = {'npy': NpyWriter, 'hdf5': Hdf5Writer, 'parquet': ParquetWriter}
+
+def export(path, format, output, rows = BLOCK_ROWS, pool = None, ahead = 2):
+    """
+    :param path: directory of the session
+    :type path: str
+    :param format: ``"npy"``, ``"hdf5"`` or ``"parquet"``
+    :type format: str
+    :param output: directory where the converted session is written, named after the session
+    :type output: str
+    :param rows: number of rows read and written at once
+    :type rows: int
+    :param pool: processes by which the blocks are read, by :func:`convert`, or `None` to read them here
+    :type pool: concurrent.futures.Executor or None
+    :param ahead: number of blocks submitted to the pool ahead of the one written, which bounds the memory taken by
+                  the blocks read and not written yet
+    :type ahead: int
+    :returns: tuple with the path written and its number of rows
+    """
+    recording = Recording(path)
+    writer = FORMATS[format]
+    # The chunks recorded so far, for a session still being recorded
+    index = recording.chunks()
+    nRows = int(index['count'].sum())
+    columns = columnsOf(recording)
+    meta = dict((key, recording.meta[key]) for key in ('labels', 'sampling_rate', 'device', 'start_time', 'first_index') if key in recording.meta)
+    target = os.path.join(output, os.path.basename(os.path.normpath(path)) + writer.extension)
+    out = writer(target, columns, nRows, meta)
+    try:
+        if pool is None:
+            start = 0
+            for indices, samples in blocks(recording, index, rows):
+                out.write(start, [indices] + [samples[:, i] for i in range(samples.shape[1])])
+                start += len(indices)
+        else:
+            parts = [(i, j, int(index['offset'][i] - index['offset'][0])) for i, j in groups(index, rows)]
+            submitted = collections.deque()
+            for i, j, start in parts:
+                submitted.append((start, pool.submit(convert, path, format, target, i, j, start)))
+                if len(submitted) > ahead:
+                    write(out, *submitted.popleft())
+            while submitted:
+                write(out, *submitted.popleft())
+    finally:
+        out.close()
+    return target, nRows
+
+def write(out, start, future):
+    """
+    Writes a block read by :func:`convert`, unless it was written in place.
+    """
+    columns = future.result()
+    if columns is not None:
+        out.write(start, columns)
+
+def expand(paths):
+    """
+    :returns: list of the directories of the sessions given, either directly or as directories of sessions
+    """
+    found = []
+    for path in paths:
+        if os.path.isfile(os.path.join(path, 'meta.json')):
+            found.append(path)
+        else:
+            found.extend(os.path.join(path, name) for name in sessions(path))
+    return found
+
+def exportAll(paths, format, output, jobs = None):
+    """
+    :param jobs: number of processes reading the blocks of each session, by default one per CPU
+    :type jobs: int or None
+    :returns: iterator over the tuples returned by :func:`export`, as each session is converted
+
+    The sessions are converted one after the other, each by all the processes, so that a single long session is
+    converted as fast as many short ones.
+    """
+    if format not in FORMATS:
+        raise ValueError('Unknown format %r, expected one of %s' % (format, ', '.join(sorted(FORMATS))))
+    paths = expand(paths)
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1:
+        for path in paths:
+            yield export(path, format, output)
+        return
+    # Started afresh rather than forked, as a process forked while a file is being written would hold it open, and
+    # with it the lock taken by HDF5, until the pool is shut down
+    with concurrent.futures.ProcessPoolExecutor(jobs, multiprocessing.get_context('spawn')) as pool:
+        for path in paths:
+            yield export(path, format, output, pool=pool, ahead=2*jobs)
+
+if __name__ == '__main__':
+    jobs = [int(arg.split('=', 1)[1]) for arg in sys.argv[1:] if arg.startswith('--jobs=')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--jobs=')]
+    if len(args) < 3:
+        print('Usage: python export.py npy|hdf5|parquet output session [session ...] [--jobs=N]')
+        sys.exit(1)
+    for target, nRows in exportAll(args[2:], args[0], args[1], jobs[-1] if jobs else None):
+        print('%s %d rows' % (target, nRows))
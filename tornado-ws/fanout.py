@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: fanout
+   :synopsis: Hand-off of the encoded blocks from the acquisition process to the worker processes
+
+*Created on Mon Oct 19 2026*
+
+With ``"workers"`` set above 1, ServerBIT runs as one acquisition process, which owns the device and encodes each
+block once, and as many worker processes, which all listen on the WebSocket port with ``SO_REUSEPORT`` so that the
+kernel spreads the clients among them. The blocks reach the workers over a Unix domain socket, each as a 20-byte
+header (the big-endian length of the block, the host monotonic time at which it was encoded as a double, its number
+of samples and the number of columns of each) followed by the JSON-formatted block and, for the history of each
+worker, by the running index (int64) and the columns (uint16) of its samples. The events posted to a worker (see
+:mod:`events`) and the settings changed through it go the other way on the same connection, as one JSON-formatted
+line each.
+"""
+
+import atexit
+import functools
+import json
+import os
+import socket
+import struct
+import tempfile
+import numpy
+
+from tornado import iostream, netutil
+
+from rawstream import StreamServer
+
+HEADER = struct.Struct('>IdII')
+
+# Connection of a worker to the acquisition process, once subscribed
+upstream = None
+
+def address():
+    """
+    :returns: path of the Unix domain socket of the blocks, unique to the acquisition process
+    """
+    return os.path.join(tempfile.gettempdir(), 'serverbit-%d.sock' % os.getpid())
+
+def supported():
+    """
+    :returns: whether this platform lets several processes listen on the same port and has Unix domain sockets
+    """
+    return hasattr(socket, 'SO_REUSEPORT') and hasattr(socket, 'AF_UNIX')
+
+class FanoutServer(StreamServer):
+    """
+    :param limit: bytes written to a worker and not yet read, beyond which blocks are dropped for that worker
+    :type limit: int
+    :param receive: called on the IOLoop with each event or settings posted to a worker, as a `dict`
+    :type receive: callable or None
+
+    Acquisition side, with one connection per worker. A worker that falls behind by *limit* misses blocks, as a slow
+    client does with the ``skip`` policy, rather than holding back the others.
+    """
+    transport = 'workers'
+
+    def __init__(self, limit = 1 << 22, receive = None):
+        StreamServer.__init__(self, limit, nodelay=True)
+        self.receive = receive
+
+    async def handle_stream(self, stream, address):
+        stream.set_nodelay(True)
+        self.streams[stream] = 0
+        stream.set_close_callback(functools.partial(self.streams.pop, stream, None))
+        print('WORKER CONNECTED')
+        try:
+            while True:
+                line = await stream.read_until(b'\n', max_bytes=1 << 16)
+                try:
+                    event = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    continue
+                if self.receive is not None:
+                    self.receive(event)
+        except iostream.StreamClosedError:
+            pass
+
+    def publish(self, payload, readyTime = 0., nSamples = 0, samples = None):
+        """
+        :param payload: JSON-formatted block
+        :type payload: bytes
+        :param readyTime: host monotonic time at which the block was encoded
+        :type readyTime: float
+        :param nSamples: number of samples in the block, 0 for messages without samples
+        :type nSamples: int
+        :param samples: running index and values of the samples of the block
+        :type samples: tuple or None
+        """
+        if samples is None or nSamples == 0:
+            self.broadcast(HEADER.pack(len(payload), readyTime, 0, 0) + payload)
+            return
+        index = numpy.asarray(samples[0], dtype='<i8')
+        values = numpy.asarray(samples[1]).astype('<u2')
+        self.broadcast(HEADER.pack(len(payload), readyTime, len(values), values.shape[1]) + payload + index.tobytes() + values.tobytes())
+
+def bind(path):
+    """
+    :returns: listening socket of the blocks at `path`, which is removed when the acquisition process exits
+    """
+    sock = netutil.bind_unix_socket(path)
+    atexit.register(os.remove, path)
+    return sock
+
+async def subscribe(path, deliver):
+    """
+    :param path: path of the Unix domain socket of the blocks
+    :type path: str
+    :param deliver: called on the running IOLoop with each block (as `str`), the time at which it was encoded, its
+                    number of samples, and the running index and values of its samples (or `None`)
+    :type deliver: callable
+
+    Worker side. Returns once the acquisition process closes the connection, i.e. when it exits.
+    """
+    global upstream
+    stream = iostream.IOStream(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM))
+    await stream.connect(path)
+    upstream = stream
+    try:
+        while True:
+            length, readyTime, nSamples, nColumns = HEADER.unpack(await stream.read_bytes(HEADER.size))
+            payload = await stream.read_bytes(length)
+            samples = None
+            if nColumns:
+                index = numpy.frombuffer(await stream.read_bytes(8*nSamples), dtype='<i8')
+                values = numpy.frombuffer(await stream.read_bytes(2*nSamples*nColumns), dtype='<u2').reshape(nSamples, nColumns)
+                samples = (index, values)
+            deliver(payload.decode('utf-8'), readyTime, nSamples, samples)
+    except iostream.StreamClosedError:
+        pass
+
+def post(event):
+    """
+    :param event: event posted to the worker, as the keyword arguments of :meth:`events.EventChannel.post`, or
+                  settings changed, as ``{"config": {...}}``
+    :type event: dict
+    :returns: whether the event was handed to the acquisition process
+
+    Worker side, on the IOLoop.
+    """
+    if upstream is None or upstream.closed():
+        return False
+    upstream.write(json.dumps(event).encode('utf-8') + b'\n')
+    return True
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: history
+   :synopsis: Recent samples of the stream, for clients joining late or reconnecting
+
+*Created on Mon Oct 19 2026*
+
+Clients ask for the history when they connect, with either of the query arguments:
+
+* ``since=<sampleIndex>``: every sample from that index on, e.g. from the last one received before reconnecting
+* ``last=<seconds>``: the samples of the last seconds, e.g. to fill the plot when the page is loaded
+
+and receive it as a single message, before the live stream carries on from the very next sample. The message has
+the columns of a block, the ``"sampleIndex"`` of its first sample, ``"history": true``, and ``"gaps"``, a list of
+``[sampleIndex, count]`` pairs of the samples missing within it (e.g. while reconnecting to the device).
+"""
+
+import collections
+import json
+import numpy
+
+class History(object):
+    """
+    :param labels: labels of the columns of each sample
+    :type labels: list of str
+    :param SamplingRate: sampling frequency (Hz) of the stream
+    :type SamplingRate: int or float
+    :param seconds: length of the history
+    :type seconds: int or float
+    :param cached: number of history messages kept encoded
+    :type cached: int
+
+    Ring of the last samples sent, as the running index of each sample (int64) and its columns (uint16), about
+    30 bytes per sample with 6 channels. It is only accessed from the IOLoop, which writes each block just before
+    sending it, so that the history given to a client ends exactly where its live stream begins.
+
+    The message of a window of samples is encoded once and shared by the clients asking for the same window, which
+    is the case for all those joining between two blocks with the same query.
+    """
+    def __init__(self, labels, SamplingRate, seconds = 60, cached = 4):
+        self.labels = labels
+        self.samplingRate = float(SamplingRate)
+        self.capacity = max(int(seconds*SamplingRate), 1)
+        self.index = numpy.zeros(self.capacity, dtype='int64')
+        self.values = numpy.zeros((self.capacity, len(labels)), dtype='uint16')
+        # Number of samples written since the history was created
+        self.count = 0
+        self.cached = cached
+        self.messages = collections.OrderedDict()
+
+    def write(self, indices, samples):
+        """
+        :param indices: running index of each sample
+        :type indices: array of int
+        :param samples: samples as rows, with the columns of the labels
+        :type samples: array or list of lists of int
+        """
+        samples = numpy.asarray(samples)
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            indices, samples = indices[-self.capacity:], samples[-self.capacity:]
+            n = self.capacity
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        self.index[start:start+first] = indices[:first]
+        self.values[start:start+first] = samples[:first]
+        self.index[:n-first] = indices[first:]
+        self.values[:n-first] = samples[first:]
+        self.count += n
+
+    def cursor(self, sampleIndex):
+        """
+        :returns: cursor of the first sample kept whose index is at least `sampleIndex`
+        """
+        lo, hi = max(self.count - self.capacity, 0), self.count
+        while lo < hi:
+            mid = (lo + hi)//2
+            if self.index[mid % self.capacity] < sampleIndex:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, since = None, last = None):
+        """
+        :param since: index of the first sample wanted
+        :type since: int or None
+        :param last: length (seconds) of the history wanted, if `since` is not given
+        :type last: int, float or None
+        :returns: cursors of the first and past the last sample of the history wanted
+        """
+        if since is None:
+            since = self.next() - int(round(last*self.samplingRate))
+        return self.cursor(since), self.count
+
+    def next(self):
+        """
+        :returns: index of the sample following the last one written
+        """
+        return int(self.index[(self.count - 1) % self.capacity]) + 1 if self.count else 0
+
+    def message(self, since = None, last = None):
+        """
+        :returns: JSON-formatted message with the history wanted, as described in :mod:`history`
+        """
+        key = self.window(since, last)
+        if key in self.messages:
+            self.messages.move_to_end(key)
+            return self.messages[key]
+        start, end = key
+        cursors = numpy.arange(start, end) % self.capacity
+        index, values = self.index[cursors], self.values[cursors]
+        steps = numpy.diff(index)
+        missing = numpy.nonzero(steps > 1)[0]
+        block = {'history': True,
+                 'sampleIndex': int(index[0]) if len(index) else self.next(),
+                 'gaps': [[int(index[i]) + 1, int(steps[i]) - 1] for i in missing]}
+        for i, label in enumerate(self.labels):
+            block[label] = values[:, i].tolist()
+        res = json.dumps(block, separators=(',', ':'))
+        self.messages[key] = res
+        while len(self.messages) > self.cached:
+            self.messages.popitem(last=False)
+        return res
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: latency
+   :synopsis: Sample-to-client latency of ServerBIT measured with a synthetic frame source
+
+*Created on Mon Oct 19 2026*
+
+Streams from a :class:`SyntheticBITalino` through the same acquisition loop and WebSocket handler as ServerBIT, and
+measures on a local client the time from each sample becoming available on the device to its delivery. Usage::
+
+    python latency.py [sampling_rate] [batch] [seconds]
+
+A `batch` of 0 measures the block-oriented mode instead of the low-latency mode.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import numpy
+
+from tornado import ioloop, websocket
+
+import ServerBIT
+from clock import monotonic
+from synthetic import SyntheticBITalino
+
+LABELS = ["nSeq", "I1", "I2", "O1", "O2", "A1", "A2", "A3", "A4", "A5", "A6"]
+
+async def measure(device, port, seconds):
+    """
+    :returns: two arrays with the latency (seconds) of the first and of the last sample of each message
+    """
+    conn = await websocket.websocket_connect('ws://localhost:%d/' % port)
+    first, last = [], []
+    endTime = monotonic() + seconds
+    while monotonic() < endTime:
+        msg = await conn.read_message()
+        receiveTime = monotonic()
+        data = json.loads(msg)
+        index = data['sampleIndex']
+        first.append(receiveTime - device.generated(index))
+        last.append(receiveTime - device.generated(index + len(data['nSeq']) - 1))
+    conn.close()
+    return numpy.array(first), numpy.array(last)
+
+async def run(device, srate, batch, port, seconds):
+    ServerBIT.loop = ioloop.IOLoop.current()
+    ServerBIT.app.listen(port)
+    worker = threading.Thread(target=ServerBIT.BITalino_handler, args=('synthetic', [1, 2, 3, 4, 5, 6], srate, LABELS, 0.25, batch, device))
+    worker.daemon = True
+    worker.start()
+    return await asyncio.wait_for(measure(device, port, seconds), seconds+30)
+
+def report(name, latencies):
+    ms = latencies*1e3
+    p50, p90, p99 = numpy.percentile(ms, [50, 90, 99])
+    print('%-14s p50 %8.2f ms   p90 %8.2f ms   p99 %8.2f ms   max %8.2f ms' % (name, p50, p90, p99, ms.max()))
+
+if __name__ == '__main__':
+    srate = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.
+    port = 9101
+
+    ServerBIT.SocketHandler.nodelay = batch > 0
+    device = SyntheticBITalino()
+    first, last = asyncio.run(run(device, srate, batch, port, seconds))
+    print('%d messages at %d Hz, %s' % (len(first), srate, 'batch of %d' % batch if batch else 'block mode'))
+    report('first sample', first)
+    report('last sample', last)
+
+    # The acquisition thread blocks on the device and cannot be joined
+    sys.stdout.flush()
+    os._exit(0)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: lslocal
+   :synopsis: Pure-Python, in-process stand-in for the subset of pylsl used by ServerBIT
+
+*Created on Mon Oct 19 2026*
+
+Mirrors the names and signatures of `pylsl <https://github.com/labstreaminglayer/pylsl>`_ for stream metadata,
+outlets, resolution and inlets, so that code written against pylsl can be exercised on a machine without
+liblsl. Streams are only visible within the process that creates them, and the time correction is always 0.
+"""
+
+import collections
+import threading
+import time
+import weakref
+
+from clock import monotonic
+
+IRREGULAR_RATE = 0.0
+
+# Outlets alive in this process, for the resolve functions
+outlets = weakref.WeakValueDictionary()
+lock = threading.Lock()
+
+def local_clock():
+    """
+    :returns: local time (seconds) used for the timestamps of the samples
+    """
+    return monotonic()
+
+class XMLElement(object):
+    """
+    Node of the extended description of a stream, as returned by :meth:`StreamInfo.desc`.
+    """
+    def __init__(self, name = '', value = '', parent = None):
+        self.tag = name
+        self.text = value
+        self.parent = parent
+        self.children = []
+
+    def name(self):
+        return self.tag
+
+    def value(self):
+        return self.text
+
+    def empty(self):
+        return not self.tag
+
+    def append_child(self, name):
+        child = XMLElement(name, parent=self)
+        self.children.append(child)
+        return child
+
+    def append_child_value(self, name, value):
+        self.children.append(XMLElement(name, value, self))
+        return self
+
+    def first_child(self):
+        return self.children[0] if self.children else XMLElement()
+
+    def child(self, name):
+        for child in self.children:
+            if child.tag == name:
+                return child
+        return XMLElement()
+
+    def child_value(self, name = None):
+        return self.child(name).text if name is not None else self.first_child().text
+
+    def next_sibling(self, name = None):
+        if self.parent is None:
+            return XMLElement()
+        siblings = self.parent.children
+        for sibling in siblings[siblings.index(self)+1:]:
+            if name is None or sibling.tag == name:
+                return sibling
+        return XMLElement()
+
+class StreamInfo(object):
+    def __init__(self, name = 'untitled', type = '', channel_count = 1, nominal_srate = IRREGULAR_RATE, channel_format = 'float32', source_id = ''):
+        self.fields = {'name': name, 'type': type, 'channel_count': channel_count, 'nominal_srate': float(nominal_srate),
+                       'channel_format': channel_format, 'source_id': source_id, 'created_at': local_clock()}
+        self.description = XMLElement('desc')
+
+    def name(self):
+        return self.fields['name']
+
+    def type(self):
+        return self.fields['type']
+
+    def channel_count(self):
+        return self.fields['channel_count']
+
+    def nominal_srate(self):
+        return self.fields['nominal_srate']
+
+    def channel_format(self):
+        return self.fields['channel_format']
+
+    def source_id(self):
+        return self.fields['source_id']
+
+    def created_at(self):
+        return self.fields['created_at']
+
+    def desc(self):
+        return self.description
+
+class StreamOutlet(object):
+    def __init__(self, info, chunk_size = 0, max_buffered = 360):
+        self.streamInfo = info
+        self.maxBuffered = max_buffered
+        self.inlets = weakref.WeakSet()
+        with lock:
+            outlets[id(self)] = self
+
+    def info(self):
+        return self.streamInfo
+
+    def have_consumers(self):
+        return len(self.inlets) > 0
+
+    def push_sample(self, x, timestamp = 0.0, pushthrough = True):
+        self.push_chunk([x], timestamp, pushthrough)
+
+    def push_chunk(self, x, timestamp = 0.0, pushthrough = True):
+        """
+        :param x: samples, as a list of lists or a 2-D array with one row per sample
+        :param timestamp: time of the last sample, as :func:`local_clock`; the others are spaced back at the nominal
+                          rate. The current time if 0.
+        """
+        n = len(x)
+        if n == 0:
+            return
+        timestamp = timestamp or local_clock()
+        rate = self.streamInfo.nominal_srate()
+        period = 1./rate if rate > 0 else 0.
+        stamps = [timestamp - (n-1-i)*period for i in range(n)]
+        samples = [list(sample) for sample in x]
+        for inlet in list(self.inlets):
+            inlet.receive(samples, stamps)
+
+class StreamInlet(object):
+    def __init__(self, info, max_buflen = 360, max_chunklen = 0, recover = True):
+        self.streamInfo = info
+        outlet = None
+        with lock:
+            for candidate in list(outlets.values()):
+                if candidate.info() is info:
+                    outlet = candidate
+        if outlet is None:
+            raise RuntimeError('stream not found: ' + info.name())
+        capacity = int(max_buflen*info.nominal_srate()) if info.nominal_srate() > 0 else max_buflen*100
+        self.buffer = collections.deque(maxlen=max(capacity, 1))
+        self.condition = threading.Condition()
+        self.outlet = weakref.ref(outlet)
+        self.opened = False
+
+    def info(self, timeout = None):
+        return self.streamInfo
+
+    def open_stream(self, timeout = None):
+        if not self.opened:
+            self.outlet().inlets.add(self)
+            self.opened = True
+
+    def close_stream(self):
+        outlet = self.outlet()
+        if self.opened and outlet is not None:
+            outlet.inlets.discard(self)
+        self.opened = False
+
+    def time_correction(self, timeout = None):
+        return 0.0
+
+    def receive(self, samples, stamps):
+        with self.condition:
+            self.buffer.extend(zip(samples, stamps))
+            self.condition.notify_all()
+
+    def pull_sample(self, timeout = None):
+        samples, stamps = self.pull_chunk(timeout if timeout is not None else 32000000., 1)
+        return (samples[0], stamps[0]) if samples else (None, None)
+
+    def pull_chunk(self, timeout = 0.0, max_samples = 1024):
+        """
+        :returns: tuple with a list of samples and a list of their timestamps, empty if none arrived within
+                  `timeout` seconds
+        """
+        self.open_stream()
+        endTime = time.time() + timeout
+        with self.condition:
+            while not self.buffer and time.time() < endTime:
+                self.condition.wait(endTime - time.time())
+            chunk = [self.buffer.popleft() for i in range(min(max_samples, len(self.buffer)))]
+        return [sample for sample, stamp in chunk], [stamp for sample, stamp in chunk]
+
+    def samples_available(self):
+        return len(self.buffer)
+
+def resolve_streams(wait_time = 1.0):
+    with lock:
+        return [outlet.info() for outlet in list(outlets.values())]
+
+def resolve_byprop(prop, value, minimum = 1, timeout = 32000000.0):
+    endTime = time.time() + timeout
+    while True:
+        found = [info for info in resolve_streams() if info.fields.get(prop) == value]
+        if len(found) >= minimum or time.time() >= endTime:
+            return found
+        time.sleep(0.05)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: lsloutlet
+   :synopsis: Lab Streaming Layer outlet for the samples of a device
+
+*Created on Mon Oct 19 2026*
+"""
+
+import numpy
+
+from clock import monotonic
+
+# LSL bindings, imported by the first outlet since pylsl loads liblsl
+lsl = None
+
+def bindings():
+    """
+    :returns: the `pylsl` module when it is installed, :mod:`lslocal` otherwise
+    """
+    global lsl
+    if lsl is None:
+        try:
+            import pylsl as lsl
+        except ImportError:
+            # Streams are then only visible within this process, which is enough to test consumers
+            import lslocal as lsl
+    return lsl
+
+class DeviceOutlet(object):
+    """
+    :param address: MAC address or serial port of the device
+    :type address: str
+    :param labels: labels of the columns of each sample, the sequence number and digital channels first
+    :type labels: list of str
+    :param SamplingRate: sampling frequency (Hz) of the stream
+    :type SamplingRate: int or float
+
+    Publishes the samples of a device as an LSL stream named ``BITalino <address>``, of type ``BITalino`` and with
+    source id ``serverbit-<address>`` (so that consumers find it again after a restart), with one int16 channel per
+    column. The extended description lists the label and kind (``sequence``, ``digital`` or ``analog``) of each
+    channel.
+
+    Blocks are pushed as they are decoded, as a single chunk with no encoding, and timestamped on the LSL clock from
+    the host time fitted by :class:`clock.SampleClock`. Uses `pylsl` when it is installed, and :mod:`lslocal`
+    otherwise.
+    """
+    def __init__(self, address, labels, SamplingRate):
+        lsl = bindings()
+        info = lsl.StreamInfo('BITalino ' + address, 'BITalino', len(labels), SamplingRate, 'int16', 'serverbit-' + address)
+        desc = info.desc()
+        desc.append_child_value('manufacturer', 'PLUX')
+        desc.append_child_value('device', address)
+        channels = desc.append_child('channels')
+        for i, label in enumerate(labels):
+            channel = channels.append_child('channel')
+            channel.append_child_value('label', label)
+            channel.append_child_value('type', 'sequence' if i == 0 else 'digital' if i < 5 else 'analog')
+            channel.append_child_value('unit', 'counts')
+        self.outlet = lsl.StreamOutlet(info)
+
+    def push(self, samples, timestamp):
+        """
+        :param samples: samples as rows, with the columns of the labels
+        :type samples: array or list of lists of int
+        :param timestamp: host monotonic time (seconds) of the last sample, as returned by
+                          :meth:`clock.SampleClock.timestamp`
+        :type timestamp: float
+        """
+        samples = numpy.ascontiguousarray(samples, dtype='int16')
+        if len(samples):
+            self.outlet.push_chunk(samples, timestamp + lsl.local_clock() - monotonic())
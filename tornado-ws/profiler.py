@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: profiler
+   :synopsis: Stage timing and sampling profiler for the acquisition and serialization loops
+
+*Created on Mon Oct 19 2026*
+"""
+
+import collections
+import functools
+import sys
+import threading
+import time
+import numpy
+
+from clock import monotonic
+
+class Profiler(object):
+    """
+    :param interval: time (seconds) between two samples of the thread stacks
+    :type interval: float
+    :param history: number of timings kept per stage
+    :type history: int
+
+    Collects timing distributions for named stages of the pipeline, and samples the stacks of every thread to
+    build flamegraph-compatible folded stacks.
+
+    Stages are timed by wrapping functions or methods with :meth:`wrap`, or by reporting durations measured
+    elsewhere with :meth:`record`. While disabled, the wrappers only check a flag and the sampling thread is idle,
+    so the profiler can be left installed on a live server and switched on and off with :meth:`toggle`.
+    """
+    def __init__(self, interval = 0.005, history = 100000):
+        self.interval = interval
+        self.history = history
+        self.enabled = False
+        # Reentrant, as SIGUSR2 dumps the timings from the main thread, which may be interrupted while it records one
+        self.lock = threading.RLock()
+        self.reset()
+        self.sampler = None
+
+    def reset(self):
+        """
+        Discards the timings and stacks collected so far.
+        """
+        with self.lock:
+            self.timings = collections.defaultdict(lambda: collections.deque(maxlen=self.history))
+            self.stacks = collections.Counter()
+
+    def start(self):
+        self.enabled = True
+        if self.sampler is None:
+            self.sampler = threading.Thread(target=self.sample, name='profiler')
+            self.sampler.daemon = True
+            self.sampler.start()
+
+    def stop(self):
+        self.enabled = False
+
+    def toggle(self):
+        """
+        :returns: `True` if profiling is now enabled
+        """
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+        return self.enabled
+
+    def record(self, stage, seconds):
+        """
+        :param stage: name of the stage
+        :type stage: str
+        :param seconds: duration of one execution of the stage
+        :type seconds: float
+        """
+        if self.enabled:
+            # Under the lock, as summary() reads the timings from another thread
+            with self.lock:
+                self.timings[stage].append(seconds)
+
+    def wrap(self, target, stage = None):
+        """
+        :param target: function or method to be timed
+        :type target: callable
+        :param stage: name of the stage, defaults to the name of `target`
+        :type stage: str or None
+        :returns: callable with the same behaviour as `target`, recording its duration while enabled
+        """
+        stage = stage or target.__name__
+
+        @functools.wraps(target)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return target(*args, **kwargs)
+            initTime = monotonic()
+            try:
+                return target(*args, **kwargs)
+            finally:
+                elapsed = monotonic() - initTime
+                with self.lock:
+                    self.timings[stage].append(elapsed)
+        return wrapper
+
+    def sample(self):
+        """
+        Body of the sampling thread; folds the stack of every other thread into :attr:`stacks` while enabled.
+        """
+        names = {}
+        while True:
+            time.sleep(self.interval)
+            if not self.enabled:
+                continue
+            me = threading.current_thread().ident
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s (%s:%d)' % (code.co_name, code.co_filename.split('/')[-1], code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                with self.lock:
+                    self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        """
+        :returns: `str` with one line per distinct stack and the number of times it was sampled, as expected by
+                  ``flamegraph.pl`` and speedscope
+        """
+        with self.lock:
+            return '\n'.join('%s %d' % item for item in sorted(self.stacks.items())) + '\n'
+
+    def summary(self):
+        """
+        :returns: `str` with a table of the timing distribution of each stage, in milliseconds
+        """
+        lines = ['%-16s %8s %10s %10s %10s %10s %10s %10s' % ('stage', 'count', 'total', 'mean', 'p50', 'p90', 'p99', 'max')]
+        with self.lock:
+            stages = [(stage, numpy.array(timings)*1e3) for stage, timings in sorted(self.timings.items()) if timings]
+        for stage, ms in stages:
+            p50, p90, p99 = numpy.percentile(ms, [50, 90, 99])
+            lines.append('%-16s %8d %10.1f %10.3f %10.3f %10.3f %10.3f %10.3f' % (stage, len(ms), ms.sum(), ms.mean(), p50, p90, p99, ms.max()))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, prefix):
+        """
+        :param prefix: path prefix of the files to write
+        :type prefix: str
+        :returns: list of the files written
+
+        Writes the stage summary to ``<prefix>.txt`` and the folded stacks to ``<prefix>.folded``.
+        """
+        files = [prefix + '.txt', prefix + '.folded']
+        for path, content in zip(files, [self.summary(), self.folded()]):
+            with open(path, 'w') as outfile:
+                outfile.write(content)
+        return files
+
+profiler = Profiler()
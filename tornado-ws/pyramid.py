@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: pyramid
+   :synopsis: Multi-resolution summaries of a recorded session
+
+*Created on Mon Oct 19 2026*
+
+Next to the samples of a session (see :mod:`recording`), each level of the pyramid summarizes every *L* samples
+(10, 100 and 1000 by default) in ``level<L>.bin``, as one record per bucket of sample indices ``[b*L, (b+1)*L)``,
+from the bucket of the first sample recorded on, with no bucket left out:
+
+======  =============================  ===========================================================
+Field   Type                           Content
+======  =============================  ===========================================================
+min     uint16, one per column         Smallest value of each column in the bucket
+max     uint16, one per column         Largest value of each column in the bucket
+mean    float32, one per column        Mean of each column in the bucket
+count   uint16                         Number of samples recorded in the bucket, 0 for none
+======  =============================  ===========================================================
+
+so that the record of any bucket is found from its number alone. Each level is built from the one below it as the
+session is recorded, and a query over a long range reads a number of records proportional to the number of points
+wanted rather than to the number of samples.
+"""
+
+import numpy
+
+LEVELS = (10, 100, 1000)
+
+def recordType(nColumns):
+    return numpy.dtype([('min', '<u2', (nColumns,)), ('max', '<u2', (nColumns,)), ('mean', '<f4', (nColumns,)), ('count', '<u2')])
+
+def reduce(units, lo, hi, total, count, factor):
+    """
+    :param units: number of the unit (sample or bucket of the level below) of each row, in increasing order
+    :type units: array of int
+    :param lo: minimum of each row, one column per channel
+    :param hi: maximum of each row
+    :param total: sum of each row
+    :param count: number of samples of each row
+    :param factor: number of units of each bucket
+    :type factor: int
+    :returns: tuple with the number of each bucket with samples, and its minimum, maximum, sum and number of samples
+    """
+    buckets = units//factor
+    starts = numpy.concatenate([[0], numpy.flatnonzero(numpy.diff(buckets)) + 1])
+    return (buckets[starts], numpy.minimum.reduceat(lo, starts), numpy.maximum.reduceat(hi, starts),
+            numpy.add.reduceat(total, starts), numpy.add.reduceat(count, starts))
+
+class Level(object):
+    """
+    :param factor: number of units of the level below (samples for the first level) of each bucket
+    :type factor: int
+    :param nColumns: number of columns of each sample
+    :type nColumns: int
+    :param f: file to which the records are appended
+    :type f: file
+
+    Incremental builder of a level. The rows of the last bucket are held back until a later bucket is started, since
+    more samples may still fall into it.
+    """
+    def __init__(self, factor, nColumns, f):
+        self.factor = factor
+        self.record = recordType(nColumns)
+        self.file = f
+        # Number of the next bucket to be written, and the rows held back
+        self.next = None
+        self.held = None
+
+    def add(self, units, lo, hi, total, count):
+        """
+        Adds rows of the level below, and returns the buckets completed, in the same form as :func:`reduce`, as rows
+        for the level above.
+        """
+        rows = (units, lo, hi, total, count)
+        if self.held is not None:
+            rows = tuple(numpy.concatenate([h, r]) for h, r in zip(self.held, rows))
+        buckets = rows[0]//self.factor
+        split = numpy.searchsorted(buckets, buckets[-1])
+        self.held = tuple(r[split:] for r in rows)
+        return self.write(*[r[:split] for r in rows])
+
+    def flush(self):
+        """
+        Writes the bucket held back, e.g. when the recording ends, and returns it as :meth:`add` does.
+        """
+        rows, self.held = self.held, None
+        return self.write(*rows) if rows is not None else None
+
+    def write(self, units, lo, hi, total, count):
+        if not len(units):
+            return units, lo, hi, total, count
+        buckets, lo, hi, total, count = reduce(units, lo, hi, total, count, self.factor)
+        if self.next is None:
+            self.next = int(buckets[0])
+        records = numpy.zeros(int(buckets[-1]) + 1 - self.next, dtype=self.record)
+        rows = buckets - self.next
+        records['min'][rows] = lo
+        records['max'][rows] = hi
+        records['mean'][rows] = total/count[:, None]
+        records['count'][rows] = count
+        self.file.write(records.tobytes())
+        self.file.flush()
+        self.next = int(buckets[-1]) + 1
+        return buckets, lo, hi, total, count
+
+class Pyramid(object):
+    """
+    :param path: directory of the session
+    :type path: str
+    :param nColumns: number of columns of each sample
+    :type nColumns: int
+    :param levels: number of samples of each bucket of each level, each a multiple of the one before
+    :type levels: tuple of int
+
+    Writer of all the levels of a session, fed with the runs of consecutive samples as they are recorded.
+    """
+    def __init__(self, path, nColumns, levels = LEVELS):
+        self.levels = []
+        below = 1
+        for size in levels:
+            self.levels.append(Level(size//below, nColumns, open('%s/level%d.bin' % (path, size), 'ab')))
+            below = size
+
+    def add(self, first, samples):
+        """
+        :param first: running index of the first sample
+        :type first: int
+        :param samples: consecutive samples as rows
+        :type samples: array of uint16
+        """
+        if not len(samples):
+            return
+        rows = (numpy.arange(first, first + len(samples)), samples, samples, samples.astype('float64'),
+                numpy.ones(len(samples), dtype='int64'))
+        for level in self.levels:
+            rows = level.add(*rows)
+            if not len(rows[0]):
+                break
+
+    def close(self):
+        """
+        Writes the buckets held back by every level, as the recording ends.
+        """
+        rows = None
+        for level in self.levels:
+            if rows is not None and len(rows[0]):
+                level.add(*rows)
+            rows = level.flush()
+            level.file.close()
+
+def read(path, size, nColumns, first, start, end):
+    """
+    :param path: directory of the session
+    :type path: str
+    :param size: number of samples of each bucket of the level
+    :type size: int
+    :param nColumns: number of columns of each sample
+    :type nColumns: int
+    :param first: running index of the first sample recorded
+    :type first: int
+    :param start: number of the first bucket wanted
+    :type start: int
+    :param end: number past the last bucket wanted
+    :type end: int
+    :returns: tuple with the number of each bucket read and its record, those not written yet left out
+    """
+    record = recordType(nColumns)
+    origin = first//size
+    start = max(start, origin)
+    with open('%s/level%d.bin' % (path, size), 'rb') as f:
+        f.seek((start - origin)*record.itemsize)
+        data = f.read(max(end - start, 0)*record.itemsize)
+    records = numpy.frombuffer(data[:len(data)//record.itemsize*record.itemsize], dtype=record)
+    return numpy.arange(start, start + len(records)), records
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: rawstream
+   :synopsis: Raw TCP and UDP outputs of the stream, for consumers that do not speak WebSocket
+
+*Created on Mon Oct 19 2026*
+
+Both outputs carry the very same payload as the WebSocket messages (the JSON-formatted block), encoded once for all
+of them, with the least framing that each transport allows:
+
+* TCP: each message is a 4-byte big-endian length followed by the payload
+* UDP: each block is one datagram, made of an 8-byte big-endian sequence number followed by the payload; a consumer
+  subscribes by sending any datagram to the port, and must do so again within *expiry* seconds to keep receiving
+"""
+
+import errno
+import functools
+import socket
+import struct
+
+from tornado import ioloop, iostream
+from tornado.tcpserver import TCPServer
+
+from clock import monotonic
+
+class StreamServer(TCPServer):
+    """
+    :param limit: bytes written to a client and not yet sent, beyond which messages are dropped for that client
+    :type limit: int
+    :param nodelay: whether Nagle's algorithm is disabled on the connections
+    :type nodelay: bool
+
+    Length-prefixed TCP output. Clients are not expected to send anything.
+    """
+    transport = 'tcp'
+
+    def __init__(self, limit = 1 << 20, nodelay = False):
+        TCPServer.__init__(self)
+        self.limit = limit
+        self.nodelay = nodelay
+        # Bytes in flight for each connection
+        self.streams = {}
+        self.sent = 0
+        self.dropped = 0
+
+    def handle_stream(self, stream, address):
+        if self.nodelay:
+            stream.set_nodelay(True)
+        self.streams[stream] = 0
+        stream.set_close_callback(functools.partial(self.streams.pop, stream, None))
+        print('TCP CONNECTED')
+
+    def publish(self, payload):
+        """
+        :param payload: message to be sent to every client
+        :type payload: bytes
+        """
+        self.broadcast(struct.pack('>I', len(payload)) + payload)
+
+    def broadcast(self, frame):
+        """
+        :param frame: bytes to be written as they are to every client, unless it has fallen behind by *limit*
+        :type frame: bytes
+        """
+        for stream in list(self.streams):
+            if self.streams[stream] + len(frame) > self.limit:
+                self.dropped += 1
+                continue
+            try:
+                future = stream.write(frame)
+            except iostream.StreamClosedError:
+                self.streams.pop(stream, None)
+                self.dropped += 1
+                continue
+            self.streams[stream] += len(frame)
+            future.add_done_callback(functools.partial(self.flushed, stream, len(frame)))
+
+    def flushed(self, stream, size, future):
+        if stream in self.streams:
+            self.streams[stream] -= size
+        if future.exception() is None:
+            self.sent += 1
+        else:
+            self.dropped += 1
+
+class DatagramPublisher(object):
+    """
+    :param port: UDP port to which consumers send their subscriptions
+    :type port: int
+    :param expiry: time (seconds) from the last datagram of a consumer after which it no longer receives the stream
+    :type expiry: int or float
+    :param address: address to bind to, all by default
+    :type address: str
+
+    UDP output, one datagram per block. The sequence number is incremented on every block, whether or not anyone is
+    subscribed, so that a consumer can tell lost and reordered datagrams apart. Blocks larger than a datagram can
+    carry are dropped, so the block size should be kept under about 64 KB (e.g. with a low `"latency"`).
+    """
+    transport = 'udp'
+
+    def __init__(self, port, expiry = 30., address = ''):
+        self.expiry = expiry
+        self.subscribers = {}
+        self.sequence = 0
+        self.sent = 0
+        self.dropped = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(0)
+        self.socket.bind((address, port))
+        ioloop.IOLoop.current().add_handler(self.socket.fileno(), self.subscribe, ioloop.IOLoop.READ)
+
+    def subscribe(self, fd, events):
+        while True:
+            try:
+                data, address = self.socket.recvfrom(64)
+            except socket.error as e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+            if address not in self.subscribers:
+                print('UDP SUBSCRIBED %s:%d' % address)
+            self.subscribers[address] = monotonic() + self.expiry
+
+    def publish(self, payload):
+        """
+        :param payload: block to be sent to every subscriber
+        :type payload: bytes
+        """
+        datagram = struct.pack('>Q', self.sequence) + payload
+        self.sequence += 1
+        now = monotonic()
+        for address, expiry in list(self.subscribers.items()):
+            if expiry < now:
+                del self.subscribers[address]
+                continue
+            try:
+                self.socket.sendto(datagram, address)
+                self.sent += 1
+            except socket.error:
+                # Full send buffer or datagram too long
+                self.dropped += 1
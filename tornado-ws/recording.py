@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: recording
+   :synopsis: Sessions recorded to disk, and range queries over them
+
+*Created on Mon Oct 19 2026*
+
+Each acquisition is recorded to a directory of its own, named after the device and the time it started, with:
+
+* ``meta.json``: labels of the columns, sampling rate, device, start time, chunk size and running index of the first
+  sample, which times in the session are counted from
+* ``samples.bin``: the columns of every sample (uint16, little-endian), one row after the other
+* ``chunks.bin``: the chunk index, one 20-byte record per chunk of ``samples.bin``: the running index of its first
+  sample (int64), the row at which it starts (uint64) and its number of samples (uint32)
+* ``level10.bin``, ``level100.bin`` and ``level1000.bin``: the minimum, maximum and mean of every 10, 100 and 1000
+  samples (see :mod:`pyramid`)
+* ``events.jsonl``: the events posted during the session, one per line (see :mod:`events`)
+
+A chunk holds consecutive samples only, so that the position of any sample follows from the index: it ends when it
+is full, when samples are missing (e.g. while reconnecting to the device) or when its first sample has waited in
+memory for about a second, so that readers see a slow stream without waiting for a full chunk. A chunk is written to the index once
+its samples are on disk, so that readers only ever see complete chunks, which never change afterwards.
+"""
+
+import collections
+import json
+import math
+import os
+import re
+import time
+import numpy
+import pyramid
+
+from clock import monotonic
+from events import EventLog
+
+# Largest number of points of a query, and longest time (seconds) around an event, answered at once
+MAX_POINTS = 10000
+MAX_WINDOW = 300.
+
+CHUNK = numpy.dtype([('first', '<i8'), ('offset', '<u8'), ('count', '<u4')])
+
+def sessionName(address, startTime = None):
+    """
+    :returns: name of the directory of a session of the device at `address` started at `startTime`
+    """
+    return re.sub('[^0-9A-Za-z]', '', address) + time.strftime('-%Y%m%d-%H%M%S', time.localtime(startTime))
+
+class Recorder(object):
+    """
+    :param path: directory of the session, created if needed
+    :type path: str
+    :param labels: labels of the columns of each sample
+    :type labels: list of str
+    :param SamplingRate: sampling frequency (Hz) of the stream
+    :type SamplingRate: int or float
+    :param device: MAC address or serial port of the device
+    :type device: str
+    :param chunkSamples: number of samples of a full chunk
+    :type chunkSamples: int
+    :param flushInterval: time (seconds) after which the samples gathered are written even if the chunk is not full
+    :type flushInterval: int or float
+
+    Writer side of a session, owned by the acquisition thread. Samples are gathered in memory until a chunk is
+    complete or `flushInterval` has passed, so that each write to disk is a whole chunk.
+    """
+    def __init__(self, path, labels, SamplingRate, device = '', chunkSamples = 4096, flushInterval = 1.):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.chunkSamples = int(chunkSamples)
+        self.buffer = numpy.zeros((self.chunkSamples, len(labels)), dtype='<u2')
+        self.filled = 0
+        self.flushInterval = flushInterval
+        # Host time at which the first sample in the buffer was written
+        self.started = None
+        # Running index of the first sample in the buffer, and of the one expected next
+        self.first = self.next = None
+        self.rows = 0
+        self.meta = {'labels': labels, 'sampling_rate': SamplingRate, 'device': device, 'start_time': time.time(),
+                     'chunk_samples': self.chunkSamples, 'levels': list(pyramid.LEVELS)}
+        with open(os.path.join(path, 'meta.json'), 'w') as outfile:
+            json.dump(self.meta, outfile)
+        self.samples = open(os.path.join(path, 'samples.bin'), 'ab')
+        self.chunks = open(os.path.join(path, 'chunks.bin'), 'ab')
+        self.pyramid = pyramid.Pyramid(path, len(labels))
+        self.events = EventLog(path)
+
+    def write(self, indices, samples):
+        """
+        :param indices: running index of each sample
+        :type indices: array of int
+        :param samples: samples as rows, with the columns of the labels
+        :type samples: array or list of lists of int
+        """
+        indices = numpy.asarray(indices, dtype='int64')
+        samples = numpy.asarray(samples)
+        # Runs of consecutive samples
+        starts = numpy.concatenate([[0], numpy.flatnonzero(numpy.diff(indices) != 1) + 1, [len(indices)]])
+        for start, end in zip(starts[:-1], starts[1:]):
+            if self.filled and indices[start] != self.next:
+                self.commit()
+            while start < end:
+                if not self.filled:
+                    self.first = int(indices[start])
+                    self.started = monotonic()
+                    if 'first_index' not in self.meta:
+                        # A session started after a reconfiguration carries on the running index of the previous one
+                        self.meta['first_index'] = self.first
+                        self.save()
+                n = min(end - start, self.chunkSamples - self.filled)
+                self.buffer[self.filled:self.filled+n] = samples[start:start+n]
+                self.filled += n
+                start += n
+                self.next = self.first + self.filled
+                if self.filled == self.chunkSamples:
+                    self.commit()
+        if self.filled and monotonic() - self.started >= self.flushInterval:
+            self.commit()
+
+    def commit(self):
+        """
+        Writes the samples gathered as a chunk, and then the chunk to the index and to the pyramid.
+        """
+        if not self.filled:
+            return
+        self.samples.write(self.buffer[:self.filled].tobytes())
+        self.samples.flush()
+        record = numpy.array([(self.first, self.rows, self.filled)], dtype=CHUNK)
+        self.chunks.write(record.tobytes())
+        self.chunks.flush()
+        self.pyramid.add(self.first, self.buffer[:self.filled])
+        self.rows += self.filled
+        self.filled = 0
+
+    def relabel(self, labels):
+        """
+        :param labels: new labels of the same columns, which then apply to the whole session
+        :type labels: list of str
+        """
+        self.meta['labels'] = labels
+        self.save()
+
+    def save(self):
+        with open(os.path.join(self.path, 'meta.json.tmp'), 'w') as outfile:
+            json.dump(self.meta, outfile)
+        # Replaced at once, so that readers never see it half written
+        os.replace(os.path.join(self.path, 'meta.json.tmp'), os.path.join(self.path, 'meta.json'))
+
+    def event(self, event):
+        """
+        :param event: event stamped, written at once rather than with the chunk of its sample
+        :type event: dict
+        """
+        self.events.write(event)
+
+    def close(self):
+        self.commit()
+        self.events.close()
+        self.pyramid.close()
+        self.samples.close()
+        self.chunks.close()
+
+class Recording(object):
+    """
+    :param path: directory of the session
+    :type path: str
+
+    Reader side of a session, which may still be being recorded.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as data_file:
+            self.meta = json.load(data_file)
+        self.labels = self.meta['labels']
+        self.samplingRate = float(self.meta['sampling_rate'])
+        # Sessions recorded without a pyramid are always summarized from the samples
+        self.levels = self.meta.get('levels', [])
+        self.index = numpy.zeros(0, dtype=CHUNK)
+        self.events = EventLog(path)
+
+    def origin(self):
+        """
+        :returns: running index of the first sample of the session, from which times in the session are counted
+        """
+        index = self.chunks()
+        if 'first_index' not in self.meta and len(index):
+            # Written along with the first sample, which may have come after the session was opened here
+            with open(os.path.join(self.path, 'meta.json')) as data_file:
+                self.meta = json.load(data_file)
+        # Sessions recorded before it was stored start at their first chunk
+        return int(self.meta.get('first_index', index['first'][0] if len(index) else 0))
+
+    def chunks(self):
+        """
+        :returns: the chunk index, read again if chunks were added since
+        """
+        size = os.path.getsize(os.path.join(self.path, 'chunks.bin'))//CHUNK.itemsize
+        if size > len(self.index):
+            with open(os.path.join(self.path, 'chunks.bin'), 'rb') as f:
+                f.seek(len(self.index)*CHUNK.itemsize)
+                added = numpy.frombuffer(f.read((size - len(self.index))*CHUNK.itemsize), dtype=CHUNK)
+            self.index = numpy.concatenate([self.index, added])
+        return self.index
+
+    def chunk(self, i):
+        """
+        :returns: samples of chunk `i`, one row per sample
+        """
+        first, offset, count = self.index[i]
+        rowBytes = 2*len(self.labels)
+        with open(os.path.join(self.path, 'samples.bin'), 'rb') as f:
+            f.seek(int(offset)*rowBytes)
+            data = f.read(int(count)*rowBytes)
+        return numpy.frombuffer(data, dtype='<u2').reshape(int(count), len(self.labels))
+
+    def read(self, column, start, end, cache = None):
+        """
+        :param column: position of the column in the labels
+        :type column: int
+        :param start: index of the first sample wanted
+        :type start: int
+        :param end: index past the last sample wanted
+        :type end: int
+        :param cache: cache of the chunks read
+        :type cache: BlockCache or None
+        :returns: tuple with the running index and the values of the samples recorded between `start` and `end`
+
+        Only the chunks overlapping the range are read.
+        """
+        index = self.chunks()
+        first = index['first']
+        last = first + index['count']
+        indices, values = [], []
+        for i in numpy.flatnonzero((first < end) & (last > start)):
+            key = (self.path, int(i))
+            samples = cache.get(key, lambda: self.chunk(i)) if cache is not None else self.chunk(i)
+            lo, hi = max(start - int(first[i]), 0), min(end, int(last[i])) - int(first[i])
+            indices.append(numpy.arange(int(first[i]) + lo, int(first[i]) + hi))
+            values.append(samples[lo:hi, column])
+        if not indices:
+            return numpy.zeros(0, dtype='int64'), numpy.zeros(0, dtype='uint16')
+        return numpy.concatenate(indices), numpy.concatenate(values)
+
+    def end(self):
+        """
+        :returns: index past the last sample recorded
+        """
+        index = self.chunks()
+        return int((index['first'] + index['count']).max()) if len(index) else self.origin()
+
+    def around(self, label, event, before = 1., after = 1., cache = None):
+        """
+        :param label: label of the column
+        :type label: str
+        :param event: id of the event
+        :type event: int
+        :param before: time (seconds) before the sample of the event from which samples are wanted
+        :type before: int or float
+        :param after: time (seconds) after the sample of the event until which samples are wanted
+        :type after: int or float
+        :param cache: cache of the chunks read
+        :type cache: BlockCache or None
+        :returns: dictionary with the ``"event"``, the ``"sampleIndex"`` of the first sample of the range and the
+                  ``"values"`` of every sample in it, `None` where none was recorded, or `None` for an unknown event
+        :raises ValueError: `before` or `after` is negative, or together longer than :data:`MAX_WINDOW`
+        """
+        if not (0 <= before and 0 <= after and before + after <= MAX_WINDOW):
+            raise ValueError('"before" and "after" must be positive and add up to at most %g seconds' % MAX_WINDOW)
+        events = [e for e in self.events.read() if e.get('id') == event]
+        if not events:
+            return None
+        first = events[0]['sampleIndex'] - int(round(before*self.samplingRate))
+        last = events[0]['sampleIndex'] + int(round(after*self.samplingRate)) + 1
+        indices, values = self.read(self.labels.index(label), first, last, cache)
+        dense = [None]*(last - first)
+        for i, value in zip((indices - first).tolist(), values.tolist()):
+            dense[i] = value
+        return {'event': events[0], 'sampleIndex': first, 'values': dense}
+
+    def summaries(self, size, start, end, cache = None, block = 4096):
+        """
+        :param size: number of samples of each bucket of the level of the pyramid
+        :type size: int
+        :param start: number of the first bucket wanted
+        :type start: int
+        :param end: number past the last bucket wanted
+        :type end: int
+        :param cache: cache of the blocks of records read
+        :type cache: BlockCache or None
+        :param block: number of records read at once, and cached once all written
+        :type block: int
+        :returns: tuple with the number of each bucket with samples, and its record
+        """
+        index = self.chunks()
+        if not len(index) or end <= start:
+            return numpy.zeros(0, dtype='int64'), numpy.zeros(0, dtype=pyramid.recordType(len(self.labels)))
+        first = self.origin()
+        origin = first//size
+        written = os.path.getsize(os.path.join(self.path, 'level%d.bin' % size))//pyramid.recordType(len(self.labels)).itemsize
+        buckets, records = [], []
+        for b in range(max(start - origin, 0)//block, (end - origin + block - 1)//block):
+            load = lambda b=b: pyramid.read(self.path, size, len(self.labels), first, origin + b*block, origin + (b+1)*block)[1]
+            if cache is not None and (b+1)*block <= written:
+                data = cache.get((self.path, size, b), load)
+            else:
+                data = load()
+            numbers = numpy.arange(origin + b*block, origin + b*block + len(data))
+            keep = (numbers >= start) & (numbers < end) & (data['count'] > 0)
+            buckets.append(numbers[keep])
+            records.append(data[keep])
+        if not buckets:
+            return numpy.zeros(0, dtype='int64'), numpy.zeros(0, dtype=pyramid.recordType(len(self.labels)))
+        return numpy.concatenate(buckets), numpy.concatenate(records)
+
+    def query(self, label, start = 0., end = None, points = 2000, cache = None):
+        """
+        :param label: label of the column
+        :type label: str
+        :param start: time (seconds) from the start of the session of the first sample wanted
+        :type start: int or float
+        :param end: time (seconds) from the start of the session past the last sample wanted, by default the end of
+                    the recording
+        :type end: int, float or None
+        :param points: maximum number of points, 1 to :data:`MAX_POINTS`
+        :type points: int
+        :param cache: cache of the chunks read
+        :type cache: BlockCache or None
+        :returns: dictionary with the ``"sampleIndex"`` of the first sample of the range, the number of samples
+                  summarized by each point (``"step"``), the ``"level"`` of the pyramid they were summarized from (1
+                  for the samples themselves), and the ``"min"``, ``"max"`` and ``"mean"`` of the samples of each point
+
+        The range is summarized from the coarsest level of the pyramid whose buckets are no larger than a point, so
+        that no more than about 10 records are read per point however long the range is; a bucket straddling two
+        points is counted in the first.
+
+        :raises ValueError: `points` is out of range, or `start` or `end` is not a finite time
+        """
+        if not 1 <= points <= MAX_POINTS:
+            raise ValueError('"points" must be between 1 and %d' % MAX_POINTS)
+        if not math.isfinite(start) or (end is not None and not math.isfinite(end)):
+            raise ValueError('"start" and "end" must be finite')
+        origin = self.origin()
+        first = origin + int(math.floor(start*self.samplingRate))
+        last = self.end() if end is None else origin + int(math.ceil(end*self.samplingRate))
+        step = max(int(math.ceil(float(last - first)/points)), 1)
+        nPoints = int(math.ceil(float(last - first)/step)) if last > first else 0
+        column = self.labels.index(label)
+        size = max([level for level in self.levels if level <= step] or [1])
+        if size == 1:
+            indices, values = self.read(column, first, last, cache)
+            positions = (indices - first)//step
+            lo, hi, count = values, values, numpy.ones(len(values), dtype='int64')
+            total = values.astype('float64')
+        else:
+            buckets, records = self.summaries(size, first//size, -(-last//size), cache)
+            positions = numpy.clip((buckets*size - first)//step, 0, max(nPoints - 1, 0))
+            lo, hi = records['min'][:, column], records['max'][:, column]
+            count = records['count'].astype('int64')
+            total = records['mean'][:, column]*count
+        lo, hi, mean = decimate(positions, lo, hi, total, count, nPoints)
+        return {'sampleIndex': first, 'step': step, 'level': size, 'min': lo, 'max': hi, 'mean': mean}
+
+class BlockCache(object):
+    """
+    :param capacity: bytes of the chunks kept in memory
+    :type capacity: int
+
+    Least recently used chunks read from the recordings, so that going back and forth over the same part of a
+    session is served from memory.
+    """
+    def __init__(self, capacity = 64 << 20):
+        self.capacity = capacity
+        self.blocks = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load):
+        """
+        :param key: key of the chunk
+        :param load: called to read the chunk when it is not cached
+        :type load: callable
+        :returns: the chunk
+        """
+        if key in self.blocks:
+            self.hits += 1
+            self.blocks.move_to_end(key)
+            return self.blocks[key]
+        self.misses += 1
+        block = load()
+        self.blocks[key] = block
+        self.size += block.nbytes
+        while self.size > self.capacity and len(self.blocks) > 1:
+            evicted, old = self.blocks.popitem(last=False)
+            self.size -= old.nbytes
+        return block
+
+def decimate(positions, lo, hi, total, count, nPoints):
+    """
+    :param positions: point of each row, in increasing order
+    :type positions: array of int
+    :param lo: minimum of each row
+    :param hi: maximum of each row
+    :param total: sum of each row
+    :param count: number of samples of each row
+    :param nPoints: number of points
+    :type nPoints: int
+    :returns: tuple with lists of the minimum, maximum and mean of the samples of each point, `None` where none was
+              recorded
+    """
+    lo_, hi_, mean_ = [None]*nPoints, [None]*nPoints, [None]*nPoints
+    if len(positions):
+        points, lo, hi, total, count = pyramid.reduce(positions, lo, hi, total, count, 1)
+        for p, mn, mx, m in zip(points.tolist(), lo.tolist(), hi.tolist(), (total/count).tolist()):
+            lo_[p], hi_[p], mean_[p] = mn, mx, m
+    return lo_, hi_, mean_
+
+def sessions(directory):
+    """
+    :returns: list of the names of the sessions recorded in `directory`, oldest first
+    """
+    if not os.path.isdir(directory):
+        return []
+    started = {}
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name, 'meta.json')
+        if os.path.isfile(path):
+            # Not the time meta.json was written, as it is written again when the session is relabeled
+            try:
+                with open(path) as data_file:
+                    started[name] = float(json.load(data_file)['start_time'])
+            except (IOError, OSError, ValueError, KeyError):
+                started[name] = os.path.getmtime(path)
+    return sorted(started, key=lambda name: (started[name], name))
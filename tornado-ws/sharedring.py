@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: sharedring
+   :synopsis: Shared memory ring buffer of decoded samples for local consumers
+
+*Created on Mon Oct 19 2026*
+
+The ring is a block of shared memory laid out as a header followed by two arrays of *capacity* rows: the running
+index of each sample (int64), and its columns as acquired (uint16, nSeq, digital and analog channels). The header
+holds, at fixed little-endian offsets:
+
+======  ========  =============================================================
+Offset  Type      Field
+======  ========  =============================================================
+0       4 bytes   Magic ``BITR``
+4       uint32    Layout version
+8       uint64    Sequence counter, odd while a block is being written
+16      uint64    Write cursor: number of samples written since the ring was created
+24      uint64    Capacity (samples)
+32      uint32    Number of columns
+36      uint32    Length of the labels
+40      float64   Sampling rate (Hz)
+48      bytes     Labels of the columns, JSON-encoded
+======  ========  =============================================================
+
+A local process reads it with :class:`SharedRingReader`, e.g.::
+
+    reader = SharedRingReader('serverbit-synthetic')
+    since = None
+    while True:
+        since, index, values = reader.read(since)
+"""
+
+import json
+import struct
+import time
+from multiprocessing import shared_memory
+import numpy
+
+MAGIC = b'BITR'
+LAYOUT = 1
+HEADER = 4096
+
+class SharedRing(object):
+    """
+    :param name: name of the shared memory block, by which readers attach to it
+    :type name: str
+    :param labels: labels of the columns of each sample
+    :type labels: list of str
+    :param SamplingRate: sampling frequency (Hz) of the stream
+    :type SamplingRate: int or float
+    :param capacity: number of samples kept
+    :type capacity: int
+
+    Writer side of the ring, owned by the acquisition thread. Each block is published under a sequence lock: the
+    sequence counter is made odd, the samples are written and the cursor advanced, and the counter is made even
+    again, so that readers can tell whether what they read was changed meanwhile.
+    """
+    def __init__(self, name, labels, SamplingRate, capacity):
+        self.name = name
+        self.capacity = int(capacity)
+        self.nColumns = len(labels)
+        size = HEADER + self.capacity*(8 + 2*self.nColumns)
+        try:
+            self.block = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left over by a previous run that did not exit cleanly
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.block = shared_memory.SharedMemory(name, create=True, size=size)
+        self.header, self.index, self.values = views(self.block.buf, self.capacity, self.nColumns)
+        text = json.dumps(labels).encode('utf-8')
+        if 48 + len(text) > HEADER:
+            raise ValueError('labels too long for the ring header')
+        self.header[48:48+len(text)] = bytearray(text)
+        self.header[0:48] = bytearray(struct.pack('<4sIQQQIId', MAGIC, LAYOUT, 0, 0, self.capacity, self.nColumns, len(text), float(SamplingRate)))
+        self.seq = self.header[8:16].view('<u8')
+        self.count = self.header[16:24].view('<u8')
+
+    def write(self, indices, samples):
+        """
+        :param indices: running index of each sample
+        :type indices: array of int
+        :param samples: samples as rows, with the columns of the labels
+        :type samples: array or list of lists of int
+        """
+        samples = numpy.asarray(samples)
+        n = len(samples)
+        if n == 0:
+            return
+        # The samples of a block larger than the ring that would be overwritten at once are not written, but counted
+        skipped = max(n - self.capacity, 0)
+        if skipped:
+            indices, samples = indices[skipped:], samples[skipped:]
+            n = self.capacity
+        start = (int(self.count[0]) + skipped) % self.capacity
+        first = min(n, self.capacity - start)
+        self.seq[0] += 1
+        self.index[start:start+first] = indices[:first]
+        self.values[start:start+first] = samples[:first]
+        self.index[:n-first] = indices[first:]
+        self.values[:n-first] = samples[first:]
+        self.count[0] += skipped + n
+        self.seq[0] += 1
+
+    def close(self):
+        """
+        Releases and removes the shared memory block.
+        """
+        self.header = self.index = self.values = self.seq = self.count = None
+        self.block.close()
+        self.block.unlink()
+
+class SharedRingReader(object):
+    """
+    :param name: name of the shared memory block, as given to :class:`SharedRing`
+    :type name: str
+
+    Reader side of the ring, for any local process. The arrays are mapped, not copied; :meth:`begin`,
+    :meth:`view` and :meth:`retry` follow the sequence lock protocol for zero-copy access::
+
+        while True:
+            seq, start, end = reader.begin(since)
+            result = process(reader.view(start, end))
+            if not reader.retry(seq):
+                break
+
+    while :meth:`read` returns consistent copies.
+    """
+    def __init__(self, name):
+        try:
+            self.block = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching also registers the block, which would be removed when this process exits
+            self.block = shared_memory.SharedMemory(name)
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.block._name, 'shared_memory')
+        buf = self.block.buf
+        magic, layout, seq, count, capacity, nColumns, length, samplingRate = struct.unpack('<4sIQQQIId', bytes(buf[0:48]))
+        if magic != MAGIC or layout != LAYOUT:
+            raise ValueError('not a ServerBIT ring: ' + name)
+        self.capacity = capacity
+        self.nColumns = nColumns
+        self.samplingRate = samplingRate
+        self.labels = json.loads(bytes(buf[48:48+length]).decode('utf-8'))
+        self.header, self.index, self.values = views(buf, capacity, nColumns)
+        self.seq = self.header[8:16].view('<u8')
+        self.count = self.header[16:24].view('<u8')
+
+    def begin(self, since = None):
+        """
+        :param since: cursor up to which samples were already read, as returned by :meth:`read`; `None` for all
+                      the samples still in the ring
+        :type since: int or None
+        :returns: tuple with the sequence counter, and the cursors of the first and past the last sample available
+        """
+        while True:
+            seq = int(self.seq[0])
+            if seq % 2 == 0:
+                break
+            time.sleep(0)
+        end = int(self.count[0])
+        start = max(end - self.capacity, 0 if since is None else min(since, end))
+        return seq, start, end
+
+    def view(self, start, end):
+        """
+        :returns: list with one or two (tuples) of the index and the values of the samples between the cursors
+                  `start` and `end`, as views of the shared memory; two when the samples wrap around the ring
+        """
+        segments = []
+        while start < end:
+            offset = start % self.capacity
+            stop = min(offset + end - start, self.capacity)
+            segments.append((self.index[offset:stop], self.values[offset:stop]))
+            start += stop - offset
+        return segments
+
+    def retry(self, seq):
+        """
+        :param seq: sequence counter returned by :meth:`begin`
+        :type seq: int
+        :returns: `True` if a block was written since :meth:`begin`, so that what was read may be inconsistent
+        """
+        return int(self.seq[0]) != seq
+
+    def read(self, since = None):
+        """
+        :param since: cursor up to which samples were already read; `None` for all the samples still in the ring
+        :type since: int or None
+        :returns: tuple with the cursor to pass on the next call, and copies of the index (1-D) and of the values
+                  (2-D, one row per sample) of the samples written since `since`
+
+        Samples overwritten before they could be read are skipped, which shows as a jump in the index.
+        """
+        while True:
+            seq, start, end = self.begin(since)
+            segments = self.view(start, end)
+            index = numpy.concatenate([segment[0] for segment in segments]) if segments else numpy.zeros(0, 'int64')
+            values = numpy.concatenate([segment[1] for segment in segments]) if segments else numpy.zeros((0, self.nColumns), 'uint16')
+            if not self.retry(seq):
+                return end, index, values
+
+    def close(self):
+        self.header = self.index = self.values = self.seq = self.count = None
+        self.block.close()
+
+def views(buf, capacity, nColumns):
+    """
+    :returns: the header as bytes, the index and the values of the ring laid out in `buf`
+    """
+    header = numpy.ndarray((HEADER,), 'uint8', buffer=buf)
+    index = numpy.ndarray((capacity,), '<i8', buffer=buf, offset=HEADER)
+    values = numpy.ndarray((capacity, nColumns), '<u2', buffer=buf, offset=HEADER + 8*capacity)
+    return header, index, values
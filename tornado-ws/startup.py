@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: startup
+   :synopsis: Time from launching ServerBIT to it listening for clients
+
+*Created on Mon Oct 19 2026*
+
+Launches ``ServerBIT.py`` with a synthetic device, as it would be launched from a shortcut, and measures the time
+until it prints ``LISTENING``, which is dominated by the imports. Each run has a home folder of its own, with the
+``config.json`` of this folder. Usage::
+
+    python startup.py [runs] [port]
+
+The modules taking the longest to import are listed afterwards, as reported by ``python -X importtime``.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def launch(port, options = ()):
+    """
+    :returns: tuple with the server process, with its output piped, and the folder standing for its home, in which
+              its error output is written to ``stderr.txt``
+    """
+    home = tempfile.mkdtemp(prefix='serverbit-')
+    with open(os.path.join(HERE, 'config.json')) as data_file:
+        config = json.load(data_file)
+    config.update(device='synthetic', port=port, tcp_port=0, udp_port=0, shared_memory=False, lsl=False)
+    os.mkdir(os.path.join(home, 'ServerBIT'))
+    with open(os.path.join(home, 'ServerBIT', 'config.json'), 'w') as outfile:
+        json.dump(config, outfile)
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    with open(os.path.join(home, 'stderr.txt'), 'w') as stderr:
+        server = subprocess.Popen([sys.executable, '-u'] + list(options) + ['ServerBIT.py'], cwd=HERE, env=env,
+                                  stdout=subprocess.PIPE, stderr=stderr, universal_newlines=True)
+    return server, home
+
+def listen(server, home):
+    """
+    Waits for the server to print ``LISTENING``, then stops it.
+
+    :returns: error output of the server
+    """
+    try:
+        for line in server.stdout:
+            if line.startswith('LISTENING'):
+                break
+        else:
+            server.wait()
+            with open(os.path.join(home, 'stderr.txt')) as stderr:
+                raise RuntimeError('ServerBIT exited before listening:\n' + stderr.read())
+        with open(os.path.join(home, 'stderr.txt')) as stderr:
+            return stderr.read()
+    finally:
+        server.kill()
+        server.wait()
+        server.stdout.close()
+        shutil.rmtree(home, ignore_errors=True)
+
+def measure(port):
+    """
+    :returns: seconds from launching the server to it printing ``LISTENING``
+    """
+    startTime = time.time()
+    server, home = launch(port)
+    listen(server, home)
+    return time.time() - startTime
+
+def imports(port, count = 10):
+    """
+    :returns: list of tuples with the cumulative time (seconds) and name of the slowest modules imported at the top
+              level, by the interpreter itself or by ServerBIT
+    """
+    server, home = launch(port, ['-X', 'importtime'])
+    times = []
+    for line in listen(server, home).splitlines():
+        # import time: self [us] | cumulative | imported package, indented by two spaces per level of nesting
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+            name = fields[2][1:]
+            if not name.startswith(' '):
+                times.append((int(fields[1])*1e-6, name))
+    return sorted(times, reverse=True)[:count]
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 9102
+
+    times = numpy.array([measure(port) for run in range(runs)])*1e3
+    print('%d launches: min %7.1f ms   median %7.1f ms   max %7.1f ms' % (runs, times.min(), numpy.median(times), times.max()))
+
+    for seconds, name in imports(port):
+        print('%8.1f ms  %s' % (seconds*1e3, name))
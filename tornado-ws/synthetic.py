@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: synthetic
+   :synopsis: Synthetic BITalino frame source for testing and latency measurements
+
+*Created on Mon Oct 19 2026*
+"""
+
+import bisect
+import math
+import struct
+import time
+
+from acquisition.bitalino import BITalino
+from acquisition.decoder import frameSize, crc4
+from acquisition.errors import ExceptionCode
+from acquisition.transport import Transport
+from clock import monotonic
+
+def encodeFrame(nSeq, digital, analog):
+    """
+    :param nSeq: sequence number (0-15)
+    :type nSeq: int
+    :param digital: values of I1, I2, O1 and O2 (0 or 1)
+    :type digital: list of int
+    :param analog: values of the analog channels acquired, 10-bit for the first 4 and 6-bit for A5 and A6
+    :type analog: list of int
+    :returns: string packed binary data of the frame, as sent by BITalino and decoded by :meth:`BITalino.read`
+    """
+    nChannels = len(analog)
+    analog = list(analog) + [0]*(6-nChannels)
+    d = [0]*8
+    d[-1] = (nSeq & 0x0F) << 4
+    d[-2] = digital[0] << 7 | digital[1] << 6 | digital[2] << 5 | digital[3] << 4 | (analog[0] >> 6) & 0x0F
+    d[-3] = (analog[0] & 0x3F) << 2 | (analog[1] >> 8) & 0x03
+    d[-4] = analog[1] & 0xFF
+    d[-5] = (analog[2] >> 2) & 0xFF
+    d[-6] = (analog[2] & 0x03) << 6 | (analog[3] >> 4) & 0x3F
+    d[-7] = (analog[3] & 0x0F) << 4 | (analog[4] >> 2) & 0x0F
+    d[-8] = (analog[4] & 0x03) << 6 | analog[5] & 0x3F
+    d = d[8-frameSize(nChannels):]
+    d[-1] = d[-1] | crc4(d)
+    return struct.pack(len(d)*'B', *d)
+
+class SyntheticTransport(Transport):
+    """
+    :param realtime: whether frames are paced at the sampling rate, or made available immediately
+    :type realtime: bool
+    :param version: version string replied to the version command
+    :type version: str
+
+    Transport to a BITalino 2.0 emulated in software: the commands written are interpreted as the device would
+    (sampling rate, start, stop, version, state and triggers), and frames are generated with the exact layout and CRC of the
+    real ones during acquisition.
+
+    Each analog channel carries a sine wave of a different frequency, I1 toggles every second, and O1 and O2 follow
+    the triggers from the first sample due after each one is written. In real time
+    mode, sample *i* becomes available at ``startTime + i/SamplingRate``, which :meth:`generated` reports so that
+    the latency of any sample can be measured end to end.
+    """
+    def __init__(self, realtime = True, version = 'BITalino_v5.2', timeout = None):
+        Transport.__init__(self, timeout)
+        self.realtime = realtime
+        self.versionString = version
+        self.samplingRate = 1000.
+        self.analogChannels = []
+        self.acquiring = False
+        self.buffer = b''
+        self.commands = []
+        self.expectPwm = False
+        # Index of the first sample of each state of the digital outputs, and that state
+        self.switches = [0]
+        self.outputs = [(0, 0)]
+
+    def write(self, data):
+        for command in bytearray(data):
+            self.commands.append(command)
+            if self.acquiring:
+                # Anything but a trigger stops the acquisition
+                if command & 0x03 != 0x03 or command == 255:
+                    self.acquiring = False
+                    self.buffer = b''
+                else:
+                    self.switches.append(max(self.due(), self.switches[-1]))
+                    self.outputs.append((command >> 2 & 0x01, command >> 3 & 0x01))
+            elif self.expectPwm:
+                self.expectPwm = False
+            elif command == 7:
+                self.buffer += (self.versionString + '\n').encode('ascii')
+            elif command == 11:
+                self.buffer += self.state()
+            elif command == 163:
+                self.expectPwm = True
+            elif command & 0x3F == 0x03:
+                self.samplingRate = float([1, 10, 100, 1000][command >> 6])
+            elif command & 0x03 == 0x01:
+                self.analogChannels = [i for i in range(6) if command >> (2+i) & 0x01]
+                self.start()
+
+    def start(self):
+        self.acquiring = True
+        self.buffer = b''
+        self.emitted = 0
+        self.startTime = monotonic()
+        self.switches = [0]
+        self.outputs = [(0, 0)]
+
+    def state(self):
+        """
+        :returns: reply to the state command, with every analog channel at mid-scale
+        """
+        d = [0x00, 0x02]*6 + [0x00, 0x02, 0, 0]
+        d[-1] = crc4(d)
+        return struct.pack(len(d)*'B', *d)
+
+    def generated(self, index):
+        """
+        :param index: running index of a sample
+        :type index: int
+        :returns: host monotonic time at which the sample became available
+        """
+        return self.startTime + index/self.samplingRate
+
+    def frame(self, index):
+        t = index/self.samplingRate
+        nChannels = len(self.analogChannels)
+        analog = []
+        for i in range(nChannels):
+            bits = 6 if (nChannels > 4 and i > 3) else 10
+            amplitude = (1 << (bits-1)) - 1
+            analog.append(int(amplitude + amplitude*math.sin(2*math.pi*(i+1)*t)))
+        digital = [int(t) % 2, 0] + list(self.outputs[bisect.bisect_right(self.switches, index) - 1])
+        return encodeFrame(index % 16, digital, analog)
+
+    def due(self):
+        """
+        :returns: number of frames that should have been generated by now
+        """
+        if not self.realtime:
+            return self.emitted + 1
+        return int((monotonic() - self.startTime)*self.samplingRate) + 1
+
+    def generate(self, wait):
+        due = self.due()
+        if due <= self.emitted and wait:
+            time.sleep(max(self.generated(self.emitted) - monotonic(), 0))
+            due = max(self.due(), self.emitted + 1)
+        frames = [self.frame(i) for i in range(self.emitted, due)]
+        self.emitted = max(due, self.emitted)
+        self.buffer += b''.join(frames)
+
+    def receiveAvailable(self, limit = 1024):
+        if self.acquiring:
+            self.generate(len(self.buffer) == 0)
+        elif not self.buffer:
+            # Nothing is ever sent by an idle device unprompted
+            time.sleep(self.timeout or 0)
+            raise Exception(ExceptionCode.CONTACTING_DEVICE)
+        data, self.buffer = self.buffer[:limit], self.buffer[limit:]
+        return data
+
+class SyntheticBITalino(BITalino):
+    """
+    :param macAddress: name of the synthetic device
+    :type macAddress: str
+    :param timeout: maximum amount of time (seconds) elapsed while waiting for the device to respond
+    :type timeout: int, float or None
+    :param realtime: whether frames are paced at the sampling rate, or made available immediately
+    :type realtime: bool
+    :param version: version string of the device emulated, which then skips the version handshake as a device whose
+                    version is known does; `None` for a BITalino 2.0 identified by the handshake
+    :type version: str or None
+
+    Stand-in for a BITalino device, with a :class:`SyntheticTransport`, so that the whole acquisition pipeline can
+    be exercised and timed without hardware.
+    """
+    def __init__(self, macAddress = 'synthetic', timeout = None, realtime = True, version = None):
+        link = SyntheticTransport(realtime, version or 'BITalino_v5.2', timeout)
+        BITalino.__init__(self, macAddress, timeout, version, link=link)
+
+    @property
+    def commands(self):
+        return self.link.commands
+
+    def generated(self, index):
+        return self.link.generated(index)
@@ -21,14 +21,29 @@
 """
 
 import json
-import pylab
+import numpy
+import os
+import sys
+import time
 import traceback
 
-from bitalino import *
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from acquisition.bitalino import *
+from acquisition.metrics import registry, CONTENT_TYPE
 
 from sys import exit
 from txws import WebSocketFactory
 from twisted.internet import protocol, reactor
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+requests = registry.counter('serverbit_requests_total', 'Instructions evaluated on behalf of the clients', ['call'])
+requestErrors = registry.counter('serverbit_request_errors_total', 'Instructions that raised an exception', ['call'])
+evalTime = registry.histogram('serverbit_eval_seconds', 'Time spent evaluating each instruction', ['call'])
+serializeTime = registry.histogram('serverbit_serialize_seconds', 'Time spent encoding each response')
+bytesSent = registry.counter('serverbit_bytes_sent_total', 'Bytes of responses written to the clients')
+clients = registry.gauge('serverbit_clients', 'Clients currently connected')
 
 def tostring(data):
     """
@@ -40,118 +55,152 @@ def tostring(data):
     """
     dtype=type(data).__name__
     if dtype=='ndarray':
-        if pylab.shape(data)!=(): data=data.tolist() # data=list(data)
-        else: data='"'+data.tostring()+'"'
+        if numpy.shape(data)!=(): data=data.tolist() # data=list(data)
+        else: data='"'+str(data)+'"'
     elif dtype=='dict' or dtype=='tuple':
         try: data=json.dumps(data)
         except: pass
     elif dtype=='NoneType':
         data=''
-    elif dtype=='str' or dtype=='unicode':
+    elif dtype=='str':
         data=json.dumps(data)
     
     return str(data)
 
 class VS(protocol.Protocol):
-	def connectionMade(self):
-		"""
-		Callback executed when the client successfully connects to the server.
-		"""
-		print "CONNECTED"
-		
-		# Notify the client that a connection has been established
-		self.transport.write('server.connected()')
-
-	def dataReceived(self, req):
-		"""
-		:param req: Python instruction sent by the client
-		:type req: str
-		
-		Evaluates the instruction `req` sent by the client and responds with an identical instruction, in which the return value of that instruction is the input argument.
-		"""
-		try:
-			# Show the request on the terminal window
-			print '> ' + req
-			
-			# Evaluate the request and retrieve the result
-			res = eval(req)
-			
-			# If the request is to shutdown the server no further action is needed
-			if (req.find('shutdown')>=0):
-				return			
-			
-			# Place the result as an argument to the instruction received as the request
-			li=req.find('(')
-			li=li if li>=0 else None
-			
-			res=req[:li]+'('+tostring(res)+');'
-			
-			# Show the response on the terminal window
-			print '< ' + res    
-			
-		# Should an exceptio occur, the exception is propagated to the client
-		except Exception as e:
-			print traceback.format_exc()
-			res='sys.exception("'+str(e)+'")'
-			
-		# Send the response to the client
-		self.transport.write(res)
+    def connectionMade(self):
+        """
+        Callback executed when the client successfully connects to the server.
+        """
+        print("CONNECTED")
+        clients.inc()
         
-	def connectionLost(self, reason):
-		"""
-		Callback executed when the connection to the client is lost.
-		"""
-		server.shutdown()
-		return
+        # Notify the client that a connection has been established
+        self.transport.write(b'server.connected()')
+
+    def dataReceived(self, req):
+        """
+        :param req: Python instruction sent by the client
+        :type req: bytes
+        
+        Evaluates the instruction `req` sent by the client and responds with an identical instruction, in which the return value of that instruction is the input argument.
+        """
+        req=req.decode('utf-8')
+        li=req.find('(')
+        li=li if li>=0 else None
+        call=req[:li]
+        try:
+            # Show the request on the terminal window
+            print('> ' + req)
+            
+            # Evaluate the request and retrieve the result
+            requests.labels(call).inc()
+            initTime = time.time()
+            res = eval(req)
+            evalTime.labels(call).observe(time.time() - initTime)
+            
+            # If the request is to shutdown the server no further action is needed
+            if (req.find('shutdown')>=0):
+                return			
+            
+            # Place the result as an argument to the instruction received as the request
+            initTime = time.time()
+            res=call+'('+tostring(res)+');'
+            serializeTime.observe(time.time() - initTime)
+            
+            # Show the response on the terminal window
+            print('< ' + res)
+            
+        # Should an exceptio occur, the exception is propagated to the client
+        except Exception as e:
+            print(traceback.format_exc())
+            requestErrors.labels(call).inc()
+            res='sys.exception("'+str(e)+'")'
+            
+        # Send the response to the client
+        res=res.encode('utf-8')
+        bytesSent.inc(len(res))
+        self.transport.write(res)
+        
+    def connectionLost(self, reason):
+        """
+        Callback executed when the connection to the client is lost.
+        
+        The server keeps listening, so that the client can connect again; the device is released when it does.
+        """
+        clients.dec()
+        print("DISCONNECTED")
+        return
 
 
 class server(object):
     @staticmethod
     def BITalino(macAddress):
-		"""
-		:param macAddress: string with a BITalino MAC address or COM port
-		:type macAddress: str
-		:return: status of the connection
-		
-		Proxy function that the client can use to initialize the connection to a BITalino device.
-		"""
-		global device
-		try:
-			device=BITalino(macAddress)
-			res=True
-		except Exception as e:
-			print traceback.format_exc()
-			res='sys.exception("'+str(e)+'")'
-		
-		return res
+        """
+        :param macAddress: string with a BITalino MAC address or COM port
+        :type macAddress: str
+        :return: status of the connection
+        
+        Proxy function that the client can use to initialize the connection to a BITalino device, replacing any
+        previous one (e.g. left over by a client that lost its connection, or whose link to the device dropped).
+        """
+        global device
+        if device is not None:
+            try: device.close()
+            except: pass
+            device = None
+        try:
+            device=BITalino(macAddress)
+            res=True
+        except Exception as e:
+            print(traceback.format_exc())
+            res='sys.exception("'+str(e)+'")'
+        
+        return res
     
     @staticmethod
     def shutdown():
-		"""
-		Utility function that the client can use to shutdown the server.
-		"""
-		connector.stopListening()
-		try: reactor.stop()
-		except: pass
-		
-		print "DISCONNECTED"
+        """
+        Utility function that the client can use to shutdown the server.
+        """
+        connector.stopListening()
+        try: reactor.stop()
+        except: pass
+        
+        print("DISCONNECTED")
 
 
 class VSFactory(protocol.Factory):
-	def buildProtocol(self, addr):
-		return VS()
+    def buildProtocol(self, addr):
+        return VS()
+
+
+class MetricsResource(Resource):
+    isLeaf = True
+
+    def render_GET(self, request):
+        """
+        Renders the server metrics in the Prometheus text format.
+        """
+        request.setHeader('Content-Type', CONTENT_TYPE)
+        return registry.render().encode('utf-8')
 
 
 if __name__=='__main__':
-	try:
-		ip_addr, port = "127.0.0.1", 9001
-
-		device = None
-		
-		print "LISTENING AT %s:%s"%(ip_addr, port)
-		
-		connector = reactor.listenTCP(port, WebSocketFactory(VSFactory()))
-		reactor.run()
-
-	except Exception as e:
-		print traceback.format_exc()
+    try:
+        ip_addr, port, metrics_port = "127.0.0.1", 9001, 9002
+
+        device = None
+        
+        print("LISTENING AT %s:%s"%(ip_addr, port))
+        
+        connector = reactor.listenTCP(port, WebSocketFactory(VSFactory()))
+        
+        # Metrics are served over plain HTTP, as the WebSocket wrapper rejects any other request
+        root = Resource()
+        root.putChild(b'metrics', MetricsResource())
+        reactor.listenTCP(metrics_port, Site(root), interface=ip_addr)
+        reactor.run()
+
+    except Exception as e:
+        print(traceback.format_exc())
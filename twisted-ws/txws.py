@@ -130,8 +130,8 @@ def complete_hybi00(headers, challenge):
     key1 = headers["Sec-WebSocket-Key1"]
     key2 = headers["Sec-WebSocket-Key2"]
 
-    first = int("".join(i for i in key1 if i in digits)) / key1.count(" ")
-    second = int("".join(i for i in key2 if i in digits)) / key2.count(" ")
+    first = int("".join(i for i in key1 if i in digits)) // key1.count(" ")
+    second = int("".join(i for i in key2 if i in digits)) // key2.count(" ")
 
     nonce = pack(">II8s", first, second, challenge)
 
@@ -146,7 +146,7 @@ def make_accept(key):
 
     guid = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
 
-    return sha1("%s%s" % (key, guid)).digest().encode("base64").strip()
+    return b64encode(sha1(("%s%s" % (key, guid)).encode("ascii")).digest())
 
 # Frame helpers.
 # Separated out to make unit testing a lot easier.
@@ -160,7 +160,7 @@ def make_hybi00_frame(buf):
     and valid text without any 0xff bytes.
     """
 
-    return "\x00%s\xff" % buf
+    return b"\x00" + buf + b"\xff"
 
 def parse_hybi00_frames(buf):
     """
@@ -170,12 +170,12 @@ def parse_hybi00_frames(buf):
     and will actively ignore it.
     """
 
-    start = buf.find("\x00")
+    start = buf.find(b"\x00")
     tail = 0
     frames = []
 
     while start != -1:
-        end = buf.find("\xff", start + 1)
+        end = buf.find(b"\xff", start + 1)
         if end == -1:
             # Incomplete frame, try again later.
             break
@@ -184,7 +184,7 @@ def parse_hybi00_frames(buf):
             frame = buf[start + 1:end]
             frames.append((NORMAL, frame))
             tail = end + 1
-        start = buf.find("\x00", end + 1)
+        start = buf.find(b"\x00", end + 1)
 
     # Adjust the buffer and return.
     buf = buf[tail:]
@@ -198,11 +198,10 @@ def mask(buf, key):
     """
 
     # This is super-secure, I promise~
-    key = [ord(i) for i in key]
-    buf = list(buf)
-    for i, char in enumerate(buf):
-        buf[i] = chr(ord(char) ^ key[i % 4])
-    return "".join(buf)
+    buf = bytearray(buf)
+    for i in range(len(buf)):
+        buf[i] ^= key[i % 4]
+    return bytes(buf)
 
 def make_hybi07_frame(buf, opcode=0x1):
     """
@@ -213,16 +212,15 @@ def make_hybi07_frame(buf, opcode=0x1):
     """
 
     if len(buf) > 0xffff:
-        length = "\x7f%s" % pack(">Q", len(buf))
+        length = b"\x7f" + pack(">Q", len(buf))
     elif len(buf) > 0x7d:
-        length = "\x7e%s" % pack(">H", len(buf))
+        length = b"\x7e" + pack(">H", len(buf))
     else:
-        length = chr(len(buf))
+        length = pack(">B", len(buf))
 
     # Always make a normal packet.
-    header = chr(0x80 | opcode)
-    frame = "%s%s%s" % (header, length, buf)
-    return frame
+    header = pack(">B", 0x80 | opcode)
+    return header + length + buf
 
 def parse_hybi07_frames(buf):
     """
@@ -239,11 +237,11 @@ def parse_hybi07_frames(buf):
 
         # Grab the header. This single byte holds some flags nobody cares
         # about, and an opcode which nobody cares about.
-        header = ord(buf[start])
+        header = buf[start]
         if header & 0x70:
             # At least one of the reserved flags is set. Pork chop sandwiches!
             raise WSException("Reserved flag in HyBi-07 frame (%d)" % header)
-            frames.append(("", CLOSE))
+            frames.append((b"", CLOSE))
             return frames, buf
 
         # Get the opcode, and translate it to a local enum which we actually
@@ -256,7 +254,7 @@ def parse_hybi07_frames(buf):
 
         # Get the payload length and determine whether we need to look for an
         # extra length.
-        length = ord(buf[start + 1])
+        length = buf[start + 1]
         masked = length & 0x80
         length &= 0x7f
 
@@ -307,7 +305,7 @@ def parse_hybi07_frames(buf):
                 data = unpack(">H", data[:2])[0], data[2:]
             else:
                 # No reason given; use generic data.
-                data = 1000, "No reason given"
+                data = 1000, b"No reason given"
 
         frames.append((opcode, data))
         start += offset + length
@@ -320,7 +318,7 @@ class WebSocketProtocol(ProtocolWrapper):
     layer.
     """
 
-    buf = ""
+    buf = b""
     codec = None
     location = "/"
     host = "example.com"
@@ -348,11 +346,11 @@ class WebSocketProtocol(ProtocolWrapper):
         """
 
         self.transport.writeSequence([
-            "HTTP/1.1 101 FYI I am not a webserver\r\n",
-            "Server: TwistedWebSocketWrapper/1.0\r\n",
-            "Date: %s\r\n" % datetimeToString(),
-            "Upgrade: WebSocket\r\n",
-            "Connection: Upgrade\r\n",
+            b"HTTP/1.1 101 FYI I am not a webserver\r\n",
+            b"Server: TwistedWebSocketWrapper/1.0\r\n",
+            b"Date: " + datetimeToString() + b"\r\n",
+            b"Upgrade: WebSocket\r\n",
+            b"Connection: Upgrade\r\n",
         ])
 
     def sendHyBi00Preamble(self):
@@ -364,14 +362,14 @@ class WebSocketProtocol(ProtocolWrapper):
 
         self.sendCommonPreamble()
 
-        self.transport.writeSequence([
+        self.transport.writeSequence([line.encode("utf-8") for line in [
             "Sec-WebSocket-Origin: %s\r\n" % self.origin,
             "Sec-WebSocket-Location: %s://%s%s\r\n" % (protocol, self.host,
                                                        self.location),
             "WebSocket-Protocol: %s\r\n" % self.codec,
             "Sec-WebSocket-Protocol: %s\r\n" % self.codec,
             "\r\n",
-        ])
+        ]])
 
     def sendHyBi07Preamble(self):
         """
@@ -382,7 +380,7 @@ class WebSocketProtocol(ProtocolWrapper):
         challenge = self.headers["Sec-WebSocket-Key"]
         response = make_accept(challenge)
 
-        self.transport.write("Sec-WebSocket-Accept: %s\r\n\r\n" % response)
+        self.transport.write(b"Sec-WebSocket-Accept: " + response + b"\r\n\r\n")
 
     def parseFrames(self):
         """
@@ -398,7 +396,7 @@ class WebSocketProtocol(ProtocolWrapper):
 
         try:
             frames, self.buf = parser(self.buf)
-        except WSException, wse:
+        except WSException as wse:
             # Couldn't parse all the frames, something went wrong, let's bail.
             self.close(wse.args[0])
             return
@@ -435,6 +433,9 @@ class WebSocketProtocol(ProtocolWrapper):
             raise WSException("Unknown flavor %r" % self.flavor)
 
         for frame in self.pending_frames:
+            # Text written by the underlying protocol goes out as UTF-8
+            if isinstance(frame, str):
+                frame = frame.encode("utf-8")
             # Encode the frame before sending it.
             if self.codec:
                 frame = encoders[self.codec](frame)
@@ -518,10 +519,10 @@ class WebSocketProtocol(ProtocolWrapper):
             # These lines look like:
             # GET /some/path/to/a/websocket/resource HTTP/1.1
             if self.state == REQUEST:
-                if "\r\n" in self.buf:
-                    request, chaff, self.buf = self.buf.partition("\r\n")
+                if b"\r\n" in self.buf:
+                    request, chaff, self.buf = self.buf.partition(b"\r\n")
                     try:
-                        verb, self.location, version = request.split(" ")
+                        verb, self.location, version = request.decode("latin-1").split(" ")
                     except ValueError:
                         self.loseConnection()
                     else:
@@ -529,9 +530,9 @@ class WebSocketProtocol(ProtocolWrapper):
 
             elif self.state == NEGOTIATING:
                 # Check to see if we've got a complete set of headers yet.
-                if "\r\n\r\n" in self.buf:
-                    head, chaff, self.buf = self.buf.partition("\r\n\r\n")
-                    self.headers = http_headers(head)
+                if b"\r\n\r\n" in self.buf:
+                    head, chaff, self.buf = self.buf.partition(b"\r\n\r\n")
+                    self.headers = http_headers(head.decode("latin-1"))
                     # Validate headers. This will cause a state change.
                     if not self.validateHeaders():
                         self.loseConnection()
@@ -593,7 +594,7 @@ class WebSocketProtocol(ProtocolWrapper):
         # Send a closing frame. It's only polite. (And might keep the browser
         # from hanging.)
         if self.flavor in (HYBI07, HYBI10, RFC6455):
-            frame = make_hybi07_frame(reason, opcode=0x8)
+            frame = make_hybi07_frame(reason.encode("utf-8"), opcode=0x8)
             self.transport.write(frame)
 
         self.loseConnection()